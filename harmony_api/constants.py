@@ -24,8 +24,10 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-INSTRUMENTS_CACHE_JSON_FILENAME = "instruments_cache.json"
+INSTRUMENTS_CACHE_DIRNAME = "instruments_cache"
 VECTORS_CACHE_JSON_FILENAME = "vectors_cache.json"
+VECTORS_CACHE_VERSIONS_JSON_FILENAME = "vectors_cache_versions.json"
+NEGATIONS_CACHE_JSON_FILENAME = "negations_cache.json"
 
 # Hugging Face models
 HUGGINGFACE_MINILM_L12_V2 = {
@@ -25,7 +25,7 @@ SOFTWARE.
 """
 
 import os
-from typing import Union
+from typing import Literal, Union
 
 from pydantic import Field
 from pydantic_settings import BaseSettings
@@ -44,6 +44,170 @@ class Settings(BaseSettings):
         description="A JSON string is expected here, this is the content of credentials.json.",
         default=None
     )
+    ADMIN_API_KEY: str | None = Field(
+        description="The key the admin endpoints require in the X-Admin-Key header, they're disabled when it's not "
+                    "set.",
+        default=None
+    )
+
+    # Hugging Face inference config
+    HUGGING_FACE_BACKEND: Literal["torch", "onnx"] = Field(
+        description="The inference backend for the Hugging Face models, \"torch\" or \"onnx\". The \"onnx\" backend "
+                    "requires the packages optimum and onnxruntime.",
+        default="torch"
+    )
+    HUGGING_FACE_ONNX_QUANTISATION: Literal["arm64", "avx2", "avx512", "avx512_vnni"] | None = Field(
+        description="Apply dynamic int8 quantisation for this CPU architecture to the ONNX models.", default=None
+    )
+    HUGGING_FACE_ONNX_MODELS_PATH: str | None = Field(
+        description="Where the exported ONNX models are stored. Defaults to HARMONY_DATA_PATH/onnx_models.",
+        default=None
+    )
+    ONNX_INTRA_OP_NUM_THREADS: int = Field(
+        description="Number of threads used to parallelise the execution within ONNX Runtime nodes, 0 lets ONNX "
+                    "Runtime decide.",
+        default=0
+    )
+    ONNX_INTER_OP_NUM_THREADS: int = Field(
+        description="Number of threads used to parallelise the execution of the ONNX Runtime graph, 0 lets ONNX "
+                    "Runtime decide.",
+        default=0
+    )
+    HUGGING_FACE_ENCODE_BATCH_SIZE: int = Field(
+        description="The max number of texts encoded together by the Hugging Face models.", default=64
+    )
+    HUGGING_FACE_ENCODE_TOKEN_BUDGET: int = Field(
+        description="The max number of tokens (including padding) encoded together by the Hugging Face models. Texts "
+                    "are sorted by token length and grouped until the budget is reached. 0 disables the grouping.",
+        default=8192
+    )
+
+    # Instruments cache config
+    INSTRUMENTS_CACHE_MAX_DECODED: int = Field(
+        description="The max number of instruments cache entries kept in memory as instruments, the others are read "
+                    "from disk when needed. 0 disables the limit.",
+        default=1000
+    )
+    INSTRUMENTS_CACHE_MAX_MB: int = Field(
+        description="The max size, in MB, of the JSON of the instruments cache entries, the least recently used are "
+                    "evicted first.",
+        default=1024
+    )
+    INSTRUMENTS_CACHE_TTL_DAYS: float = Field(
+        description="An instruments cache entry is evicted when it's not used for this number of days, 0 disables the "
+                    "expiry.",
+        default=0
+    )
+
+    # Negations cache config
+    NEGATIONS_CACHE_MAX_SIZE: int = Field(
+        description="The max number of negated texts kept in the negations cache.", default=100000
+    )
+
+    # Match results cache config
+    MATCH_RESULTS_CACHE_MAX_MB: int = Field(
+        description="The max size, in MB, of the match responses kept in memory to answer repeated requests, 0 "
+                    "disables the cache.",
+        default=256
+    )
+
+    # Match config
+    MATCH_TILE_MEMORY_MB: int = Field(
+        description="The memory ceiling, in MB, of a tile of rows when computing similarity matrices during a match.",
+        default=256
+    )
+
+    # Clustering config
+    CLUSTERING_MAX_QUESTIONS: int = Field(
+        description="Past this number of questions, the affinity propagation, deterministic and HDBSCAN clustering "
+                    "are replaced by the kNN graph clustering. 0 disables the replacement.",
+        default=2000
+    )
+    CLUSTERING_KNN: int = Field(
+        description="The number of nearest neighbours of every question text in the kNN graph clustering.", default=10
+    )
+
+    # Match sessions config
+    MATCH_SESSION_TTL_SECONDS: int = Field(
+        description="A match session expires when it's not used for this number of seconds.", default=3600
+    )
+    MATCH_SESSIONS_MAX_SIZE: int = Field(
+        description="The max number of match sessions kept in memory, the least recently used is removed first.",
+        default=100
+    )
+    MATCH_SESSIONS_MAX_MB: int = Field(
+        description="The max size, in MB, of the vectors and similarities of the match sessions kept in memory, the "
+                    "least recently used are removed first.",
+        default=1024
+    )
+
+    # Parse config
+    PARSE_MAX_CONCURRENT_FILES: int = Field(
+        description="The max number of files parsed at the same time, by all the requests.", default=16
+    )
+    PARSE_MAX_CONCURRENT_FILES_PER_REQUEST: int = Field(
+        description="The max number of files of a request parsed at the same time.", default=8
+    )
+    PARSE_PDF_WITHOUT_TIKA: bool = Field(
+        description="Extract the text of the simple PDFs, not encrypted and with text on every page, with pypdf "
+                    "instead of Tika. The text, and so the parsed questions, can differ from Tika's.",
+        default=False
+    )
+
+    # Tika config
+    TIKA_MAX_CONCURRENT_REQUESTS: int = Field(
+        description="The max number of requests sent to Tika at the same time, by all the requests. The connections "
+                    "are kept alive and reused.",
+        default=4
+    )
+    TIKA_TIMEOUT_SECONDS: float = Field(description="The timeout of a request to Tika.", default=300)
+    TIKA_CIRCUIT_BREAKER_FAILURES: int = Field(
+        description="After this number of consecutive failed requests to Tika, the requests fail without calling Tika "
+                    "until a health check of Tika passes. 0 disables the circuit breaker.",
+        default=5
+    )
+    TIKA_CIRCUIT_BREAKER_RESET_SECONDS: float = Field(
+        description="The time between the health checks of Tika while the circuit breaker is open.", default=30
+    )
+
+    # URL cache config
+    URL_CACHE_MAX_SIZE: int = Field(
+        description="The max number of URLs of instruments cached, the least recently used is removed first.",
+        default=1000
+    )
+    URL_CACHE_REVALIDATE_SECONDS: float = Field(
+        description="The instruments of a cached URL are served without contacting its server for this number of "
+                    "seconds, then the URL is revalidated with a conditional GET. 0 revalidates every time.",
+        default=60
+    )
+    URL_FETCH_MAX_MB: int = Field(description="The max size, in MB, of a file downloaded from a URL.", default=50)
+    URL_FETCH_TIMEOUT_SECONDS: float = Field(
+        description="The max time to download a file from a URL.", default=60
+    )
+
+    # Process pool config
+    PROCESS_POOL_ENABLED: bool = Field(
+        description="Run the embedding and matching work in a pool of worker processes instead of the request "
+                    "thread.",
+        default=False
+    )
+    PROCESS_POOL_SIZE: int = Field(
+        description="Number of worker processes, 0 uses the number of CPUs divided by PROCESS_POOL_TORCH_NUM_THREADS.",
+        default=0
+    )
+    PROCESS_POOL_TORCH_NUM_THREADS: int = Field(
+        description="Number of torch and BLAS threads in each worker process.", default=1
+    )
+
+    # Concurrency governor config
+    MAX_CONCURRENT_CPU_JOBS: int = Field(
+        description="The max number of CPU-heavy jobs (local model encoding, matching) running at the same time, 0 "
+                    "uses half the number of CPUs.",
+        default=0
+    )
+    MIN_THREADS_PER_CPU_JOB: int = Field(
+        description="The min number of torch/OpenMP/BLAS threads given to a CPU-heavy job.", default=1
+    )
 
 
 class DevSettings(Settings):
@@ -1,5 +1,12 @@
+import hmac
+
+from fastapi import Header
 from harmony.schemas.requests.text import MatchBody
-from harmony_api import http_exceptions, helpers, constants
+from harmony_api import http_exceptions, helpers
+from harmony_api.core.settings import get_settings
+from harmony_api.services.model_registry import get_model_provider
+
+settings = get_settings()
 
 
 def model_from_match_body_is_available(match_body: MatchBody) -> bool:
@@ -13,8 +20,23 @@ def model_from_match_body_is_available(match_body: MatchBody) -> bool:
     return True
 
 
+def admin_key_is_valid(x_admin_key: str | None = Header(default=None)) -> bool:
+    """
+    Check the admin key of the admin endpoints.
+    """
+
+    if not settings.ADMIN_API_KEY:
+        raise http_exceptions.ForbiddenHTTPException(
+            "Could not process request because the admin endpoints are disabled."
+        )
+    if not x_admin_key or not hmac.compare_digest(x_admin_key.encode(), settings.ADMIN_API_KEY.encode()):
+        raise http_exceptions.ForbiddenHTTPException("Could not process request because the admin key is invalid.")
+
+    return True
+
+
 def __check_model(model_dict: dict):
-    if model_dict not in constants.ALL_HARMONY_API_MODELS:
+    if not get_model_provider(model_dict):
         raise http_exceptions.CouldNotProcessRequestHTTPException(
             "Could not process request because the model does not exist."
         )
@@ -25,6 +25,7 @@ SOFTWARE.
 """
 
 import bz2
+import functools
 import json
 import os
 import pickle as pkl
@@ -36,41 +37,27 @@ from typing import List, Callable
 from io import BytesIO
 
 import numpy as np
+from scipy.sparse import coo_matrix
 
-from harmony.matching.negator import negate
-from harmony.schemas.requests.text import Instrument, Question
-from harmony_api.constants import (
-    GOOGLE_GECKO_MULTILINGUAL,
-    GOOGLE_GECKO_003,
-    OPENAI_3_LARGE,
-    OPENAI_ADA_02,
-    HUGGINGFACE_MPNET_BASE_V2,
-    HUGGINGFACE_MINILM_L12_V2,
-    AZURE_OPENAI_ADA_02,
-    AZURE_OPENAI_3_LARGE, HUGGINGFACE_MENTAL_HEALTH_HARMONISATION_1,
-)
+from harmony.matching.matcher import is_empty_or_null_text
+from harmony.schemas.requests.text import Instrument
 from harmony_api.core.settings import get_settings
-from harmony_api.services import azure_openai_embeddings
-from harmony_api.services import google_embeddings
-from harmony_api.services import hugging_face_embeddings
-from harmony_api.services import openai_embeddings
-from harmony_api.services.azure_openai_embeddings import (
-    HARMONY_API_AVAILABLE_AZURE_OPENAI_MODELS_LIST,
-)
-from harmony_api.services.google_embeddings import (
-    HARMONY_API_AVAILABLE_GOOGLE_MODELS_LIST,
-)
-from harmony_api.services.openai_embeddings import (
-    HARMONY_API_AVAILABLE_OPENAI_MODELS_LIST,
-)
-from harmony_api.services.vectors_cache import VectorsCache
+from harmony_api.schemas.responses import SparseMatrix
+from harmony_api.services import process_pool
+from harmony_api.services.match_pipeline import NEGATION_LANGUAGE
+from harmony_api.services.metrics import Metrics
+from harmony_api.services.mhc_embeddings_store import MhcEmbeddingsStore
+from harmony_api.services.model_registry import get_model_provider
+from harmony_api.services.negations_cache import NegationsCache
+from harmony_api.services.single_flight import SingleFlight
+from harmony_api.services.vectors_cache import VectorsCache, get_model_version
 
 settings = get_settings()
 
 dir_path = os.path.dirname(os.path.realpath(__file__))
 
-# Cache
-vectors_cache = VectorsCache()
+# The texts vectorised at the same time by several requests are vectorised once, by vectors cache key
+__vectorisation_single_flight = SingleFlight("vectorisation")
 
 
 def get_example_instruments() -> List[Instrument]:
@@ -88,46 +75,26 @@ def get_example_instruments() -> List[Instrument]:
     return example_instruments
 
 
-def get_mhc_embeddings(model_name: str) -> tuple:
+def get_mhc_embeddings(model: dict) -> tuple:
     """
     Get mhc embeddings.
+
+    The MHC data is loaded once and shared by all requests, it must not be modified.
+
+    :param model: The model.
     """
 
     mhc_questions = []
     mhc_all_metadata = []
     mhc_embeddings = np.zeros((0, 0))
 
-    # Only return the MHC embeddings for the Hugging Face models
-    if model_name not in [
-        HUGGINGFACE_MPNET_BASE_V2["model"],
-        HUGGINGFACE_MINILM_L12_V2["model"],
-    ]:
+    # Only return the MHC embeddings for the models that have them
+    model_provider = get_model_provider(model)
+    if not model_provider or not model_provider.has_mhc_embeddings:
         return mhc_questions, mhc_all_metadata, mhc_embeddings
 
     try:
-        data_path = os.path.join(dir_path, "../mhc_embeddings")  # submodule
-
-        with open(
-                os.path.join(data_path, "mhc_questions.txt"), "r", encoding="utf-8"
-        ) as file:
-            for line in file:
-                mhc_question = Question(question_text=line)
-                mhc_questions.append(mhc_question)
-
-        with open(
-                os.path.join(data_path, "mhc_all_metadatas.json"), "r", encoding="utf-8"
-        ) as file:
-            for line in file:
-                mhc_meta = json.loads(line)
-                mhc_all_metadata.append(mhc_meta)
-
-        with open(
-                os.path.join(
-                    data_path, f"mhc_embeddings_{model_name.replace('/', '-')}.npy"
-                ),
-                "rb",
-        ) as file:
-            mhc_embeddings = np.load(file, allow_pickle=True)
+        mhc_questions, mhc_all_metadata, mhc_embeddings = MhcEmbeddingsStore().get(model["model"])
     except (Exception,) as e:
         print(f"Could not load MHC embeddings {str(e)}")
 
@@ -223,8 +190,9 @@ def get_catalogue_data_model_embeddings(model: dict) -> np.ndarray:
 
     all_embeddings_concatenated = np.array([])
 
-    # Currently only "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2" is supported
-    if model["model"] != HUGGINGFACE_MINILM_L12_V2["model"]:
+    # Only download the catalogue embeddings for the models that have them
+    model_provider = get_model_provider(model)
+    if not model_provider or not model_provider.has_catalogue_embeddings:
         return all_embeddings_concatenated
 
     # Embeddings
@@ -397,40 +365,18 @@ def check_model_availability(model: dict) -> bool:
     Check model availability.
     """
 
-    # Hugging Face
-    if model["framework"] == "huggingface":
-        # No checks required, always return True at the end of this function
-        pass
-
-    # OpenAI
-    elif model["framework"] == "openai":
-        if not settings.OPENAI_API_KEY:
-            return False
+    model_provider = get_model_provider(model)
+    if not model_provider:
+        return False
 
-        # Check model
-        if model["model"] not in HARMONY_API_AVAILABLE_OPENAI_MODELS_LIST:
-            return False
-
-    # Azure OpenAI
-    elif model["framework"] == "azure_openai":
-        # Check model
-        if model["model"] not in HARMONY_API_AVAILABLE_AZURE_OPENAI_MODELS_LIST:
-            return False
-
-    # Google
-    elif model["framework"] == "google":
-        if not google_embeddings.GOOGLE_APPLICATION_CREDENTIALS_DICT:
-            return False
-
-        # Check model
-        if model["model"] not in HARMONY_API_AVAILABLE_GOOGLE_MODELS_LIST:
-            return False
-
-    return True
+    return model_provider.is_available()
 
 
 def get_cached_text_vectors(
-        instruments: List[Instrument], model: dict, query: str | None = None
+        instruments: List[Instrument],
+        model: dict,
+        query: str | None = None,
+        is_negate: bool = True,
 ) -> dict[str, List[float]]:
     """
     Get cached text vectors.
@@ -438,28 +384,45 @@ def get_cached_text_vectors(
     :param instruments: The instruments.
     :param query: The query.
     :param model: The model.
+    :param is_negate: Whether to get the cached vectors of the negated texts too.
     """
 
+    vectors_cache = VectorsCache()
+    negations_cache = NegationsCache()
+    negated_texts_skipped = 0
+    model_version = get_model_version(model_framework=model["framework"], model_name=model["model"])
+
     cached_text_vectors_dict: dict[str, List[float]] = {}
+    seen_question_texts = set()
     for instrument in instruments:
         for question in instrument.questions:
-            # Text
+            # Identical texts are looked up once
             question_text = question.question_text
+            if question_text in seen_question_texts:
+                continue
+            seen_question_texts.add(question_text)
+
+            # Text
             question_text_key = vectors_cache.generate_key(
                 text=question_text,
                 model_framework=model["framework"],
                 model_name=model["model"],
+                model_version=model_version,
             )
             if vectors_cache.has(question_text_key):
                 cached_vector = vectors_cache.get(question_text_key)
                 cached_text_vectors_dict[question_text] = cached_vector[question_text]
 
-            # Negated text
-            negated_text = negate(question_text, instrument.language)
+            # Negated text, in the language used by the matching
+            if not is_negate:
+                negated_texts_skipped += 1
+                continue
+            negated_text = negations_cache.negate(question_text, NEGATION_LANGUAGE)
             negated_text_key = vectors_cache.generate_key(
                 text=negated_text,
                 model_framework=model["framework"],
                 model_name=model["model"],
+                model_version=model_version,
             )
             if vectors_cache.has(negated_text_key):
                 cached_vector = vectors_cache.get(negated_text_key)
@@ -468,86 +431,105 @@ def get_cached_text_vectors(
     # Get cached vector of query
     if query:
         query_key = vectors_cache.generate_key(
-            text=query, model_framework=model["framework"], model_name=model["model"]
+            text=query, model_framework=model["framework"], model_name=model["model"], model_version=model_version
         )
         if vectors_cache.has(query_key):
             cached_vector = vectors_cache.get(query_key)
             cached_text_vectors_dict[query] = cached_vector[query]
 
+    if negated_texts_skipped:
+        Metrics().increment("negated_texts_skipped", negated_texts_skipped)
+
     return cached_text_vectors_dict
 
 
-def get_vectorisation_function_for_model(model: dict) -> Callable | None:
+def vectorise_texts_not_cached(
+        texts_cached_vectors: dict[str, List[float]],
+        instruments: List[Instrument],
+        model: dict,
+        vectorisation_function: Callable,
+        query: str | None = None,
+        is_negate: bool = True,
+):
     """
-    Get vectorisation function for model.
+    Vectorise the texts of a match which have no cached vectors, and add their vectors to `texts_cached_vectors` and to
+    the vectors cache.
 
+    A text being vectorised with the same model for another request isn't vectorised again, its vector is awaited.
+
+    :param texts_cached_vectors: The cached vectors of the texts.
+    :param instruments: The instruments.
     :param model: The model.
+    :param vectorisation_function: The vectorisation function of the model.
+    :param query: The query.
+    :param is_negate: Whether to vectorise the negated texts too.
     """
 
-    vectorisation_function: Callable | None = None
+    texts = [question.question_text for instrument in instruments for question in instrument.questions]
+    if is_negate:
+        negations_cache = NegationsCache()
+        texts += [negations_cache.negate(text, NEGATION_LANGUAGE) for text in texts]
+    if query:
+        texts.append(query)
+    texts = [
+        text for text in dict.fromkeys(texts) if text not in texts_cached_vectors and not is_empty_or_null_text(text)
+    ]
+    if not texts:
+        return
 
-    if (
-            model["framework"] == HUGGINGFACE_MINILM_L12_V2["framework"]
-            and model["model"] == HUGGINGFACE_MINILM_L12_V2["model"]
-    ):
-        vectorisation_function = (
-            hugging_face_embeddings.get_hugging_face_embeddings_minilm_l12_v2
-        )
+    vectors_cache = VectorsCache()
+    model_version = get_model_version(model_framework=model["framework"], model_name=model["model"])
 
-    elif (
-            model["framework"] == HUGGINGFACE_MPNET_BASE_V2["framework"]
-            and model["model"] == HUGGINGFACE_MPNET_BASE_V2["model"]
-    ):
-        vectorisation_function = (
-            hugging_face_embeddings.get_hugging_face_embeddings_mpnet_base_v2
+    # Text -> vectors cache key, and the future of its vector and whether this request vectorises it
+    keys = {
+        text: vectors_cache.generate_key(
+            text=text, model_framework=model["framework"], model_name=model["model"], model_version=model_version
         )
+        for text in texts
+    }
+    claims = {text: __vectorisation_single_flight.claim(key) for text, key in keys.items()}
+
+    # The texts claimed by this request are vectorised before waiting for the others, so requests waiting for each
+    # other always progress
+    texts_to_vectorise = [text for text, (_, is_leader) in claims.items() if is_leader]
+    if texts_to_vectorise:
+        try:
+            vectors = vectorisation_function(texts_to_vectorise)
+            new_text_vectors = {
+                text: vector.tolist() if isinstance(vector, np.ndarray) else vector
+                for text, vector in zip(texts_to_vectorise, vectors)
+            }
+            vectors_cache.add(new_text_vectors, model_name=model["model"], framework=model["framework"])
+        except BaseException as e:
+            for text in texts_to_vectorise:
+                __vectorisation_single_flight.set_exception(keys[text], claims[text][0], e)
+            raise
+        for text in texts_to_vectorise:
+            __vectorisation_single_flight.set_result(keys[text], claims[text][0], new_text_vectors[text])
+
+    for text, (future, _) in claims.items():
+        texts_cached_vectors[text] = future.result()
 
-    elif (
-            model["framework"] == HUGGINGFACE_MPNET_BASE_V2["framework"]
-            and model["model"] == HUGGINGFACE_MENTAL_HEALTH_HARMONISATION_1["model"]
-    ):
-        vectorisation_function = (
-            hugging_face_embeddings.get_hugging_face_embeddings_harmonydata_mental_health_harmonisation_1
-        )
 
-    elif (
-            model["framework"] == OPENAI_ADA_02["framework"]
-            and model["model"] == OPENAI_ADA_02["model"]
-    ):
-        vectorisation_function = openai_embeddings.get_openai_embeddings_ada_02
-    elif (
-            model["framework"] == OPENAI_3_LARGE["framework"]
-            and model["model"] == OPENAI_3_LARGE["model"]
-    ):
-        vectorisation_function = openai_embeddings.get_openai_embeddings_3_large
-    elif (
-            model["framework"] == AZURE_OPENAI_3_LARGE["framework"]
-            and model["model"] == AZURE_OPENAI_3_LARGE["model"]
-    ):
-        vectorisation_function = (
-            azure_openai_embeddings.get_azure_openai_embeddings_3_large
-        )
-    elif (
-            model["framework"] == AZURE_OPENAI_ADA_02["framework"]
-            and model["model"] == AZURE_OPENAI_ADA_02["model"]
-    ):
-        vectorisation_function = (
-            azure_openai_embeddings.get_azure_openai_embeddings_ada_02
-        )
-    elif (
-            model["framework"] == GOOGLE_GECKO_MULTILINGUAL["framework"]
-            and model["model"] == GOOGLE_GECKO_MULTILINGUAL["model"]
-    ):
-        vectorisation_function = (
-            google_embeddings.get_google_embeddings_gecko_multilingual
-        )
-    elif (
-            model["framework"] == GOOGLE_GECKO_003["framework"]
-            and model["model"] == GOOGLE_GECKO_003["model"]
-    ):
-        vectorisation_function = google_embeddings.get_google_embeddings_gecko_003
+def get_vectorisation_function_for_model(model: dict) -> Callable | None:
+    """
+    Get vectorisation function for model.
+
+    The returned function sends the texts to the model in batches of the max batch size declared for the model. The
+    local models run in the process pool when it's enabled, else under the concurrency governor.
+
+    :param model: The model.
+    """
+
+    model_provider = get_model_provider(model)
+    if not model_provider:
+        return None
 
-    return vectorisation_function
+    # Local models are CPU-heavy, they run in the process pool or under the concurrency governor
+    if model_provider.is_local:
+        return functools.partial(process_pool.encode, model)
+
+    return model_provider.vectorise
 
 
 def assign_missing_ids_to_instruments(
@@ -580,3 +562,21 @@ def create_embeddings_filename_for_model(model: dict) -> str:
     filename = f"{filename}_embeddings_all_float16.pkl.bz2"
 
     return filename
+
+
+def get_sparse_matrix_response(matrix: coo_matrix | np.ndarray) -> SparseMatrix:
+    """
+    Get the response of a sparse matrix.
+
+    :param matrix: The sparse matrix, an empty array means an empty matrix.
+    """
+
+    if not isinstance(matrix, coo_matrix):
+        matrix = coo_matrix((0, 0))
+
+    return SparseMatrix(
+        shape=list(matrix.shape),
+        rows=matrix.row.tolist(),
+        cols=matrix.col.tolist(),
+        scores=matrix.data.tolist(),
+    )
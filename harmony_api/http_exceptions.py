@@ -43,3 +43,21 @@ class CouldNotFindResourceHTTPException(HTTPException):
         super().__init__(
             status_code=status.HTTP_404_NOT_FOUND, detail=detail
         )
+
+
+class ForbiddenHTTPException(HTTPException):
+    def __init__(self, detail: str = None):
+        if not detail:
+            detail = "Forbidden."
+        super().__init__(
+            status_code=status.HTTP_403_FORBIDDEN, detail=detail
+        )
+
+
+class ServiceUnavailableHTTPException(HTTPException):
+    def __init__(self, detail: str = None):
+        if not detail:
+            detail = "Service unavailable."
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=detail
+        )
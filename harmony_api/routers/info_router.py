@@ -31,6 +31,11 @@ import harmony
 from fastapi import APIRouter, status
 from harmony_api.constants import ALL_HARMONY_API_MODELS
 from harmony_api.helpers import check_model_availability
+from harmony_api.services import process_pool
+from harmony_api.services.concurrency_governor import ConcurrencyGovernor
+from harmony_api.services.instruments_cache import InstrumentsCache
+from harmony_api.services.metrics import Metrics
+from harmony_api.services.model_registry import get_model_provider
 
 router = APIRouter(prefix="/info")
 
@@ -52,13 +57,54 @@ def show_version():
 )
 def show_models() -> List[dict]:
     """
-    Show models.
+    Show models and their capabilities.
     """
 
     models = []
     for model in ALL_HARMONY_API_MODELS:
         is_available = check_model_availability(model)
-        model_dict = {**model, "available": is_available}
+        model_dict = {
+            **get_model_provider(model).to_dict(),
+            **model,
+            "available": is_available,
+        }
         models.append(model_dict)
 
     return models
+
+
+@router.get(path="/concurrency", status_code=status.HTTP_200_OK)
+def show_concurrency() -> dict:
+    """
+    Show the concurrency settings and the current load of the CPU-heavy jobs.
+    """
+
+    return {
+        **ConcurrencyGovernor().get_settings(),
+        "process_pool_enabled": process_pool.is_enabled(),
+        "process_pool_size": process_pool.get_pool_size() if process_pool.is_enabled() else 0,
+    }
+
+
+@router.get(path="/metrics", status_code=status.HTTP_200_OK)
+def show_metrics() -> dict[str, int]:
+    """
+    Show the counters since the application started.
+
+    `negated_texts_skipped`: The number of distinct question texts that were not negated, looked up or encoded as negated
+    texts because negation was disabled in the request.
+
+    `match_results_cache_hits`, `match_results_cache_misses`: The number of matches answered from, or missing from, the
+    match results cache.
+
+    `instruments_cache_hits`, `instruments_cache_misses`, `instruments_cache_evictions`: The number of files whose
+    instruments were found in, or missing from, the instruments cache, and the number of entries evicted from it.
+
+    `instruments_cache_entries`, `instruments_cache_size_bytes`, `instruments_cache_decoded_entries`: The current number
+    of entries of the instruments cache, their size, and the number of entries kept in memory as instruments.
+    """
+
+    return {
+        **Metrics().get_metrics(),
+        **InstrumentsCache().get_stats(),
+    }
@@ -27,15 +27,17 @@ SOFTWARE.
 import copy
 import uuid
 from typing import Annotated
+from typing import Callable
+from typing import Iterator
 from typing import List
 
-from fastapi import APIRouter, Body, status, Depends, Query
-from harmony.matching.default_matcher import match_instruments_with_function
+from fastapi import APIRouter, Body, status, Depends, Query, Header, Response, File, UploadFile
+from fastapi.responses import StreamingResponse
 from harmony.matching.matcher import (
+    is_empty_or_null_text,
     match_instruments_with_catalogue_instruments,
     match_query_with_catalogue_instruments,
 )
-from harmony.parsing.wrapper_all_parsers import convert_files_to_instruments
 from harmony.schemas.requests.text import (
     RawFile,
     Instrument,
@@ -43,17 +45,24 @@ from harmony.schemas.requests.text import (
     SearchInstrumentsBody,
 )
 from harmony.schemas.responses.text import (
-    MatchResponse,
     CacheResponse,
     SearchInstrumentsResponse,
 )
-from harmony.util.url_loader import load_instruments_from_url
 
-from harmony.schemas.enums.clustering_algorithms import ClusteringAlgorithm
 from harmony_api import helpers, dependencies, constants
 from harmony_api import http_exceptions
 from harmony_api.core.settings import get_settings
+from harmony_api.schemas.enums import HarmonyApiClusteringAlgorithm
+from harmony_api.schemas.responses import HarmonyApiMatchResponse, MatchSessionResponse, ParsedFileResponse
+from harmony_api.services import match_pipeline, match_response_encoding, model_registry, parse_pool, process_pool
+from harmony_api.services import parse_response_streaming, uploaded_files
+from harmony_api.services.concurrency_governor import ConcurrencyGovernor
 from harmony_api.services.instruments_cache import InstrumentsCache
+from harmony_api.services.match_results_cache import CachedMatchResponse, MatchResultsCache
+from harmony_api.services.match_sessions import MatchSession, MatchSessions
+from harmony_api.services.mhc_embeddings_store import MhcEmbeddingsStore
+from harmony_api.services.tika_client import TikaUnavailableError
+from harmony_api.services.url_cache import UrlCache
 from harmony_api.services.vectors_cache import VectorsCache
 
 settings = get_settings()
@@ -63,6 +72,8 @@ router = APIRouter(prefix="/text")
 # Cache
 instruments_cache = InstrumentsCache()
 vectors_cache = VectorsCache()
+match_results_cache = MatchResultsCache()
+match_sessions = MatchSessions()
 
 # Catalogue data
 print("INFO:\t  Loading catalogue data...")
@@ -145,7 +156,8 @@ def parse_instruments(
                     },
                 }
             ),
-        ]
+        ],
+        accept: str | None = Header(None),
 ) -> List[Instrument]:
     """
     Parse PDFs or Excels or text files into Instruments, and identifies the language.
@@ -154,6 +166,12 @@ def parse_instruments(
     base64 encoding, like the example RawFile in the schema.
 
     If the file is plain text, supply the file content as a standard string.
+
+    The files are parsed concurrently, and the instruments are returned in the order of the files.
+
+    With `Accept: application/x-ndjson` (a line of JSON per file) or `Accept: text/event-stream` (a Server-Sent Event
+    per file), the instruments of every file are streamed as soon as the file is parsed, see `ParsedFileResponse`. A
+    file whose parsing fails is then streamed with its error instead of failing the request.
     """
 
     # Assign any missing IDs
@@ -161,37 +179,224 @@ def parse_instruments(
         if file.file_id is None:
             file.file_id = uuid.uuid4().hex
 
-    # List of all the instruments
-    instruments: List[Instrument] = []
+    instrument_keys = [instruments_cache.generate_key(file.content, file.file_type) for file in files]
 
-    # A list of files whose instruments are not cached
-    files_with_no_cached_instruments = []
+    streaming_media_type = parse_response_streaming.get_streaming_media_type(accept)
+    if streaming_media_type:
+        return StreamingResponse(
+            __stream_instruments(files, instrument_keys, parse_pool.iter_parsed_files, streaming_media_type),
+            media_type=streaming_media_type,
+        )
 
-    for file in files:
-        instrument_key = instruments_cache.generate_key(file.content)
-        if instruments_cache.has(instrument_key):
+    return __get_instruments(files, instrument_keys, parse_pool.parse_files)
+
+
+@router.post(path="/parse/upload", response_model_exclude_none=True)
+def parse_uploaded_instruments(
+        files: List[UploadFile] = File(description="The files to parse."),
+        accept: str | None = Header(None),
+) -> List[Instrument]:
+    """
+    Parse PDFs or Excels or text files, uploaded as multipart/form-data, into Instruments, and identifies the language.
+
+    This is the same as /text/parse, without the base64 encoding of the binary files in a JSON body. The file type is
+    taken from the extension of the file name, or else from the content type of the file.
+
+    The files are parsed concurrently, and the instruments are returned in the order of the files. The instruments can
+    be streamed as soon as every file is parsed, like with /text/parse.
+    """
+
+    uploads: List[uploaded_files.UploadedFile] = []
+    for upload in files:
+        uploaded_file = uploaded_files.get_uploaded_file(upload)
+        if uploaded_file is None:
+            raise http_exceptions.CouldNotProcessRequestHTTPException(
+                f"The type of the file {upload.filename} is not supported."
+            )
+        uploads.append(uploaded_file)
+
+    instrument_keys = [uploaded_file.key for uploaded_file in uploads]
+
+    streaming_media_type = parse_response_streaming.get_streaming_media_type(accept)
+    if streaming_media_type:
+        # FastAPI closes the uploaded files when the endpoint returns, before the response is streamed, so the stream
+        # takes them over and closes them itself
+        for upload in files:
+            uploaded_files.detach(upload)
+
+        return StreamingResponse(
+            __stream_instruments(
+                uploads, instrument_keys, parse_pool.iter_parsed_uploaded_files, streaming_media_type,
+                on_close=lambda: uploaded_files.close(uploads),
+            ),
+            media_type=streaming_media_type,
+        )
+
+    return __get_instruments(uploads, instrument_keys, parse_pool.parse_uploaded_files)
+
+
+def __copy_instruments_for_file(instruments: List[Instrument], file_id: str | None) -> List[Instrument]:
+    """
+    Copy the instruments of a file for another file of the request with the same content, so the other file gets its
+    own file ID and new instrument IDs. The instrument IDs derived from the file ID by the parsers, e.g.
+    "<file ID>_0", are derived from the file ID of the other file.
+    """
+
+    instruments_copy = copy.deepcopy(instruments)
+    for instrument in instruments_copy:
+        instrument_id_prefix = f"{instrument.file_id}_"
+        if file_id and instrument.file_id and (instrument.instrument_id or "").startswith(instrument_id_prefix):
+            instrument.instrument_id = f"{file_id}_{instrument.instrument_id.removeprefix(instrument_id_prefix)}"
+        else:
+            instrument.instrument_id = uuid.uuid4().hex
+        instrument.file_id = file_id
+        for question in instrument.questions:
+            question.instrument_id = instrument.instrument_id
+
+    return instruments_copy
+
+
+def __get_instruments(
+        files: list, instrument_keys: List[str], parse_files: Callable[[list, List[str]], List[List[Instrument]]]
+) -> List[Instrument]:
+    """
+    Get the instruments of files from the instruments cache, parsing the files whose instruments aren't cached.
+
+    :param files: The files.
+    :param instrument_keys: The instruments cache key of every file.
+    :param parse_files: Function that parses and caches files, and returns the instruments of every file.
+    :return: The instruments of all the files, in the order of the files.
+    """
+
+    # Instrument key -> instruments of the file
+    instruments_per_key: dict[str, List[Instrument]] = {}
+
+    # The files whose instruments are not cached, a file appearing more than once is parsed once
+    files_with_no_cached_instruments: dict[str, object] = {}
+
+    for file, instrument_key in zip(files, instrument_keys):
+        if instrument_key in instruments_per_key or instrument_key in files_with_no_cached_instruments:
+            continue
+        cached_instruments = instruments_cache.get(instrument_key)
+        if cached_instruments is not None:
             # If instruments are cached
-            instruments.extend(instruments_cache.get(instrument_key))
+            instruments_per_key[instrument_key] = cached_instruments
         else:
             # If instruments are not cached
-            files_with_no_cached_instruments.append(file)
+            files_with_no_cached_instruments[instrument_key] = file
 
-    # Get instruments that aren't cached yet and cache them
-    for file_with_no_cached_instruments in files_with_no_cached_instruments:
-        new_instruments = convert_files_to_instruments(
-            [file_with_no_cached_instruments]
-        )
-        instrument_key = instruments_cache.generate_key(
-            file_with_no_cached_instruments.content
+    # Get instruments that aren't cached yet, they're cached by the parsing
+    try:
+        new_instruments_per_file = parse_files(
+            list(files_with_no_cached_instruments.values()), list(files_with_no_cached_instruments)
         )
-        instruments_cache.set(instrument_key, new_instruments)
-        instruments.extend(new_instruments)
+    except TikaUnavailableError as e:
+        raise http_exceptions.ServiceUnavailableHTTPException(str(e))
+    for instrument_key, new_instruments in zip(files_with_no_cached_instruments, new_instruments_per_file):
+        instruments_per_key[instrument_key] = new_instruments
+
+    # List of all the instruments, the files with the same content as a previous file get a copy of its instruments
+    instruments: List[Instrument] = []
+    added_instrument_keys = set()
+    for file, instrument_key in zip(files, instrument_keys):
+        if instrument_key in added_instrument_keys:
+            instruments.extend(__copy_instruments_for_file(instruments_per_key[instrument_key], file.file_id))
+        else:
+            instruments.extend(instruments_per_key[instrument_key])
+            added_instrument_keys.add(instrument_key)
 
     return instruments
 
 
+def __stream_instruments(
+        files: list,
+        instrument_keys: List[str],
+        iter_parsed_files: Callable[[list, List[str]], Iterator[parse_pool.ParsedFile]],
+        media_type: str,
+        on_close: Callable[[], object] | None = None,
+) -> Iterator[bytes]:
+    """
+    Stream the instruments of every file as soon as they're available, the cached instruments first.
+
+    :param files: The files.
+    :param instrument_keys: The instruments cache key of every file.
+    :param iter_parsed_files: Function that parses and caches files, and yields every file as soon as it's parsed.
+    :param media_type: The streaming media type.
+    :param on_close: Function called when the stream ends.
+    """
+
+    def get_event(file_idx: int, **kwargs) -> bytes:
+        file = files[file_idx]
+        event = ParsedFileResponse(file_idx=file_idx, file_id=file.file_id, file_name=file.file_name, **kwargs)
+
+        return parse_response_streaming.encode(media_type, event)
+
+    try:
+        # Instrument key -> indexes of the files, the files whose instruments are not cached
+        file_idxs_per_key: dict[str, List[int]] = {}
+
+        # The keys of the cached instruments already streamed
+        streamed_instrument_keys = set()
+
+        for file_idx, instrument_key in enumerate(instrument_keys):
+            if instrument_key in file_idxs_per_key:
+                file_idxs_per_key[instrument_key].append(file_idx)
+                continue
+            cached_instruments = instruments_cache.get(instrument_key)
+            if cached_instruments is not None:
+                # The files with the same content as a previous file get a copy of its instruments
+                if instrument_key in streamed_instrument_keys:
+                    cached_instruments = __copy_instruments_for_file(cached_instruments, files[file_idx].file_id)
+                streamed_instrument_keys.add(instrument_key)
+                yield get_event(file_idx, status="cached", parse_time=0, instruments=cached_instruments)
+            else:
+                file_idxs_per_key[instrument_key] = [file_idx]
+
+        # A file appearing more than once is parsed once
+        keys_to_parse = list(file_idxs_per_key)
+        files_to_parse = [files[file_idxs_per_key[instrument_key][0]] for instrument_key in keys_to_parse]
+        for parsed_file in iter_parsed_files(files_to_parse, keys_to_parse):
+            instrument_key = keys_to_parse[parsed_file.file_idx]
+            for duplicate_idx, file_idx in enumerate(file_idxs_per_key[instrument_key]):
+                if parsed_file.error is None:
+                    instruments = parsed_file.instruments
+                    if duplicate_idx > 0:
+                        instruments = __copy_instruments_for_file(instruments, files[file_idx].file_id)
+                    yield get_event(
+                        file_idx, status="parsed", parse_time=parsed_file.parse_time, instruments=instruments
+                    )
+                else:
+                    yield get_event(
+                        file_idx, status="failed", parse_time=parsed_file.parse_time, error=str(parsed_file.error)
+                    )
+    finally:
+        if on_close is not None:
+            on_close()
+
+
+def __get_match_response(cached_match_response: CachedMatchResponse, if_none_match: str | None) -> Response:
+    """
+    Get the response of a match, or 304 Not Modified if the client already has it.
+    """
+
+    headers = {"ETag": cached_match_response.etag, "Vary": "Accept"}
+
+    if if_none_match:
+        etags = [etag.strip().removeprefix("W/") for etag in if_none_match.split(",")]
+        if "*" in etags or cached_match_response.etag in etags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(
+        content=cached_match_response.content, media_type=cached_match_response.media_type, headers=headers
+    )
+
+
 @router.post(
-    path="/match", response_model=MatchResponse, status_code=status.HTTP_200_OK, response_model_exclude_none=True
+    path="/match",
+    response_model=HarmonyApiMatchResponse,
+    status_code=status.HTTP_200_OK,
+    response_model_exclude_none=True,
+    responses={status.HTTP_304_NOT_MODIFIED: {"description": "The response matches the If-None-Match ETag"}},
 )
 def match(
         match_body: MatchBody,
@@ -199,16 +404,61 @@ def match(
         include_catalogue_matches: bool = Query(default=False),
         catalogue_sources: List[str] = Query(default=[]),
         is_negate: bool = True,
-        clustering_algorithm: ClusteringAlgorithm = ClusteringAlgorithm.affinity_propagation
-) -> MatchResponse:
+        clustering_algorithm: HarmonyApiClusteringAlgorithm = HarmonyApiClusteringAlgorithm.affinity_propagation,
+        top_k: int | None = Query(default=None, ge=1),
+        threshold: float | None = Query(default=None, ge=-1, le=1),
+        clustering_time_budget: float | None = Query(default=None, gt=0),
+        matrices_dtype: match_response_encoding.MatricesDtype = Query(default="float32"),
+        accept: str | None = Header(default=None),
+        if_none_match: str | None = Header(default=None),
+) -> HarmonyApiMatchResponse | Response:
     """
     Match instruments.
+
+    By default, the matches and the response options similarity are returned as full matrices. When `top_k` and/or
+    `threshold` is given, they are returned as sparse matrices instead (`sparse_matches` and
+    `sparse_response_options_similarity`), holding only the `top_k` best matches of every question and/or the
+    matches with a score of at least `threshold`. A question is not matched with itself in the sparse matrices.
+
+    When the `Accept` header asks for `application/msgpack` or `application/vnd.apache.arrow.stream`, the response is
+    encoded in that format and the matrices (`matches`, `query_similarity`, `response_options_similarity` or their
+    sparse versions) are raw `matrices_dtype` buffers, see `match_response_encoding`.
+
+    The `knn_graph` and `minibatch_kmeans` clustering algorithms scale to large matches: they work from the nearest
+    neighbours of every question or from mini-batches of vectors, and stop iterating after `clustering_time_budget`
+    seconds. Past `CLUSTERING_MAX_QUESTIONS` questions, the affinity propagation, deterministic and HDBSCAN clustering
+    are replaced by the `knn_graph` clustering.
+
+    The responses of repeated requests are returned from the match results cache. Every response has an `ETag`, send
+    it in the `If-None-Match` header to get 304 Not Modified when the response has not changed.
     """
 
     # Model
     model = match_body.parameters
     model_dict = model.model_dump(mode="json")
 
+    # Media type of the response, None for JSON
+    binary_media_type = match_response_encoding.get_binary_media_type(accept)
+
+    # Cached response of the same request
+    request_key = match_results_cache.get_key({
+        "match_body": match_body.model_dump(mode="json"),
+        "include_catalogue_matches": include_catalogue_matches,
+        "catalogue_sources": catalogue_sources,
+        "is_negate": is_negate,
+        "clustering_algorithm": clustering_algorithm.value,
+        "top_k": top_k,
+        "threshold": threshold,
+        "clustering_time_budget": clustering_time_budget,
+        "matrices_dtype": matrices_dtype,
+        "media_type": binary_media_type,
+        "version": settings.VERSION,
+        "mhc_version": MhcEmbeddingsStore().get_version(model_dict["model"]),
+    })
+    cached_match_response = match_results_cache.get(request_key)
+    if cached_match_response:
+        return __get_match_response(cached_match_response, if_none_match)
+
     # Get query
     query = match_body.query
     if type(query) is str:
@@ -222,12 +472,7 @@ def match(
 
     # Get cached vectors of texts
     texts_cached_vectors = helpers.get_cached_text_vectors(
-        instruments=instruments, query=query, model=model_dict
-    )
-
-    # Get MHC embeddings
-    mhc_questions, mhc_all_metadata, mhc_embeddings = helpers.get_mhc_embeddings(
-        model.model
+        instruments=instruments, query=query, model=model_dict, is_negate=is_negate
     )
 
     # Get vect function
@@ -239,9 +484,19 @@ def match(
             "Could not find a vectorisation function for model."
         )
 
-    # Currently only the model "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2" is supported for
-    # catalogue matches.
-    if model_dict["model"] != constants.HUGGINGFACE_MINILM_L12_V2["model"]:
+    # Vectorise the texts not cached, once for all the concurrent requests
+    helpers.vectorise_texts_not_cached(
+        texts_cached_vectors=texts_cached_vectors,
+        instruments=instruments,
+        model=model_dict,
+        vectorisation_function=vectorisation_function,
+        query=query,
+        is_negate=is_negate,
+    )
+
+    # Catalogue matches are only supported for the models that have catalogue embeddings
+    model_provider = model_registry.get_model_provider(model_dict)
+    if not model_provider.has_catalogue_embeddings:
         include_catalogue_matches = False
 
     # Catalogue data
@@ -261,17 +516,17 @@ def match(
             )
 
     # Match
-    match_response_from_library = match_instruments_with_function(
+    instruments, match_response_from_library = process_pool.match_instruments(
+        model=model_dict,
         instruments=instruments,
         query=query,
         topics=match_body.topics,
-        mhc_questions=mhc_questions,
-        mhc_all_metadatas=mhc_all_metadata,
-        mhc_embeddings=mhc_embeddings,
         texts_cached_vectors=texts_cached_vectors,
-        vectorisation_function=vectorisation_function,
         is_negate=is_negate,
-        clustering_algorithm=clustering_algorithm
+        clustering_algorithm=clustering_algorithm,
+        top_k=top_k,
+        threshold=threshold,
+        clustering_time_budget=clustering_time_budget,
     )
 
     # Get catalogue matches
@@ -282,6 +537,7 @@ def match(
             catalogue_data=catalogue_data,
             vectorisation_function=vectorisation_function,
             texts_cached_vectors=texts_cached_vectors,
+            is_negate=is_negate,
         )
 
     # Add new vectors to cache
@@ -291,8 +547,37 @@ def match(
         framework=model.framework
     )
 
-    # List of matches
-    matches_jsonable = match_response_from_library.similarity_with_polarity.tolist()
+    # Binary response, the matrices are not converted to lists
+    if binary_media_type:
+        is_sparse = top_k is not None or threshold is not None
+        matrices = {
+            "sparse_matches" if is_sparse else "matches": match_response_from_library.similarity_with_polarity,
+            "sparse_response_options_similarity" if is_sparse else "response_options_similarity": (
+                match_response_from_library.response_options_similarity
+            ),
+        }
+        if match_response_from_library.query_similarity is not None:
+            matrices["query_similarity"] = match_response_from_library.query_similarity
+        response = HarmonyApiMatchResponse(
+            instruments=instruments,
+            questions=match_response_from_library.questions,
+            closest_catalogue_instrument_matches=closest_catalogue_instrument_matches,
+            instrument_to_instrument_similarities=match_response_from_library.instrument_to_instrument_similarities,
+            clusters=match_response_from_library.clusters,
+        )
+
+        cached_match_response = match_results_cache.set(
+            key=request_key,
+            media_type=binary_media_type,
+            content=match_response_encoding.encode(
+                media_type=binary_media_type,
+                response=response.model_dump(mode="json", exclude_none=True),
+                matrices=matrices,
+                dtype=matrices_dtype,
+            ),
+        )
+
+        return __get_match_response(cached_match_response, if_none_match)
 
     # Query similarity
     if match_response_from_library.query_similarity is not None:
@@ -300,20 +585,203 @@ def match(
     else:
         query_similarity = None
 
-    # Response options similarity
-    response_options_similarity = match_response_from_library.response_options_similarity.tolist()
+    # Sparse matrices of the best matches
+    if top_k is not None or threshold is not None:
+        response = HarmonyApiMatchResponse(
+            instruments=instruments,
+            questions=match_response_from_library.questions,
+            sparse_matches=helpers.get_sparse_matrix_response(match_response_from_library.similarity_with_polarity),
+            query_similarity=query_similarity,
+            closest_catalogue_instrument_matches=closest_catalogue_instrument_matches,
+            instrument_to_instrument_similarities=match_response_from_library.instrument_to_instrument_similarities,
+            clusters=match_response_from_library.clusters,
+            sparse_response_options_similarity=helpers.get_sparse_matrix_response(
+                match_response_from_library.response_options_similarity
+            ),
+        )
+    else:
+        # List of matches
+        matches_jsonable = match_response_from_library.similarity_with_polarity.tolist()
+
+        # Response options similarity
+        response_options_similarity = match_response_from_library.response_options_similarity.tolist()
+
+        response = HarmonyApiMatchResponse(
+            instruments=instruments,
+            questions=match_response_from_library.questions,
+            matches=matches_jsonable,
+            query_similarity=query_similarity,
+            closest_catalogue_instrument_matches=closest_catalogue_instrument_matches,
+            instrument_to_instrument_similarities=match_response_from_library.instrument_to_instrument_similarities,
+            clusters=match_response_from_library.clusters,
+            response_options_similarity=response_options_similarity
+        )
+
+    cached_match_response = match_results_cache.set(
+        key=request_key,
+        media_type="application/json",
+        content=response.model_dump_json(exclude_none=True).encode("utf-8"),
+    )
 
-    return MatchResponse(
+    return __get_match_response(cached_match_response, if_none_match)
+
+
+def __match_session(
+        match_session: MatchSession,
+        instruments: List[Instrument],
+        query: str | None = None,
+        recluster: bool = False,
+) -> MatchSessionResponse:
+    """
+    Add instruments to a match session and match them.
+    """
+
+    for instrument in instruments:
+        for question in instrument.questions:
+            if is_empty_or_null_text(question.question_text):
+                raise http_exceptions.CouldNotProcessRequestHTTPException(
+                    "Could not process request because a question text is empty."
+                )
+
+    model_dict = match_session.model
+    instruments = helpers.assign_missing_ids_to_instruments(instruments)
+
+    # Get vect function
+    vectorisation_function = helpers.get_vectorisation_function_for_model(model=model_dict)
+    if not vectorisation_function:
+        raise http_exceptions.CouldNotFindResourceHTTPException(
+            "Could not find a vectorisation function for model."
+        )
+
+    # Get cached vectors of texts
+    texts_cached_vectors = helpers.get_cached_text_vectors(
+        instruments=instruments, query=query, model=model_dict, is_negate=match_session.state.is_negate
+    )
+
+    # Vectorise the texts not cached, once for all the concurrent requests
+    helpers.vectorise_texts_not_cached(
+        texts_cached_vectors=texts_cached_vectors,
         instruments=instruments,
-        questions=match_response_from_library.questions,
-        matches=matches_jsonable,
-        query_similarity=query_similarity,
-        closest_catalogue_instrument_matches=closest_catalogue_instrument_matches,
-        instrument_to_instrument_similarities=match_response_from_library.instrument_to_instrument_similarities,
-        clusters=match_response_from_library.clusters,
-        response_options_similarity=response_options_similarity
+        model=model_dict,
+        vectorisation_function=vectorisation_function,
+        query=query,
+        is_negate=match_session.state.is_negate,
+    )
+
+    mhc_questions, mhc_all_metadata, mhc_embeddings = helpers.get_mhc_embeddings(model_dict)
+
+    # Match, one request at a time per session
+    with match_session.lock, ConcurrencyGovernor().cpu_job():
+        first_question_idx = len(match_session.state.questions)
+        match_result = match_pipeline.match_instruments_incrementally(
+            state=match_session.state,
+            instruments=instruments,
+            vectorisation_function=vectorisation_function,
+            query=query,
+            mhc_questions=mhc_questions,
+            mhc_all_metadatas=mhc_all_metadata,
+            mhc_embeddings=mhc_embeddings,
+            texts_cached_vectors=texts_cached_vectors,
+            recluster=recluster,
+        )
+        match_sessions.update_size(match_session)
+
+        # Add new vectors to cache
+        vectors_cache.add(
+            new_text_vectors=match_result.new_vectors_dict,
+            model_name=model_dict["model"],
+            framework=model_dict["framework"],
+        )
+
+        return MatchSessionResponse(
+            session_id=match_session.session_id,
+            instruments=instruments,
+            questions=match_result.questions,
+            first_question_idx=first_question_idx,
+            matches=match_result.similarity_with_polarity.tolist(),
+            query_similarity=match_result.query_similarity.tolist() if match_result.query_similarity.size else None,
+            instrument_to_instrument_similarities=match_result.instrument_to_instrument_similarities,
+            clusters=match_result.clusters,
+        )
+
+
+@router.post(
+    path="/match/sessions",
+    response_model=MatchSessionResponse,
+    status_code=status.HTTP_201_CREATED,
+    response_model_exclude_none=True,
+)
+def create_match_session(
+        match_body: MatchBody,
+        _model_is_available=Depends(dependencies.model_from_match_body_is_available),
+        is_negate: bool = True,
+        clustering_algorithm: HarmonyApiClusteringAlgorithm = HarmonyApiClusteringAlgorithm.affinity_propagation,
+) -> MatchSessionResponse:
+    """
+    Create a match session and match its first instruments.
+
+    More instruments can then be added to the session with `/text/match/sessions/{session_id}/instruments`, which only
+    vectorises and compares the new questions. The session expires when it's not used for `MATCH_SESSION_TTL_SECONDS`.
+    The response options similarity and the catalogue matches are not computed in a session.
+    """
+
+    # Get query
+    query = match_body.query
+    if type(query) is str:
+        query = query.strip()
+    if query == "":
+        query = None
+
+    match_session = match_sessions.create(
+        model=match_body.parameters.model_dump(mode="json"),
+        state=match_pipeline.MatchState(
+            is_negate=is_negate, clustering_algorithm=clustering_algorithm, topics=match_body.topics
+        ),
     )
 
+    # The session isn't kept when its first instruments can't be matched
+    try:
+        return __match_session(match_session=match_session, instruments=match_body.instruments, query=query)
+    except BaseException:
+        match_sessions.delete(match_session.session_id)
+        raise
+
+
+@router.post(
+    path="/match/sessions/{session_id}/instruments",
+    response_model=MatchSessionResponse,
+    status_code=status.HTTP_200_OK,
+    response_model_exclude_none=True,
+)
+def add_instruments_to_match_session(
+        session_id: str,
+        instruments: List[Instrument],
+        recluster: bool = Query(default=False),
+) -> MatchSessionResponse:
+    """
+    Add instruments to a match session and match them with all the instruments of the session.
+
+    The matches returned are the similarities of the added questions with all the questions of the session. The new
+    questions join the existing clusters, or form new clusters, unless `recluster` is true, then all the questions are
+    clustered again with the clustering algorithm of the session.
+    """
+
+    match_session = match_sessions.get(session_id)
+    if not match_session:
+        raise http_exceptions.CouldNotFindResourceHTTPException("Could not find match session.")
+
+    return __match_session(match_session=match_session, instruments=instruments, recluster=recluster)
+
+
+@router.delete(path="/match/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_match_session(session_id: str):
+    """
+    Delete a match session.
+    """
+
+    if not match_sessions.delete(session_id):
+        raise http_exceptions.CouldNotFindResourceHTTPException("Could not find match session.")
+
 
 @router.post(
     path="/examples", response_model=List[Instrument], status_code=status.HTTP_200_OK, response_model_exclude_none=True
@@ -348,6 +816,21 @@ def get_cache() -> CacheResponse:
     )
 
 
+@router.delete(path="/cache/old_versions", status_code=status.HTTP_200_OK)
+def invalidate_cache_old_versions(_admin_key_is_valid=Depends(dependencies.admin_key_is_valid)) -> dict:
+    """
+    Remove the cached instruments parsed by another version of the Harmony library, and the cached vectors of another
+    version of their model. The entries of the current versions are kept.
+
+    This is an admin endpoint, it requires the ADMIN_API_KEY in the X-Admin-Key header.
+    """
+
+    return {
+        "instruments_cache_entries_removed": instruments_cache.invalidate_other_versions(),
+        "vectors_cache_entries_removed": vectors_cache.invalidate_other_versions(),
+    }
+
+
 @router.post(
     path="/search_instruments",
     response_model=SearchInstrumentsResponse,
@@ -379,9 +862,9 @@ def search_instruments(
             "Could not find a vectorisation function for model."
         )
 
-    # Currently only the model "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2" is supported for
-    # searching instruments.
-    if model_dict["model"] != constants.HUGGINGFACE_MINILM_L12_V2["model"]:
+    # Searching instruments is only supported for the models that have catalogue embeddings
+    model_provider = model_registry.get_model_provider(model_dict)
+    if not model_provider.has_catalogue_embeddings:
         return SearchInstrumentsResponse(instruments=[])
 
     # Catalogue data
@@ -409,6 +892,13 @@ def search_instruments(
         texts_cached_vectors = helpers.get_cached_text_vectors(
             instruments=[], query=query, model=model_dict
         )
+        helpers.vectorise_texts_not_cached(
+            texts_cached_vectors=texts_cached_vectors,
+            instruments=[],
+            model=model_dict,
+            vectorisation_function=vectorisation_function,
+            query=query,
+        )
 
         match_result = match_query_with_catalogue_instruments(
             query=query,
@@ -441,4 +931,14 @@ def search_instruments(
     path="/get_instruments_from_url", status_code=status.HTTP_200_OK, response_model_exclude_none=True
 )
 def get_instruments_from_url(url: str) -> List[Instrument]:
-    return load_instruments_from_url(url)
\ No newline at end of file
+    """
+    Get the instruments of the file at a URL.
+
+    The instruments are cached by the content of the file, and the URL is revalidated with a conditional GET, so an
+    unchanged file isn't downloaded nor parsed again.
+    """
+
+    try:
+        return UrlCache().get_instruments(url)
+    except TikaUnavailableError as e:
+        raise http_exceptions.ServiceUnavailableHTTPException(str(e))
\ No newline at end of file
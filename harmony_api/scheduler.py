@@ -29,6 +29,7 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.executors.pool import ThreadPoolExecutor
 
 from harmony_api.services.instruments_cache import InstrumentsCache
+from harmony_api.services.negations_cache import NegationsCache
 from harmony_api.services.vectors_cache import VectorsCache
 
 # Jobstores
@@ -65,3 +66,27 @@ def do_every_12th_hour():
         VectorsCache().save()
     except (Exception,) as e:
         print(f"Could not save vectors cache: {str(e)}.")
+
+    # Save negations cache to disk
+    try:
+        NegationsCache().save()
+    except (Exception,) as e:
+        print(f"Could not save negations cache: {str(e)}.")
+
+
+@scheduler.scheduled_job(
+    trigger="cron", max_instances=1, year="*", month="*", day="*", hour="3", minute="30", second="0"
+)
+def do_every_day():
+    """
+    Re-validate the instruments cache entries saved to disk, the entries which can't be read by the current Harmony
+    library anymore are evicted.
+
+    Runs at 03:30 every day.
+    """
+
+    try:
+        evicted_entries_count = InstrumentsCache().revalidate()
+        print(f"INFO:\t  Instruments cache re-validated, {evicted_entries_count} entries evicted...")
+    except (Exception,) as e:
+        print(f"Could not re-validate instruments cache: {str(e)}.")
@@ -0,0 +1,102 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from typing import List, Literal
+
+from harmony.schemas.requests.text import Instrument, Question
+from harmony.schemas.responses.text import HarmonyCluster, InstrumentToInstrumentSimilarity, MatchResponse
+from pydantic import BaseModel, Field
+
+
+class SparseMatrix(BaseModel):
+    """
+    A sparse matrix in coordinate form: the score at (rows[i], cols[i]) is scores[i], the other scores are left out.
+    """
+
+    shape: List[int] = Field(description="The number of rows and columns of the full matrix")
+    rows: List[int] = Field(description="The row of every score")
+    cols: List[int] = Field(description="The column of every score")
+    scores: List[float] = Field(description="The scores")
+
+
+class HarmonyApiMatchResponse(MatchResponse):
+    """
+    The match response, with the matrices either dense or sparse.
+    """
+
+    matches: List[List] | None = Field(None, description="Matrix of cosine similarity matches for the questions")
+    response_options_similarity: List[List] | None = Field(
+        None, description="Matrix of cosine similarity matches for the response options"
+    )
+    sparse_matches: SparseMatrix | None = Field(
+        None, description="The best cosine similarity matches of every question, when a top k or a threshold is given"
+    )
+    sparse_response_options_similarity: SparseMatrix | None = Field(
+        None,
+        description="The best cosine similarity matches of every response options, when a top k or a threshold is "
+                    "given"
+    )
+
+
+class MatchSessionResponse(BaseModel):
+    """
+    The match response of the instruments added to a match session.
+    """
+
+    session_id: str = Field(description="The ID of the match session")
+    instruments: List[Instrument] = Field(description="The instruments added to the match session")
+    questions: List[Question] = Field(description="The questions of the instruments added to the match session")
+    first_question_idx: int = Field(
+        description="The index of the first added question among all the questions of the match session"
+    )
+    matches: List[List] = Field(
+        description="Matrix of cosine similarity matches of the added questions (rows) with all the questions of the "
+                    "match session (columns)"
+    )
+    query_similarity: List | None = Field(
+        None, description="Similarity metric between the query string and the added questions"
+    )
+    instrument_to_instrument_similarities: List[InstrumentToInstrumentSimilarity] = Field(
+        description="A list of similarity values (precision, recall, F1) between all the instruments of the match "
+                    "session"
+    )
+    clusters: List[HarmonyCluster] = Field(description="The clusters of all the questions of the match session")
+
+
+class ParsedFileResponse(BaseModel):
+    """
+    The instruments of one file, streamed by /text/parse as soon as the file is parsed.
+    """
+
+    file_idx: int = Field(description="The index of the file in the request")
+    file_id: str | None = Field(None, description="Unique identifier for the file")
+    file_name: str = Field(description="The name of the file")
+    status: Literal["cached", "parsed", "failed"] = Field(
+        description="Whether the instruments were cached, or the file was parsed, or the parsing failed"
+    )
+    parse_time: float = Field(description="The time in seconds spent parsing the file, 0 if the instruments were cached")
+    instruments: List[Instrument] = Field([], description="The instruments of the file")
+    error: str | None = Field(None, description="Why the parsing failed")
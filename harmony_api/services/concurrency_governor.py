@@ -0,0 +1,128 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+import torch
+from threadpoolctl import threadpool_limits
+
+from harmony_api.core.settings import get_settings
+from harmony_api.utils.singleton_meta import SingletonMeta
+
+settings = get_settings()
+
+
+class ConcurrencyGovernor(metaclass=SingletonMeta):
+    """
+    This class is responsible for limiting the CPU-heavy jobs running at the same time (Singleton class).
+
+    Every job gets a share of the CPUs: the torch, OpenMP and BLAS thread counts are set to the number of CPUs divided
+    by the number of jobs in flight. These thread counts are process-wide, so they are updated whenever a job starts
+    or finishes.
+    """
+
+    def __init__(self):
+        self.__cpu_count = os.cpu_count() or 1
+        self.__max_concurrent_jobs = settings.MAX_CONCURRENT_CPU_JOBS or max(1, self.__cpu_count // 2)
+        self.__min_threads_per_job = max(1, settings.MIN_THREADS_PER_CPU_JOB)
+
+        self.__semaphore = threading.BoundedSemaphore(self.__max_concurrent_jobs)
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+        self.__jobs_in_flight = 0
+        self.__jobs_waiting = 0
+        self.__threads_per_job = self.__cpu_count
+
+    def __get_threads_per_job(self) -> int:
+        return max(self.__min_threads_per_job, self.__cpu_count // max(1, self.__jobs_in_flight))
+
+    def __set_threads(self, threads: int):
+        """
+        Set the torch, OpenMP and BLAS thread counts.
+        """
+
+        if threads == self.__threads_per_job:
+            return
+
+        torch.set_num_threads(threads)
+        threadpool_limits(limits=threads)
+        self.__threads_per_job = threads
+
+    @contextmanager
+    def cpu_job(self, set_threads: bool = True):
+        """
+        Run a CPU-heavy job, waiting while the max number of jobs are in flight.
+
+        Nested jobs in the same thread are part of the outer job and are not limited again.
+
+        :param set_threads: Set the thread counts of this process, this is not needed when the work runs in other
+            processes.
+        """
+
+        if getattr(self.__local, "depth", 0) > 0:
+            self.__local.depth += 1
+            try:
+                yield
+            finally:
+                self.__local.depth -= 1
+            return
+
+        with self.__lock:
+            self.__jobs_waiting += 1
+        self.__semaphore.acquire()
+        with self.__lock:
+            self.__jobs_waiting -= 1
+            self.__jobs_in_flight += 1
+            if set_threads:
+                self.__set_threads(self.__get_threads_per_job())
+
+        self.__local.depth = 1
+        try:
+            yield
+        finally:
+            self.__local.depth = 0
+            with self.__lock:
+                self.__jobs_in_flight -= 1
+                if set_threads:
+                    self.__set_threads(self.__get_threads_per_job())
+            self.__semaphore.release()
+
+    def get_settings(self) -> dict:
+        """
+        Get the settings and the current load of the governor.
+        """
+
+        with self.__lock:
+            return {
+                "cpu_count": self.__cpu_count,
+                "max_concurrent_jobs": self.__max_concurrent_jobs,
+                "min_threads_per_job": self.__min_threads_per_job,
+                "threads_per_job": self.__threads_per_job,
+                "jobs_in_flight": self.__jobs_in_flight,
+                "jobs_waiting": self.__jobs_waiting,
+            }
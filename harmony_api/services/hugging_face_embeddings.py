@@ -1,21 +1,218 @@
+import os
+
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
 from harmony_api.constants import HUGGINGFACE_MINILM_L12_V2, HUGGINGFACE_MPNET_BASE_V2, \
     HUGGINGFACE_MENTAL_HEALTH_HARMONISATION_1
+from harmony_api.core.settings import get_settings
+
+settings = get_settings()
+
+data_path = os.getenv("HARMONY_DATA_PATH", os.getcwd())
+onnx_models_path = settings.HUGGING_FACE_ONNX_MODELS_PATH or os.path.join(data_path, "onnx_models")
+
+# Model name -> the version of its vectors: the commit of the model on the Hugging Face Hub, and the ONNX backend and
+# quantisation the model was loaded with
+HUGGING_FACE_MODEL_VERSIONS: dict[str, str] = {}
+
+
+def get_hub_commit_hash(model_name: str) -> str | None:
+    """
+    :param model_name: The model name.
+
+    Get the commit of the model on the Hugging Face Hub that is in the local cache, i.e. the commit it was loaded from,
+    or None if the model isn't in the cache.
+    """
+
+    from huggingface_hub import try_to_load_from_cache
+
+    try:
+        config_file_path = try_to_load_from_cache(model_name, "config.json")
+    except (Exception,):
+        return None
+
+    # The cached files are stored in the folder snapshots/<commit hash>
+    if not isinstance(config_file_path, str):
+        return None
+
+    return os.path.basename(os.path.dirname(config_file_path))
+
+
+def __get_model_version(model_name: str, backend: str | None = None) -> str:
+    commit_hash = get_hub_commit_hash(model_name) or ""
+    if not backend:
+        return commit_hash
+
+    return f"{commit_hash}+{backend}" if commit_hash else backend
+
+
+def get_onnx_model_file_name(quantisation: str | None) -> str:
+    """
+    :param quantisation: The quantisation config e.g. "avx512_vnni", or None for the non-quantised model.
+
+    Get the file name of the exported ONNX model, relative to the exported model folder.
+    """
+
+    if quantisation:
+        return f"onnx/model_qint8_{quantisation}.onnx"
+
+    return "onnx/model.onnx"
+
+
+def load_onnx_sentence_transformer(model_name: str, quantisation: str | None = None) -> SentenceTransformer:
+    """
+    :param model_name: The model name.
+    :param quantisation: Apply dynamic int8 quantisation for this CPU architecture e.g. "avx512_vnni".
+
+    Load a sentence transformer which runs through ONNX Runtime.
+
+    The model is exported to ONNX (and quantised) the first time and the export is reused on the next startups.
+    """
+
+    import onnxruntime
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    export_path = os.path.join(onnx_models_path, model_name.replace("/", "-"))
+    file_name = get_onnx_model_file_name(quantisation)
+
+    # Export the model
+    if not os.path.isfile(os.path.join(export_path, get_onnx_model_file_name(None))):
+        print(f"INFO:\t  Exporting {model_name} to ONNX...")
+        SentenceTransformer(model_name, backend="onnx").save_pretrained(export_path)
+
+    # Quantise the exported model
+    if not os.path.isfile(os.path.join(export_path, file_name)):
+        print(f"INFO:\t  Quantising {model_name} for {quantisation}...")
+        export_dynamic_quantized_onnx_model(
+            model=SentenceTransformer(export_path, backend="onnx"),
+            quantization_config=quantisation,
+            model_name_or_path=export_path,
+        )
+
+    session_options = onnxruntime.SessionOptions()
+    if settings.ONNX_INTRA_OP_NUM_THREADS > 0:
+        session_options.intra_op_num_threads = settings.ONNX_INTRA_OP_NUM_THREADS
+    if settings.ONNX_INTER_OP_NUM_THREADS > 0:
+        session_options.inter_op_num_threads = settings.ONNX_INTER_OP_NUM_THREADS
+        session_options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+
+    return SentenceTransformer(
+        export_path,
+        backend="onnx",
+        model_kwargs={
+            "file_name": file_name,
+            "provider": "CPUExecutionProvider",
+            "session_options": session_options,
+        },
+    )
+
+
+def __load_sentence_transformer(model_name: str) -> SentenceTransformer:
+    """
+    :param model_name: The model name.
+
+    Load a sentence transformer with the configured backend.
+    """
+
+    if settings.HUGGING_FACE_BACKEND == "onnx":
+        try:
+            model = load_onnx_sentence_transformer(
+                model_name=model_name, quantisation=settings.HUGGING_FACE_ONNX_QUANTISATION
+            )
+            quantisation = settings.HUGGING_FACE_ONNX_QUANTISATION
+            HUGGING_FACE_MODEL_VERSIONS[model_name] = __get_model_version(
+                model_name, backend=f"onnx-{quantisation}" if quantisation else "onnx"
+            )
+
+            return model
+        except (Exception,) as e:
+            print(f"Could not load the ONNX model {model_name}, falling back to PyTorch. Error: {str(e)}")
+
+    model = SentenceTransformer(model_name)
+    HUGGING_FACE_MODEL_VERSIONS[model_name] = __get_model_version(model_name)
+
+    return model
+
+
+def get_length_buckets(token_lengths: list[int], batch_size: int, token_budget: int) -> list[list[int]]:
+    """
+    :param token_lengths: The token length of each text.
+    :param batch_size: The max number of texts in a bucket.
+    :param token_budget: The max number of tokens in a bucket, counting the padding up to its longest text.
+
+    Group the indexes of the texts into buckets of similar token length.
+
+    The texts are sorted from the longest to the shortest, so each bucket is padded to the length of its first text. A
+    text that exceeds the token budget on its own gets a bucket for itself.
+    """
+
+    buckets: list[list[int]] = []
+    bucket: list[int] = []
+    bucket_padded_length = 0
+    for idx in sorted(range(len(token_lengths)), key=lambda i: token_lengths[i], reverse=True):
+        if bucket and (
+                len(bucket) >= batch_size or (len(bucket) + 1) * bucket_padded_length > token_budget
+        ):
+            buckets.append(bucket)
+            bucket = []
+        if not bucket:
+            bucket_padded_length = token_lengths[idx]
+        bucket.append(idx)
+    if bucket:
+        buckets.append(bucket)
+
+    return buckets
+
+
+def encode_length_bucketed(
+        model: SentenceTransformer, texts: list[str], batch_size: int, token_budget: int
+) -> np.ndarray:
+    """
+    :param model: The sentence transformer.
+    :param texts: List of texts.
+    :param batch_size: The max number of texts encoded together.
+    :param token_budget: The max number of tokens (including padding) encoded together.
+
+    Encode texts in buckets of similar token length to reduce the padding, the order of the texts is kept.
+    """
+
+    token_lengths = [
+        min(len(input_ids), model.max_seq_length)
+        for input_ids in model.tokenizer(texts, add_special_tokens=True)["input_ids"]
+    ]
+
+    embeddings = None
+    for bucket in get_length_buckets(token_lengths, batch_size=batch_size, token_budget=token_budget):
+        bucket_embeddings = model.encode(
+            sentences=[texts[idx] for idx in bucket], batch_size=len(bucket), convert_to_numpy=True
+        )
+        if embeddings is None:
+            embeddings = np.zeros((len(texts), bucket_embeddings.shape[1]), dtype=bucket_embeddings.dtype)
+        embeddings[bucket] = bucket_embeddings
+
+    return embeddings
+
 
 # Load Hugging Face sentence transformers
 print("INFO:\t  Checking Hugging Face models...")
-model_huggingface_minilm_l12_v2 = SentenceTransformer(
+model_huggingface_minilm_l12_v2 = __load_sentence_transformer(
     HUGGINGFACE_MINILM_L12_V2["model"]
 )
-model_huggingface_mpnet_base_v2 = SentenceTransformer(
+model_huggingface_mpnet_base_v2 = __load_sentence_transformer(
     HUGGINGFACE_MPNET_BASE_V2["model"]
 )
-model_huggingface_mental_health_harmonisation = SentenceTransformer(
+model_huggingface_mental_health_harmonisation = __load_sentence_transformer(
     HUGGINGFACE_MENTAL_HEALTH_HARMONISATION_1["model"]
 )
 
+# Model name -> sentence transformer
+HUGGING_FACE_MODELS: dict[str, SentenceTransformer] = {
+    HUGGINGFACE_MINILM_L12_V2["model"]: model_huggingface_minilm_l12_v2,
+    HUGGINGFACE_MPNET_BASE_V2["model"]: model_huggingface_mpnet_base_v2,
+    HUGGINGFACE_MENTAL_HEALTH_HARMONISATION_1["model"]: model_huggingface_mental_health_harmonisation,
+}
+
 def __get_hugging_face_embeddings(texts: list[str], model_name: str) -> np.ndarray:
     """
     :param texts: List of texts.
@@ -27,22 +224,19 @@ def __get_hugging_face_embeddings(texts: list[str], model_name: str) -> np.ndarr
     if not texts:
         return np.array([])
 
-    embeddings = []
+    model = HUGGING_FACE_MODELS[model_name]
 
-    if model_name == HUGGINGFACE_MINILM_L12_V2["model"]:
-        embeddings = model_huggingface_minilm_l12_v2.encode(
-            sentences=texts, convert_to_numpy=True
-        )
-    elif model_name == HUGGINGFACE_MPNET_BASE_V2["model"]:
-        embeddings = model_huggingface_mpnet_base_v2.encode(
-            sentences=texts, convert_to_numpy=True
-        )
-    elif model_name == HUGGINGFACE_MENTAL_HEALTH_HARMONISATION_1["model"]:
-        embeddings = model_huggingface_mental_health_harmonisation.encode(
-            sentences=texts, convert_to_numpy=True
+    if settings.HUGGING_FACE_ENCODE_TOKEN_BUDGET <= 0:
+        return model.encode(
+            sentences=texts, batch_size=settings.HUGGING_FACE_ENCODE_BATCH_SIZE, convert_to_numpy=True
         )
 
-    return embeddings
+    return encode_length_bucketed(
+        model=model,
+        texts=texts,
+        batch_size=settings.HUGGING_FACE_ENCODE_BATCH_SIZE,
+        token_budget=settings.HUGGING_FACE_ENCODE_TOKEN_BUDGET,
+    )
 
 
 def get_hugging_face_embeddings_mpnet_base_v2(texts: list[str]) -> np.ndarray:
@@ -24,72 +24,327 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-import json
+import base64
+import binascii
 import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
 from hashlib import sha256
-from typing import List
+from importlib import metadata
+from typing import List, NamedTuple
 
+import harmony
+from harmony.schemas.enums.file_types import FileType
 from harmony.schemas.requests.text import Instrument
+from pydantic import TypeAdapter
 
 from harmony_api import constants
+from harmony_api.core.settings import get_settings
+from harmony_api.services.metrics import Metrics
 from harmony_api.utils.singleton_meta import SingletonMeta
 
+settings = get_settings()
+
 data_path = os.getenv("HARMONY_DATA_PATH", os.getcwd())
-cache_file_path = os.path.join(data_path, constants.INSTRUMENTS_CACHE_JSON_FILENAME)
+cache_dir_path = os.path.join(data_path, constants.INSTRUMENTS_CACHE_DIRNAME)
+
+instruments_adapter = TypeAdapter(List[Instrument])
+
+
+def __get_parser_version() -> str:
+    # The library is loaded from the harmony submodule on the servers, where it isn't pip-installed
+    version = getattr(harmony, "__version__", None)
+    if version:
+        return version
+    try:
+        return metadata.version("harmonydata")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+# The version of the Harmony library parsing the files, a new version parses the files again
+PARSER_VERSION = __get_parser_version()
+
+
+def __get_text_extractor() -> str:
+    if not settings.PARSE_PDF_WITHOUT_TIKA:
+        return ""
+    try:
+        return f"pypdf-{metadata.version('pypdf')}"
+    except metadata.PackageNotFoundError:
+        return "pypdf"
+
+
+# The extractor of the text of the PDFs when it isn't Tika, the PDFs are parsed again when it changes
+TEXT_EXTRACTOR = __get_text_extractor()
+
+# The entries of a parser version are stored in their own directory
+parser_version_dir_path = os.path.join(cache_dir_path, PARSER_VERSION)
+
+
+def get_key_hash(file_type: FileType | None = None):
+    """
+    Get a hash object to compute an instruments cache key, by adding the bytes of a file to it.
+
+    The parser version is hashed first, so the files are parsed again when it changes. The text extractor is hashed
+    too for the PDFs, the only files it extracts.
+
+    :param file_type: The file type.
+    """
+
+    if TEXT_EXTRACTOR and file_type == FileType.pdf:
+        return sha256(f"{PARSER_VERSION}\0{TEXT_EXTRACTOR}\0".encode())
+
+    return sha256(f"{PARSER_VERSION}\0".encode())
+
+
+def get_content_bytes(content: str) -> bytes:
+    """
+    Get the bytes of the content of a RawFile, decoding the base64 of data URIs.
+
+    The line wrapping of the base64 and the media type of the data URI don't change the bytes.
+    """
+
+    header, separator, data = content.partition(",")
+    if separator and header.startswith("data:") and header.endswith(";base64"):
+        try:
+            return base64.b64decode(data)
+        except (binascii.Error, ValueError):
+            pass
+
+    return content.encode()
+
+
+class CacheEntry(NamedTuple):
+    """
+    The size in bytes of the JSON of an instruments cache entry, and when it was last used.
+    """
+
+    size: int
+    last_used: float
 
 
 class InstrumentsCache(metaclass=SingletonMeta):
     """
     This class is responsible for caching instruments (Singleton class).
+
+    The cache is content-addressed: the key of a file is the hash of its bytes. Every entry is stored in its own JSON
+    file on disk, which is only read and validated when the entry is needed. At most INSTRUMENTS_CACHE_MAX_DECODED
+    entries are kept in memory as instruments, the least recently used is dropped first and read again when needed.
+    The entries not saved yet are kept in memory as JSON.
+
+    The entries take at most INSTRUMENTS_CACHE_MAX_MB, the least recently used are evicted first, and the entries not
+    used for INSTRUMENTS_CACHE_TTL_DAYS are evicted too.
+
+    The entries are stored in a directory per parser version, only the entries of the current parser version are
+    loaded. The entries of the other versions stay on disk until they are invalidated.
     """
 
     def __init__(self):
         print("INFO:\t  Loading instruments cache...")
 
-        self.__cache: dict[str, List[Instrument]] = {}
+        self.__lock = threading.Lock()
+
+        # Every entry, on disk or not saved yet, the least recently used first
+        self.__entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.__size = 0
+
+        # The recently used instruments, the least recently used first
+        self.__decoded: OrderedDict[str, List[Instrument]] = OrderedDict()
+
+        # The JSON of the entries not saved yet
+        self.__unsaved: dict[str, bytes] = {}
+
+        # The entries used since the last save, their files are touched so their use is remembered after a restart
+        self.__used_keys: set[str] = set()
 
         self.__load()
 
+    def __get_entry_path(self, key: str) -> str:
+        return os.path.join(parser_version_dir_path, key[:2], f"{key}.json")
+
+    def __get_max_size(self) -> int:
+        return settings.INSTRUMENTS_CACHE_MAX_MB * 1024 * 1024
+
+    def __is_expired(self, entry: CacheEntry) -> bool:
+        if settings.INSTRUMENTS_CACHE_TTL_DAYS <= 0:
+            return False
+
+        return time.time() - entry.last_used > settings.INSTRUMENTS_CACHE_TTL_DAYS * 24 * 60 * 60
+
     def __load(self):
         """
-        Load cache.
+        Load the keys of the cache, the entries are read on the first `get`.
+
+        The last modification of an entry file is when the entry was last used.
         """
 
-        if os.path.isfile(cache_file_path):
-            with open(cache_file_path, "r", encoding="utf8") as file:
-                try:
-                    cache: dict[str, list] = json.loads(file.read())
-                except json.decoder.JSONDecodeError:
-                    cache: dict[str, list] = {}
-        else:
-            cache: dict[str, list] = {}
+        if not os.path.isdir(parser_version_dir_path):
+            return
+
+        entries: list[tuple[str, CacheEntry]] = []
+        for dir_entry in os.scandir(parser_version_dir_path):
+            if not dir_entry.is_dir():
+                continue
+            for file_entry in os.scandir(dir_entry.path):
+                if file_entry.name.endswith(".json"):
+                    stat = file_entry.stat()
+                    entry = CacheEntry(size=stat.st_size, last_used=stat.st_mtime)
+                    entries.append((file_entry.name.removesuffix(".json"), entry))
+
+        for key, entry in sorted(entries, key=lambda x: x[1].last_used):
+            self.__entries[key] = entry
+            self.__size += entry.size
+
+        with self.__lock:
+            evicted_keys = self.__evict_expired() + self.__evict_least_recently_used()
+        self.__delete_files(evicted_keys)
+
+    def __remove(self, key: str):
+        """
+        Remove an entry from memory, its file must be deleted after.
+        """
+
+        entry = self.__entries.pop(key, None)
+        if entry is not None:
+            self.__size -= entry.size
+        self.__decoded.pop(key, None)
+        self.__unsaved.pop(key, None)
+        self.__used_keys.discard(key)
+
+    def __evict(self, keys: List[str]) -> List[str]:
+        for key in keys:
+            self.__remove(key)
+
+        if keys:
+            Metrics().increment("instruments_cache_evictions", len(keys))
+
+        return keys
+
+    def __evict_least_recently_used(self, keep_key: str | None = None) -> List[str]:
+        """
+        Evict the least recently used entries until the cache fits in INSTRUMENTS_CACHE_MAX_MB.
+        """
+
+        keys: List[str] = []
+        size = self.__size
+        for key, entry in self.__entries.items():
+            if size <= self.__get_max_size():
+                break
+            if key != keep_key:
+                keys.append(key)
+                size -= entry.size
+
+        return self.__evict(keys)
+
+    def __evict_expired(self) -> List[str]:
+        """
+        Evict the entries not used for INSTRUMENTS_CACHE_TTL_DAYS.
+        """
 
-        #  Dict to instruments
-        cache_parsed: dict[str, List[Instrument]] = {}
-        for key, value in cache.items():
-            instruments = [Instrument.model_validate(x) for x in value]
-            cache_parsed[key] = instruments
+        keys: List[str] = []
+        for key, entry in self.__entries.items():
+            # The entries are ordered by last use, the other entries are more recent
+            if not self.__is_expired(entry):
+                break
+            keys.append(key)
 
-        self.__cache = cache_parsed
+        return self.__evict(keys)
+
+    def __delete_files(self, keys: List[str]):
+        for key in keys:
+            try:
+                os.remove(self.__get_entry_path(key))
+            except FileNotFoundError:
+                pass
+
+    def __read(self, key: str) -> List[Instrument] | None:
+        """
+        Read an entry from disk.
+        """
+
+        try:
+            with open(self.__get_entry_path(key), "rb") as file:
+                return instruments_adapter.validate_json(file.read())
+        except (Exception,) as e:
+            print(f"Could not read instruments cache entry {key}: {str(e)}.")
+            return None
+
+    def __add_decoded(self, key: str, value: List[Instrument]):
+        """
+        Add instruments to the recently used instruments, dropping the least recently used.
+        """
+
+        self.__decoded[key] = value
+        self.__decoded.move_to_end(key)
+        while 0 < settings.INSTRUMENTS_CACHE_MAX_DECODED < len(self.__decoded):
+            self.__decoded.popitem(last=False)
 
     def set(self, key: str, value: List[Instrument]):
         """
         :param key: The cache key.
         :param value: The cache value.
 
-        Set key value pair.
+        Set key value pair. An entry larger than INSTRUMENTS_CACHE_MAX_MB is not cached.
         """
 
-        self.__cache[key] = value
+        value_json = instruments_adapter.dump_json(value, exclude_none=True)
+        if len(value_json) > self.__get_max_size():
+            return
 
-    def get(self, key: str) -> List[Instrument]:
+        with self.__lock:
+            self.__remove(key)
+            self.__entries[key] = CacheEntry(size=len(value_json), last_used=time.time())
+            self.__size += len(value_json)
+            self.__add_decoded(key, value)
+            self.__unsaved[key] = value_json
+            evicted_keys = self.__evict_least_recently_used(keep_key=key)
+
+        self.__delete_files(evicted_keys)
+
+    def get(self, key: str) -> List[Instrument] | None:
         """
         :param key: The cache key.
 
-        Get value by key.
+        Get value by key, or None if the key isn't in the cache.
         """
 
-        return self.__cache.get(key)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            is_hit = entry is not None and not self.__is_expired(entry)
+            Metrics().increment("instruments_cache_hits" if is_hit else "instruments_cache_misses")
+
+            if not is_hit:
+                evicted_keys = self.__evict([key]) if entry is not None else []
+            else:
+                self.__entries[key] = entry._replace(last_used=time.time())
+                self.__entries.move_to_end(key)
+                self.__used_keys.add(key)
+                if key in self.__decoded:
+                    self.__decoded.move_to_end(key)
+                    return self.__decoded[key]
+                value_json = self.__unsaved.get(key)
+
+        if not is_hit:
+            self.__delete_files(evicted_keys)
+            return None
+
+        # Read and validate outside the lock, an entry decoded twice at the same time is the same
+        if value_json is not None:
+            value = instruments_adapter.validate_json(value_json)
+        else:
+            value = self.__read(key)
+
+        with self.__lock:
+            if value is None:
+                self.__remove(key)
+                return None
+            if key not in self.__decoded:
+                self.__add_decoded(key, value)
+
+            return self.__decoded[key]
 
     def has(self, key: str) -> bool:
         """
@@ -98,34 +353,147 @@ class InstrumentsCache(metaclass=SingletonMeta):
         Check if key is in cache.
         """
 
-        return key in self.__cache
+        entry = self.__entries.get(key)
+
+        return entry is not None and not self.__is_expired(entry)
 
     def get_cache(self) -> dict[str, List[Instrument]]:
         """
-        Get the whole cache from memory.
+        Get the whole cache, reading every entry from disk. This doesn't count as a use of the entries.
+        """
+
+        with self.__lock:
+            keys = list(self.__entries)
+            decoded = dict(self.__decoded)
+            unsaved = dict(self.__unsaved)
+
+        cache: dict[str, List[Instrument]] = {}
+        for key in keys:
+            if key in decoded:
+                value = decoded[key]
+            elif key in unsaved:
+                value = instruments_adapter.validate_json(unsaved[key])
+            else:
+                value = self.__read(key)
+            if value is not None:
+                cache[key] = value
+
+        return cache
+
+    def get_stats(self) -> dict[str, int]:
+        """
+        Get the number of entries and their size in bytes.
+        """
+
+        with self.__lock:
+            return {
+                "instruments_cache_entries": len(self.__entries),
+                "instruments_cache_size_bytes": self.__size,
+                "instruments_cache_decoded_entries": len(self.__decoded),
+            }
+
+    def revalidate(self) -> int:
+        """
+        Read and validate the saved entries not in memory, the entries which can't be read as instruments anymore are
+        evicted. This doesn't count as a use of the entries.
+
+        :return: The number of evicted entries.
+        """
+
+        with self.__lock:
+            keys = [key for key in self.__entries if key not in self.__decoded and key not in self.__unsaved]
+
+        invalid_keys: List[str] = []
+        for key in keys:
+            try:
+                with open(self.__get_entry_path(key), "rb") as file:
+                    instruments_adapter.validate_json(file.read())
+            except FileNotFoundError:
+                # The entry was evicted in the meantime
+                continue
+            except (Exception,) as e:
+                print(f"Instruments cache entry {key} is not valid: {str(e)}.")
+                invalid_keys.append(key)
+
+        with self.__lock:
+            # An entry set again in the meantime is valid
+            evicted_keys = self.__evict([
+                key for key in invalid_keys if key in self.__entries and key not in self.__unsaved
+            ])
+        self.__delete_files(evicted_keys)
+
+        return len(evicted_keys)
+
+    def invalidate_other_versions(self) -> int:
+        """
+        Delete the entries of the parser versions other than the current one from disk.
+
+        :return: The number of deleted entries.
         """
 
-        return self.__cache
+        if not os.path.isdir(cache_dir_path):
+            return 0
+
+        count = 0
+        for version_dir_entry in os.scandir(cache_dir_path):
+            if not version_dir_entry.is_dir() or version_dir_entry.path == parser_version_dir_path:
+                continue
+            for _, _, file_names in os.walk(version_dir_entry.path):
+                count += len([file_name for file_name in file_names if file_name.endswith(".json")])
+            shutil.rmtree(version_dir_entry.path, ignore_errors=True)
+
+        return count
 
     def save(self):
         """
-        Save cache to disk.
+        Save the entries not saved yet to disk, and evict the expired entries.
         """
 
-        # Instruments to dict
-        cache_parsed: dict[str, List] = {}
-        for key, value in self.__cache.items():
-            instruments = [x.model_dump(mode="json") for x in value]
-            cache_parsed[key] = instruments
+        with self.__lock:
+            evicted_keys = self.__evict_expired()
+            entries = dict(self.__unsaved)
+            used_keys = self.__used_keys - set(entries)
+            self.__used_keys = set()
+
+        self.__delete_files(evicted_keys)
 
-        with open(cache_file_path, "w", encoding="utf8") as file:
-            file.write(json.dumps(cache_parsed, ensure_ascii=False))
+        for key, value_json in entries.items():
+            entry_path = self.__get_entry_path(key)
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
 
-        print(f"INFO:\t  Cache {constants.INSTRUMENTS_CACHE_JSON_FILENAME} saved...")
+            # Write to a temporary file first, so a crash never leaves a partial entry
+            tmp_entry_path = f"{entry_path}.tmp"
+            with open(tmp_entry_path, "wb") as file:
+                file.write(value_json)
+            os.replace(tmp_entry_path, entry_path)
 
-    def generate_key(self, text: str) -> str:
+            # The entry is only dropped from memory once it can be read from disk
+            with self.__lock:
+                is_evicted = key not in self.__entries
+                if self.__unsaved.get(key) is value_json:
+                    del self.__unsaved[key]
+
+            # The entry was evicted while it was written
+            if is_evicted:
+                self.__delete_files([key])
+
+        for key in used_keys:
+            try:
+                os.utime(self.__get_entry_path(key))
+            except FileNotFoundError:
+                pass
+
+        print(f"INFO:\t  Cache {constants.INSTRUMENTS_CACHE_DIRNAME} saved ({len(entries)} new entries)...")
+
+    def generate_key(self, text: str, file_type: FileType | None = None) -> str:
         """
-        Generate key.
+        Generate the key of the content of a RawFile.
+
+        :param text: The content.
+        :param file_type: The file type.
         """
 
-        return sha256(text.encode()).hexdigest()
+        key_hash = get_key_hash(file_type)
+        key_hash.update(get_content_bytes(text))
+
+        return key_hash.hexdigest()
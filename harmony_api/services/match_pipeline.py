@@ -0,0 +1,1169 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import pathlib
+import time
+from collections import Counter
+from typing import Callable, List
+
+import numpy as np
+from harmony.matching import matcher
+from harmony.matching.affinity_propagation_clustering import cluster_questions_affinity_propagation
+from harmony.matching.deterministic_clustering import find_clusters_deterministic
+from harmony.matching.generate_cluster_topics import generate_cluster_topics
+from harmony.matching.hdbscan_clustering import cluster_questions_hdbscan_from_embeddings
+from harmony.matching.instrument_to_instrument_similarity import get_instrument_similarity, get_precision_recall_f1
+from harmony.matching.kmeans_clustering import cluster_questions_kmeans_from_embeddings
+from harmony.matching.matcher import cosine_similarity, is_empty_or_null_text
+from harmony.schemas.enums.clustering_algorithms import ClusteringAlgorithm
+from harmony.schemas.requests.text import Instrument, Question
+from harmony.schemas.responses.text import HarmonyCluster, InstrumentToInstrumentSimilarity, MatchResult
+from langdetect import detect
+from scipy.sparse import coo_matrix
+
+from harmony_api.core.settings import get_settings
+from harmony_api.schemas.enums import HarmonyApiClusteringAlgorithm
+from harmony_api.services.scalable_clustering import cluster_questions_knn_graph, cluster_questions_minibatch_kmeans
+
+settings = get_settings()
+
+# The library matcher negates the texts in English
+NEGATION_LANGUAGE = "en"
+
+# A question is tagged with a topic when one of its words has at least this similarity with the topic
+QUESTION_TOPIC_SIMILARITY_THRESHOLD = 0.7
+
+# These clustering algorithms need the full similarity matrix, the others only need the vectors or the kNN similarity
+DENSE_SIMILARITY_CLUSTERING_ALGORITHMS = [
+    HarmonyApiClusteringAlgorithm.affinity_propagation,
+    HarmonyApiClusteringAlgorithm.deterministic,
+]
+
+# These clustering algorithms are those of the library matcher
+LIBRARY_CLUSTERING_ALGORITHMS = [
+    HarmonyApiClusteringAlgorithm.affinity_propagation,
+    HarmonyApiClusteringAlgorithm.deterministic,
+    HarmonyApiClusteringAlgorithm.kmeans,
+    HarmonyApiClusteringAlgorithm.hdbscan,
+]
+
+# These clustering algorithms don't scale to large matches, they are replaced by the kNN graph clustering past
+# CLUSTERING_MAX_QUESTIONS questions
+UNSCALABLE_CLUSTERING_ALGORITHMS = [
+    HarmonyApiClusteringAlgorithm.affinity_propagation,
+    HarmonyApiClusteringAlgorithm.deterministic,
+    HarmonyApiClusteringAlgorithm.hdbscan,
+]
+
+# The number of full-width temporary matrices created when computing a tile of the similarity with polarity
+SIMILARITY_WITH_POLARITY_TILE_MATRICES = 10
+
+
+def get_distinct_texts(texts: List[str]) -> tuple[List[str], np.ndarray]:
+    """
+    Get the distinct texts and, for every text, the index of its distinct text.
+
+    :param texts: List of texts.
+    :return: The distinct texts in order of first appearance and the array of indexes into them.
+    """
+
+    text_to_idx: dict[str, int] = {}
+    idxs = np.empty(len(texts), dtype=np.int64)
+    for idx, text in enumerate(texts):
+        idxs[idx] = text_to_idx.setdefault(text, len(text_to_idx))
+
+    return list(text_to_idx), idxs
+
+
+def get_clustering_algorithm(
+        clustering_algorithm: HarmonyApiClusteringAlgorithm, num_questions: int
+) -> HarmonyApiClusteringAlgorithm:
+    """
+    Get the clustering algorithm used for a match, the kNN graph clustering replaces the algorithms that don't scale
+    past CLUSTERING_MAX_QUESTIONS questions.
+
+    :param clustering_algorithm: The requested clustering algorithm.
+    :param num_questions: The number of questions.
+    """
+
+    if (
+            0 < settings.CLUSTERING_MAX_QUESTIONS < num_questions
+            and clustering_algorithm in UNSCALABLE_CLUSTERING_ALGORITHMS
+    ):
+        return HarmonyApiClusteringAlgorithm.knn_graph
+
+    return clustering_algorithm
+
+
+def get_tile_rows(row_size: int) -> int:
+    """
+    Get the number of rows of a tile, so that a tile fits in the memory ceiling (MATCH_TILE_MEMORY_MB).
+
+    :param row_size: The number of float64 values held for every row of the tile.
+    """
+
+    return max(1, settings.MATCH_TILE_MEMORY_MB * 1024 * 1024 // (8 * max(1, row_size)))
+
+
+def get_sparse_similarity_from_tiles(
+        get_tile: Callable[[int, int], np.ndarray],
+        num_distinct_items: int,
+        idx_to_distinct_idx: np.ndarray,
+        top_k: int | None = None,
+        threshold: float | None = None,
+        tile_row_size: int = 0,
+) -> coo_matrix:
+    """
+    Get the top k matches of every item, and/or the matches with at least the threshold score, as a sparse matrix.
+
+    The similarity matrix of the distinct items is computed one tile of rows at a time, and every tile is reduced to
+    its best matches before the next one, so neither the full matrix of the items nor the full matrix of the distinct
+    items is built. An item is not matched with itself.
+
+    :param get_tile: Function that receives the first and the last (excluded) rows of a tile and returns the
+        similarity of those distinct items with all the distinct items.
+    :param num_distinct_items: The number of distinct items.
+    :param idx_to_distinct_idx: For every item, the index of its distinct item.
+    :param top_k: The max number of matches of every item.
+    :param threshold: The min score of a match.
+    :param tile_row_size: The number of float64 values held for every row of a tile by `get_tile`.
+    :return: The (number of items) x (number of items) sparse similarity matrix, sorted by item and then by
+        descending score.
+    """
+
+    num_items = len(idx_to_distinct_idx)
+
+    distinct_idx_to_idxs: List[List[int]] = [[] for _ in range(num_distinct_items)]
+    for idx, distinct_idx in enumerate(idx_to_distinct_idx):
+        distinct_idx_to_idxs[distinct_idx].append(idx)
+
+    rows, cols, scores = [], [], []
+    tile_rows = get_tile_rows(tile_row_size + 2 * num_items)
+    for tile_start in range(0, num_distinct_items, tile_rows):
+        tile_end = min(tile_start + tile_rows, num_distinct_items)
+        tile_scores = get_tile(tile_start, tile_end)[:, idx_to_distinct_idx]
+        for tile_idx, item_scores in enumerate(tile_scores):
+            candidates = np.arange(num_items) if threshold is None else np.flatnonzero(item_scores >= threshold)
+
+            # One more candidate, in case the item itself is one of them
+            if top_k is not None and top_k + 1 < len(candidates):
+                candidates = candidates[np.argpartition(-item_scores[candidates], top_k)[:top_k + 1]]
+            candidates = candidates[np.lexsort((candidates, -item_scores[candidates]))]
+
+            for idx in distinct_idx_to_idxs[tile_start + tile_idx]:
+                item_candidates = candidates[candidates != idx][:top_k]
+                rows.append(np.full(len(item_candidates), idx))
+                cols.append(item_candidates)
+                scores.append(item_scores[item_candidates])
+
+    if not rows:
+        return coo_matrix((num_items, num_items))
+
+    # Sort by item, keeping the order of the matches of every item
+    rows, cols, scores = np.concatenate(rows), np.concatenate(cols), np.concatenate(scores)
+    order = np.argsort(rows, kind="stable")
+
+    return coo_matrix((scores[order], (rows[order], cols[order])), shape=(num_items, num_items))
+
+
+def get_sparse_similarity(
+        distinct_similarity: np.ndarray,
+        idx_to_distinct_idx: np.ndarray,
+        top_k: int | None = None,
+        threshold: float | None = None,
+) -> coo_matrix:
+    """
+    Get the top k matches of every item, and/or the matches with at least the threshold score, as a sparse matrix.
+
+    :param distinct_similarity: The similarity matrix of the distinct items.
+    :param idx_to_distinct_idx: For every item, the index of its distinct item.
+    :param top_k: The max number of matches of every item.
+    :param threshold: The min score of a match.
+    """
+
+    return get_sparse_similarity_from_tiles(
+        get_tile=lambda start, end: distinct_similarity[start:end],
+        num_distinct_items=distinct_similarity.shape[0] if distinct_similarity.size > 0 else 0,
+        idx_to_distinct_idx=idx_to_distinct_idx,
+        top_k=top_k,
+        threshold=threshold,
+    )
+
+
+def __get_vectors(
+        texts: List[str],
+        query: str | None,
+        vectorisation_function: Callable,
+        texts_cached_vectors: dict[str, List[float]],
+        is_negate: bool,
+) -> tuple[np.ndarray, np.ndarray | None, np.ndarray | None, dict[str, List[float]]]:
+    """
+    Get the vectors of distinct texts, their negated texts and the query with the library matcher, only vectorising
+    the texts with no cached vector.
+
+    :return: The vectors of the texts, of the negated texts (None when the texts are not negated), of the query (None
+        when there's no query), and the new vectors by text.
+    """
+
+    text_vectors, new_vectors_dict = matcher.create_full_text_vectors(
+        all_questions=texts,
+        query=query,
+        vectorisation_function=vectorisation_function,
+        texts_cached_vectors=texts_cached_vectors,
+        is_negate=is_negate,
+    )
+    vectors_pos, vectors_neg = matcher.vectors_pos_neg(text_vectors)
+    query_vectors = [text_vector.vector for text_vector in text_vectors if text_vector.is_query]
+
+    return (
+        vectors_pos,
+        vectors_neg if is_negate else None,
+        np.array(query_vectors) if query_vectors else None,
+        __get_new_vectors_as_lists(new_vectors_dict),
+    )
+
+
+def __get_new_vectors_as_lists(new_vectors_dict: dict) -> dict[str, List[float]]:
+    """
+    The library matcher gives the new vectors as arrays, they are cached as lists.
+    """
+
+    return {
+        text: vector.tolist() if isinstance(vector, np.ndarray) else vector for text, vector in new_vectors_dict.items()
+    }
+
+
+def __get_similarity_with_polarity(
+        vectors_pos_rows: np.ndarray,
+        vectors_neg_rows: np.ndarray | None,
+        vectors_pos_cols: np.ndarray,
+        vectors_neg_cols: np.ndarray | None,
+) -> np.ndarray:
+    """
+    Get the similarity with polarity of the row texts with the column texts, like the library matcher.
+
+    :param vectors_pos_rows: The vectors of the row texts.
+    :param vectors_neg_rows: The vectors of the negated row texts, None when the texts are not negated.
+    :param vectors_pos_cols: The vectors of the column texts.
+    :param vectors_neg_cols: The vectors of the negated column texts, None when the texts are not negated.
+    """
+
+    pairwise_similarity = cosine_similarity(vectors_pos_rows, vectors_pos_cols)
+
+    # Without negation the negated texts are the texts, so the polarity is always positive
+    if vectors_neg_rows is None or vectors_neg_cols is None:
+        return pairwise_similarity
+
+    pairwise_similarity_neg1 = cosine_similarity(vectors_neg_rows, vectors_pos_cols)
+    pairwise_similarity_neg2 = cosine_similarity(vectors_pos_rows, vectors_neg_cols)
+    pairwise_similarity_neg_mean = np.mean([pairwise_similarity_neg1, pairwise_similarity_neg2], axis=0)
+
+    similarity_difference = pairwise_similarity - pairwise_similarity_neg_mean
+    similarity_polarity = np.sign(similarity_difference)
+
+    # Treat very small differences as 0, the polarity is then positive
+    similarity_polarity[np.abs(similarity_difference) < 1e-3] = 1
+
+    similarity_max = np.max([pairwise_similarity, pairwise_similarity_neg_mean], axis=0)
+
+    return similarity_max * similarity_polarity
+
+
+def __get_similarity_with_polarity_tile(
+        vectors_pos: np.ndarray, vectors_neg: np.ndarray | None, start: int, end: int
+) -> np.ndarray:
+    """
+    Get the similarity with polarity of the texts from `start` to `end` (excluded) with all the texts.
+    """
+
+    return __get_similarity_with_polarity(
+        vectors_pos[start:end],
+        vectors_neg[start:end] if vectors_neg is not None else None,
+        vectors_pos,
+        vectors_neg,
+    )
+
+
+def __get_full_similarity_with_polarity(vectors_pos: np.ndarray, vectors_neg: np.ndarray | None) -> np.ndarray:
+    """
+    Get the similarity with polarity of all the texts with all the texts, computed one tile of rows at a time so the
+    temporary matrices stay within the memory ceiling.
+    """
+
+    num_texts = len(vectors_pos)
+    similarity_with_polarity = np.empty((num_texts, num_texts))
+    tile_rows = get_tile_rows(SIMILARITY_WITH_POLARITY_TILE_MATRICES * num_texts)
+    for start in range(0, num_texts, tile_rows):
+        end = min(start + tile_rows, num_texts)
+        similarity_with_polarity[start:end] = __get_similarity_with_polarity_tile(vectors_pos, vectors_neg, start, end)
+
+    return similarity_with_polarity
+
+
+def __assign_mhc_topics(
+        all_questions: List[Question],
+        vectors_pos: np.ndarray,
+        question_idx_to_text_idx: np.ndarray,
+        mhc_questions: List,
+        mhc_all_metadatas: List,
+        mhc_embeddings: np.ndarray,
+):
+    """
+    Assign the nearest MHC question and the MHC topics to the questions, like the library matcher.
+    """
+
+    if vectors_pos.size == 0 or len(mhc_embeddings) == 0:
+        for question in all_questions:
+            question.topics_auto = []
+        return
+
+    # The nearest MHC question of every distinct text, one tile of texts at a time
+    top_mhc_match_ids = np.empty(len(vectors_pos), dtype=np.int64)
+    top_mhc_match_similarities = np.empty(len(vectors_pos))
+    tile_rows = get_tile_rows(len(mhc_embeddings))
+    for start in range(0, len(vectors_pos), tile_rows):
+        similarities_mhc = cosine_similarity(vectors_pos[start:start + tile_rows], mhc_embeddings)
+        top_mhc_match_ids[start:start + tile_rows] = np.argmax(similarities_mhc, axis=1)
+        top_mhc_match_similarities[start:start + tile_rows] = similarities_mhc[
+            np.arange(len(similarities_mhc)), top_mhc_match_ids[start:start + tile_rows]
+        ]
+
+    ctrs = {}
+    for idx, question in enumerate(all_questions):
+        text_idx = question_idx_to_text_idx[idx]
+        mhc_item_idx = top_mhc_match_ids[text_idx]
+        mhc_question_text = mhc_questions[mhc_item_idx].question_text
+        if not mhc_question_text or len(mhc_question_text.strip()) < 3:
+            continue
+        if question.instrument_id not in ctrs:
+            ctrs[question.instrument_id] = Counter()
+        for topic in mhc_all_metadatas[mhc_item_idx]["topics"]:
+            ctrs[question.instrument_id][topic] += 1
+        question.nearest_match_from_mhc_auto = mhc_questions[mhc_item_idx].model_dump()
+        strength_of_match = top_mhc_match_similarities[text_idx]
+        question.topics_strengths = {topic: float(strength_of_match)}
+
+    instrument_to_category = {}
+    for instrument_id, counts in ctrs.items():
+        instrument_to_category[instrument_id] = []
+        max_count = max(counts.values())
+        for topic, topic_count in counts.items():
+            if topic_count > max_count / 2:
+                instrument_to_category[instrument_id].append(topic)
+
+    for question in all_questions:
+        question.topics_auto = instrument_to_category.get(question.instrument_id, [])
+
+
+def __get_instrument_similarity(
+        instruments: List[Instrument],
+        question_idx_to_text_idx: np.ndarray,
+        is_valid_text: np.ndarray,
+        get_similarity: Callable[[np.ndarray, np.ndarray], np.ndarray],
+        first_new_instrument_idx: int = 0,
+) -> List[InstrumentToInstrumentSimilarity]:
+    """
+    Get the instrument to instrument similarities, like the library, without building the full similarity matrix.
+
+    The library greedily pairs the questions of two instruments by descending absolute similarity, skipping NaN
+    similarities only. So when no similarity is NaN, min(number of questions 1, number of questions 2) pairs are
+    always found, and the precision and recall follow from the numbers of questions. The similarities of two
+    instruments are only computed when one of their texts could give NaN similarities.
+
+    :param instruments: The instruments.
+    :param question_idx_to_text_idx: For every question, the index of its distinct text.
+    :param is_valid_text: For every distinct text, whether its vectors can't give NaN similarities.
+    :param get_similarity: Function that receives the indexes of the row and column distinct texts and returns their
+        similarity with polarity.
+    :param first_new_instrument_idx: Only get the similarities of the pairs of instruments with at least one instrument
+        from this index, the similarities of the previous instruments are already known.
+    """
+
+    instrument_start_pos = []
+    cur_start = 0
+    for instrument in instruments:
+        instrument_start_pos.append(cur_start)
+        cur_start += len(instrument.questions)
+    instrument_start_pos.append(cur_start)
+
+    instrument_to_instrument_similarities = []
+    for i in range(len(instruments)):
+        text_idxs_1 = question_idx_to_text_idx[instrument_start_pos[i]:instrument_start_pos[i + 1]]
+        for j in range(max(i + 1, first_new_instrument_idx), len(instruments)):
+            text_idxs_2 = question_idx_to_text_idx[instrument_start_pos[j]:instrument_start_pos[j + 1]]
+
+            if np.all(is_valid_text[text_idxs_1]) and np.all(is_valid_text[text_idxs_2]):
+                num_pairs = min(len(text_idxs_1), len(text_idxs_2))
+                precision = num_pairs / len(text_idxs_2)
+                recall = num_pairs / len(text_idxs_1)
+                f1 = np.mean((precision, recall))
+            else:
+                precision, recall, f1 = get_precision_recall_f1(get_similarity(text_idxs_1, text_idxs_2))
+
+            instrument_to_instrument_similarities.append(
+                InstrumentToInstrumentSimilarity(
+                    instrument_1_idx=i,
+                    instrument_2_idx=j,
+                    instrument_1_name=instruments[i].instrument_name,
+                    instrument_2_name=instruments[j].instrument_name,
+                    precision=precision,
+                    recall=recall,
+                    f1=f1,
+                )
+            )
+
+    return instrument_to_instrument_similarities
+
+
+def __get_clusters(
+        all_questions: List[Question],
+        has_similarity: bool,
+        similarity_with_polarity: np.ndarray,
+        distinct_vectors_pos: np.ndarray,
+        question_idx_to_text_idx: np.ndarray,
+        get_knn_similarity: Callable[[], coo_matrix],
+        clustering_algorithm: HarmonyApiClusteringAlgorithm,
+        num_clusters_for_kmeans: int | None,
+        clustering_time_budget: float | None = None,
+) -> List:
+    """
+    Cluster the questions.
+
+    :param get_knn_similarity: Function that returns the sparse similarity of every distinct text with its
+        CLUSTERING_KNN nearest neighbours.
+    :param clustering_time_budget: The time in seconds after which the scalable clustering algorithms stop iterating.
+    """
+
+    if not has_similarity:
+        return []
+
+    if num_clusters_for_kmeans is None:
+        num_clusters_for_kmeans = int(np.floor(np.sqrt(len(all_questions))))
+    deadline = time.monotonic() + clustering_time_budget if clustering_time_budget is not None else None
+
+    if clustering_algorithm == HarmonyApiClusteringAlgorithm.affinity_propagation:
+        return cluster_questions_affinity_propagation(all_questions, similarity_with_polarity)
+    elif clustering_algorithm == HarmonyApiClusteringAlgorithm.deterministic:
+        return find_clusters_deterministic(all_questions, similarity_with_polarity)
+    elif clustering_algorithm == HarmonyApiClusteringAlgorithm.kmeans:
+        return cluster_questions_kmeans_from_embeddings(
+            all_questions, distinct_vectors_pos[question_idx_to_text_idx], num_clusters_for_kmeans
+        )
+    elif clustering_algorithm == HarmonyApiClusteringAlgorithm.hdbscan:
+        return cluster_questions_hdbscan_from_embeddings(all_questions, distinct_vectors_pos[question_idx_to_text_idx])
+    elif clustering_algorithm == HarmonyApiClusteringAlgorithm.knn_graph:
+        return cluster_questions_knn_graph(all_questions, question_idx_to_text_idx, get_knn_similarity(), deadline)
+    elif clustering_algorithm == HarmonyApiClusteringAlgorithm.minibatch_kmeans:
+        return cluster_questions_minibatch_kmeans(
+            all_questions, question_idx_to_text_idx, distinct_vectors_pos, num_clusters_for_kmeans, deadline
+        )
+
+    raise Exception("Invalid clustering algorithm")
+
+
+def __get_response_options_similarity(
+        all_questions: List[Question],
+        vectorisation_function: Callable,
+        top_k: int | None,
+        threshold: float | None,
+) -> np.ndarray | coo_matrix:
+    """
+    Get the similarity of the response options, vectorising every distinct list of options once.
+
+    The similarity is sparse when a top k or a threshold is given.
+    """
+
+    options = ["; ".join(q.options) for q in all_questions if q.options]
+    if not options:
+        return np.array([])
+
+    distinct_options, option_idx_to_distinct_idx = get_distinct_texts(options)
+    options_vectors = vectorisation_function(distinct_options)
+
+    if top_k is not None or threshold is not None:
+        return get_sparse_similarity_from_tiles(
+            get_tile=lambda start, end: cosine_similarity(options_vectors[start:end], options_vectors).clip(0, 1),
+            num_distinct_items=len(distinct_options),
+            idx_to_distinct_idx=option_idx_to_distinct_idx,
+            top_k=top_k,
+            threshold=threshold,
+            tile_row_size=2 * len(distinct_options),
+        )
+
+    distinct_similarity = cosine_similarity(options_vectors, options_vectors).clip(0, 1)
+
+    return distinct_similarity[np.ix_(option_idx_to_distinct_idx, option_idx_to_distinct_idx)]
+
+
+def __assign_topics(all_questions: List[Question], topics: List, vectorisation_function: Callable):
+    """
+    Tag the questions with the user-given topics, like the library matcher.
+
+    The topics of every distinct question text are found once.
+    """
+
+    stopwords_folder = pathlib.Path(matcher.__file__).parent.resolve() / ".." / "stopwords"
+    lang_to_stopwords = {}
+    if os.path.exists(stopwords_folder):
+        for stopwords_file in os.listdir(stopwords_folder):
+            with open(os.path.join(stopwords_folder, stopwords_file), "r", encoding="utf-8") as f:
+                lang_to_stopwords[stopwords_file] = set(f.read().splitlines())
+
+    topics_vectors = None
+    text_to_topics: dict[str, List] = {}
+    for question in all_questions:
+        question_text = question.question_text
+        if question_text in text_to_topics:
+            question.topics = list(text_to_topics[question_text])
+            continue
+
+        assigned_topics = []
+        if question_text and question_text.strip():
+            try:
+                lang = detect(question_text)
+            except Exception:
+                lang = None
+
+            stopwords = lang_to_stopwords.get(lang, [])
+            words = [word for word in question_text.split() if word not in stopwords]
+
+            if words:
+                if topics_vectors is None:
+                    topics_vectors = vectorisation_function(topics)
+                question_vector = vectorisation_function(words)
+                sim = cosine_similarity(question_vector, topics_vectors).clip(0, 1)
+
+                for j in range(sim.shape[1]):
+                    if np.any(sim[:, j] >= QUESTION_TOPIC_SIMILARITY_THRESHOLD):
+                        assigned_topics.append(topics[j])
+
+        text_to_topics[question_text] = assigned_topics
+        question.topics = list(assigned_topics)
+
+
+def __get_question_clusters(
+        clusters: List[HarmonyCluster], all_questions: List[Question], question_idx_to_text_idx: np.ndarray
+) -> List[HarmonyCluster]:
+    """
+    Map the clusters of the distinct texts to the questions, every question is in the cluster of its text and the
+    central question of a cluster is the first question with the central text.
+    """
+
+    text_idx_to_question_idxs: List[List[int]] = [[] for _ in range(int(question_idx_to_text_idx.max(initial=-1)) + 1)]
+    for question_idx, text_idx in enumerate(question_idx_to_text_idx):
+        text_idx_to_question_idxs[text_idx].append(question_idx)
+
+    question_clusters = []
+    for cluster in clusters:
+        centroid_id = text_idx_to_question_idxs[cluster.centroid_id][0]
+        item_ids = sorted(idx for text_idx in cluster.item_ids for idx in text_idx_to_question_idxs[text_idx])
+        question_clusters.append(
+            cluster.model_copy(
+                update={
+                    "centroid_id": centroid_id,
+                    "centroid": all_questions[centroid_id],
+                    "item_ids": item_ids,
+                    "items": [all_questions[idx] for idx in item_ids],
+                }
+            )
+        )
+
+    return question_clusters
+
+
+def match_instruments(
+        instruments: List[Instrument],
+        query: str | None,
+        vectorisation_function: Callable,
+        topics: List = [],
+        mhc_questions: List = [],
+        mhc_all_metadatas: List = [],
+        mhc_embeddings: np.ndarray = np.zeros((0, 0)),
+        texts_cached_vectors: dict[str, List[float]] = {},
+        is_negate: bool = True,
+        clustering_algorithm: HarmonyApiClusteringAlgorithm = HarmonyApiClusteringAlgorithm.affinity_propagation,
+        num_clusters_for_kmeans: int | None = None,
+        top_k: int | None = None,
+        threshold: float | None = None,
+        clustering_time_budget: float | None = None,
+) -> MatchResult:
+    """
+    Match instruments.
+
+    Identical question texts are negated, vectorised, compared and clustered once: the distinct texts are matched with
+    `match_instruments_with_function` of the library, in one instrument, and the result is mapped back to all the
+    questions, so the cost grows with the number of distinct texts rather than the number of questions. A question is
+    in the cluster of its text. The MHC topics are counted by instrument and the response options are those of the
+    questions, so they are found for the questions here.
+
+    When a top k or a threshold is given, the similarity with polarity and the response options similarity are sparse
+    matrices holding the best matches of every question only. Unless the clustering algorithm needs the full
+    similarity matrix, which the library matcher builds, the distinct texts are then compared here in tiles that fit
+    in the memory ceiling (MATCH_TILE_MEMORY_MB). So are they for the scalable clustering algorithms, which the
+    library doesn't have.
+
+    Past CLUSTERING_MAX_QUESTIONS questions, the clustering algorithms that don't scale are replaced by the kNN graph
+    clustering, see `get_clustering_algorithm`.
+
+    :param instruments: The instruments.
+    :param query: The query.
+    :param vectorisation_function: A function to vectorise texts.
+    :param topics: Topics with which to tag the questions.
+    :param mhc_questions: The MHC questions.
+    :param mhc_all_metadatas: The MHC metadata.
+    :param mhc_embeddings: The MHC embeddings.
+    :param texts_cached_vectors: The cached vectors of the texts.
+    :param is_negate: Whether to negate the texts.
+    :param clustering_algorithm: The clustering algorithm.
+    :param num_clusters_for_kmeans: The number of clusters for k-means.
+    :param top_k: The max number of matches of every question in the sparse output.
+    :param threshold: The min score of a match in the sparse output.
+    :param clustering_time_budget: The time in seconds after which the scalable clustering algorithms stop iterating.
+    """
+
+    is_sparse = top_k is not None or threshold is not None
+
+    all_questions: List[Question] = []
+    for instrument in instruments:
+        all_questions.extend(instrument.questions)
+
+    clustering_algorithm = get_clustering_algorithm(clustering_algorithm, len(all_questions))
+
+    # Collapse identical question texts
+    distinct_texts, question_idx_to_text_idx = get_distinct_texts([q.question_text for q in all_questions])
+    num_distinct_texts = len(distinct_texts)
+
+    # The library matcher can't compare empty texts, let it handle them as it does
+    is_library_match = any(is_empty_or_null_text(text) for text in distinct_texts) or (
+            clustering_algorithm in LIBRARY_CLUSTERING_ALGORITHMS
+            and (not is_sparse or clustering_algorithm in DENSE_SIMILARITY_CLUSTERING_ALGORITHMS)
+    )
+
+    distinct_similarity_with_polarity = None
+    if is_library_match:
+        distinct_questions = [Question(question_text=text) for text in distinct_texts]
+        distinct_match_result = matcher.match_instruments_with_function(
+            instruments=[Instrument(questions=distinct_questions)],
+            query=query,
+            vectorisation_function=vectorisation_function,
+            topics=topics,
+            texts_cached_vectors=texts_cached_vectors,
+            is_negate=is_negate,
+            # The library only has the k-means of the scalable clustering algorithms
+            clustering_algorithm=ClusteringAlgorithm(clustering_algorithm.value)
+            if clustering_algorithm in LIBRARY_CLUSTERING_ALGORITHMS
+            else ClusteringAlgorithm.kmeans,
+            num_clusters_for_kmeans=num_clusters_for_kmeans,
+        )
+        new_vectors_dict = __get_new_vectors_as_lists(distinct_match_result.new_vectors_dict)
+        distinct_query_similarity = distinct_match_result.query_similarity
+        has_similarity = distinct_match_result.similarity_with_polarity.size > 0
+        if has_similarity:
+            distinct_similarity_with_polarity = distinct_match_result.similarity_with_polarity
+
+        # Only the MHC topics need the vectors, a text whose similarities are not finite has vectors that give NaN
+        # similarities
+        if len(mhc_embeddings) > 0 and distinct_texts:
+            distinct_vectors_pos = np.array(
+                [texts_cached_vectors[text] if text in texts_cached_vectors else new_vectors_dict[text] for text in
+                 distinct_texts]
+            )
+        else:
+            distinct_vectors_pos = np.array([])
+        is_valid_text = np.all(np.isfinite(distinct_similarity_with_polarity), axis=1) if has_similarity else None
+
+        # User-given topics
+        for question, text_idx in zip(all_questions, question_idx_to_text_idx):
+            question.topics = list(distinct_questions[text_idx].topics)
+    else:
+        distinct_vectors_pos, distinct_vectors_neg, vector_query, new_vectors_dict = __get_vectors(
+            texts=distinct_texts,
+            query=query if query and query.strip() else None,
+            vectorisation_function=vectorisation_function,
+            texts_cached_vectors=texts_cached_vectors,
+            is_negate=is_negate,
+        )
+        if vector_query is not None and distinct_vectors_pos.size > 0:
+            distinct_query_similarity = cosine_similarity(distinct_vectors_pos, vector_query)[:, 0]
+        else:
+            distinct_query_similarity = np.array([])
+        has_similarity = distinct_vectors_pos.size > 0
+        if has_similarity and not is_sparse:
+            distinct_similarity_with_polarity = __get_full_similarity_with_polarity(
+                distinct_vectors_pos, distinct_vectors_neg
+            )
+
+        is_valid_text = np.all(np.isfinite(distinct_vectors_pos), axis=1) & (
+                np.linalg.norm(distinct_vectors_pos, axis=1) > 0
+        )
+        if distinct_vectors_neg is not None:
+            is_valid_text &= np.all(np.isfinite(distinct_vectors_neg), axis=1) & (
+                    np.linalg.norm(distinct_vectors_neg, axis=1) > 0
+            )
+
+        # User-given topics
+        if topics and all_questions:
+            __assign_topics(all_questions, topics, vectorisation_function)
+
+    # The similarity with polarity of the distinct texts, from the full matrix or computed in tiles
+    if distinct_similarity_with_polarity is not None:
+        def get_tile(start: int, end: int) -> np.ndarray:
+            return distinct_similarity_with_polarity[start:end]
+
+        def get_similarity(text_idxs_1: np.ndarray, text_idxs_2: np.ndarray) -> np.ndarray:
+            return distinct_similarity_with_polarity[np.ix_(text_idxs_1, text_idxs_2)]
+
+        tile_row_size = 0
+    else:
+        def get_tile(start: int, end: int) -> np.ndarray:
+            return __get_similarity_with_polarity_tile(distinct_vectors_pos, distinct_vectors_neg, start, end)
+
+        def get_similarity(text_idxs_1: np.ndarray, text_idxs_2: np.ndarray) -> np.ndarray:
+            return __get_similarity_with_polarity(
+                distinct_vectors_pos[text_idxs_1],
+                distinct_vectors_neg[text_idxs_1] if distinct_vectors_neg is not None else None,
+                distinct_vectors_pos[text_idxs_2],
+                distinct_vectors_neg[text_idxs_2] if distinct_vectors_neg is not None else None,
+            )
+
+        tile_row_size = SIMILARITY_WITH_POLARITY_TILE_MATRICES * num_distinct_texts
+
+    # Query similarity
+    query_similarity = distinct_query_similarity
+    if query_similarity.size > 0:
+        query_similarity = query_similarity[question_idx_to_text_idx]
+
+    # Similarity with polarity of the questions, or only their best matches
+    if is_sparse:
+        similarity_with_polarity = get_sparse_similarity_from_tiles(
+            get_tile=get_tile,
+            num_distinct_items=num_distinct_texts if has_similarity else 0,
+            idx_to_distinct_idx=question_idx_to_text_idx,
+            top_k=top_k,
+            threshold=threshold,
+            tile_row_size=tile_row_size,
+        )
+    elif has_similarity:
+        similarity_with_polarity = distinct_similarity_with_polarity[
+            np.ix_(question_idx_to_text_idx, question_idx_to_text_idx)
+        ]
+    else:
+        similarity_with_polarity = np.array([])
+
+    # MHC topics
+    __assign_mhc_topics(
+        all_questions=all_questions,
+        vectors_pos=distinct_vectors_pos,
+        question_idx_to_text_idx=question_idx_to_text_idx,
+        mhc_questions=mhc_questions,
+        mhc_all_metadatas=mhc_all_metadatas,
+        mhc_embeddings=mhc_embeddings,
+    )
+
+    # Instrument to instrument similarities
+    if has_similarity:
+        instrument_to_instrument_similarities = __get_instrument_similarity(
+            instruments, question_idx_to_text_idx, is_valid_text, get_similarity
+        )
+    else:
+        instrument_to_instrument_similarities = get_instrument_similarity(instruments, np.array([]))
+
+    # Clusters
+    if is_library_match:
+        clusters = __get_question_clusters(distinct_match_result.clusters, all_questions, question_idx_to_text_idx)
+    else:
+        clusters = __get_clusters(
+            all_questions=all_questions,
+            has_similarity=has_similarity,
+            similarity_with_polarity=similarity_with_polarity if not is_sparse else np.array([]),
+            distinct_vectors_pos=distinct_vectors_pos,
+            question_idx_to_text_idx=question_idx_to_text_idx,
+            get_knn_similarity=lambda: get_sparse_similarity_from_tiles(
+                get_tile=get_tile,
+                num_distinct_items=num_distinct_texts,
+                idx_to_distinct_idx=np.arange(num_distinct_texts),
+                top_k=settings.CLUSTERING_KNN,
+                tile_row_size=tile_row_size,
+            ),
+            clustering_algorithm=clustering_algorithm,
+            num_clusters_for_kmeans=num_clusters_for_kmeans,
+            clustering_time_budget=clustering_time_budget,
+        )
+
+    return MatchResult(
+        questions=all_questions,
+        similarity_with_polarity=similarity_with_polarity,
+        response_options_similarity=__get_response_options_similarity(
+            all_questions, vectorisation_function, top_k, threshold
+        ),
+        query_similarity=query_similarity,
+        new_vectors_dict=new_vectors_dict,
+        instrument_to_instrument_similarities=instrument_to_instrument_similarities,
+        clusters=clusters,
+    )
+
+
+class MatchState:
+    """
+    The state of a match that more instruments can be added to: the vectors of the distinct question texts, their
+    similarity with polarity, the instrument to instrument similarities and the cluster of every question.
+
+    The similarity matrix of the distinct texts keeps spare capacity, so adding n texts to N texts only computes and
+    copies the n x (N + n) new similarities.
+    """
+
+    def __init__(self, is_negate: bool, clustering_algorithm: HarmonyApiClusteringAlgorithm, topics: List):
+        self.is_negate = is_negate
+        self.clustering_algorithm = clustering_algorithm
+        self.topics = topics
+
+        self.instruments: List[Instrument] = []
+        self.questions: List[Question] = []
+        self.question_idx_to_text_idx = np.empty(0, dtype=np.int64)
+
+        # Distinct text -> index
+        self.text_to_idx: dict[str, int] = {}
+        self.vectors_pos: np.ndarray | None = None
+        self.vectors_neg: np.ndarray | None = None
+        self.is_valid_text = np.empty(0, dtype=bool)
+        self.vector_query: np.ndarray | None = None
+
+        self.instrument_to_instrument_similarities: List[InstrumentToInstrumentSimilarity] = []
+
+        # For every question, the ID of its cluster or -1
+        self.cluster_ids = np.empty(0, dtype=np.int64)
+        # Cluster ID -> (index of the central question, text description, keywords)
+        self.clusters: dict[int, tuple[int, str, List[str]]] = {}
+
+        self.__similarity_with_polarity = np.empty((0, 0))
+
+    @property
+    def num_texts(self) -> int:
+        return len(self.text_to_idx)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The size of the arrays of the state, including the spare capacity of the similarity matrix.
+        """
+
+        arrays = [
+            self.__similarity_with_polarity,
+            self.vectors_pos,
+            self.vectors_neg,
+            self.vector_query,
+            self.question_idx_to_text_idx,
+            self.is_valid_text,
+            self.cluster_ids,
+        ]
+
+        return sum(array.nbytes for array in arrays if array is not None)
+
+    @property
+    def similarity_with_polarity(self) -> np.ndarray:
+        """
+        The similarity with polarity of the distinct texts.
+        """
+
+        return self.__similarity_with_polarity[:self.num_texts, :self.num_texts]
+
+    def add_similarity_rows(self, rows: np.ndarray):
+        """
+        Add the similarity rows of the last texts added, with all the texts. The matrix is symmetric, so the columns of
+        the new texts are the transposed rows.
+
+        :param rows: The (number of new texts) x (number of texts) similarity with polarity.
+        """
+
+        num_texts = rows.shape[1]
+        num_old_texts = num_texts - rows.shape[0]
+        if num_texts > len(self.__similarity_with_polarity):
+            capacity = max(num_texts, 2 * len(self.__similarity_with_polarity))
+            similarity_with_polarity = np.empty((capacity, capacity))
+            similarity_with_polarity[:num_old_texts, :num_old_texts] = self.__similarity_with_polarity[
+                :num_old_texts, :num_old_texts
+            ]
+            self.__similarity_with_polarity = similarity_with_polarity
+
+        self.__similarity_with_polarity[num_old_texts:num_texts, :num_texts] = rows
+        self.__similarity_with_polarity[:num_old_texts, num_old_texts:num_texts] = rows[:, :num_old_texts].T
+
+    def get_clusters(self) -> List[HarmonyCluster]:
+        """
+        Get the clusters of the questions.
+        """
+
+        cluster_id_to_question_idxs: dict[int, List[int]] = {cluster_id: [] for cluster_id in self.clusters}
+        for question_idx, cluster_id in enumerate(self.cluster_ids):
+            if cluster_id >= 0:
+                cluster_id_to_question_idxs[int(cluster_id)].append(question_idx)
+
+        return [
+            HarmonyCluster(
+                cluster_id=cluster_id,
+                centroid_id=centroid_id,
+                centroid=self.questions[centroid_id],
+                items=[self.questions[idx] for idx in cluster_id_to_question_idxs[cluster_id]],
+                item_ids=cluster_id_to_question_idxs[cluster_id],
+                text_description=text_description,
+                keywords=keywords,
+            )
+            for cluster_id, (centroid_id, text_description, keywords) in self.clusters.items()
+        ]
+
+
+def __set_clusters(state: MatchState, clusters: List[HarmonyCluster]):
+    """
+    Set the clusters of all the questions of a match state.
+    """
+
+    state.cluster_ids = np.full(len(state.questions), -1, dtype=np.int64)
+    state.clusters = {}
+    for cluster in clusters:
+        state.cluster_ids[cluster.item_ids] = cluster.cluster_id
+        state.clusters[cluster.cluster_id] = (cluster.centroid_id, cluster.text_description, cluster.keywords)
+
+
+def __add_questions_to_clusters(state: MatchState, first_new_question_idx: int):
+    """
+    Add the new questions of a match state to the existing clusters, as a warm start of the clustering.
+
+    A new question joins the cluster of its most similar central question when that similarity is at least the median
+    similarity of the existing questions with their central question, so the clusters keep their tightness. Else it
+    becomes the central question of a new cluster. The keywords of the clusters that changed are generated again.
+    """
+
+    similarity_with_polarity = state.similarity_with_polarity
+    question_idx_to_text_idx = state.question_idx_to_text_idx
+
+    member_similarities = [
+        similarity_with_polarity[question_idx_to_text_idx[idx], question_idx_to_text_idx[state.clusters[cluster_id][0]]]
+        for idx, cluster_id in enumerate(state.cluster_ids[:first_new_question_idx])
+        if cluster_id >= 0 and state.clusters[cluster_id][0] != idx
+    ]
+    join_threshold = np.median(member_similarities) if member_similarities else np.inf
+
+    cluster_ids = list(state.clusters)
+    centroid_text_idxs = [question_idx_to_text_idx[state.clusters[cluster_id][0]] for cluster_id in cluster_ids]
+    new_cluster_ids = np.full(len(state.questions) - first_new_question_idx, -1, dtype=np.int64)
+    changed_cluster_ids = set()
+    for idx in range(first_new_question_idx, len(state.questions)):
+        text_idx = question_idx_to_text_idx[idx]
+        if cluster_ids:
+            similarities = similarity_with_polarity[text_idx, centroid_text_idxs]
+            best = int(np.argmax(similarities))
+            if similarities[best] >= join_threshold:
+                new_cluster_ids[idx - first_new_question_idx] = cluster_ids[best]
+                changed_cluster_ids.add(cluster_ids[best])
+                continue
+
+        cluster_id = max(cluster_ids, default=-1) + 1
+        state.clusters[cluster_id] = (idx, state.questions[idx].question_text, [])
+        cluster_ids.append(cluster_id)
+        centroid_text_idxs.append(text_idx)
+        new_cluster_ids[idx - first_new_question_idx] = cluster_id
+        changed_cluster_ids.add(cluster_id)
+
+    state.cluster_ids = np.concatenate([state.cluster_ids, new_cluster_ids])
+
+    changed_clusters = [cluster for cluster in state.get_clusters() if cluster.cluster_id in changed_cluster_ids]
+    try:
+        changed_clusters_keywords = generate_cluster_topics(changed_clusters, top_k_topics=5)
+    except (Exception,):
+        # The keywords can't be generated e.g. when the questions have no words
+        return
+    for cluster, keywords in zip(changed_clusters, changed_clusters_keywords):
+        centroid_id, text_description, _ = state.clusters[cluster.cluster_id]
+        state.clusters[cluster.cluster_id] = (centroid_id, text_description, keywords)
+
+
+def match_instruments_incrementally(
+        state: MatchState,
+        instruments: List[Instrument],
+        vectorisation_function: Callable,
+        query: str | None = None,
+        mhc_questions: List = [],
+        mhc_all_metadatas: List = [],
+        mhc_embeddings: np.ndarray = np.zeros((0, 0)),
+        texts_cached_vectors: dict[str, List[float]] = {},
+        recluster: bool = False,
+) -> MatchResult:
+    """
+    Add instruments to a match state and match them with all the instruments of the state.
+
+    Only the new distinct texts are negated and vectorised, and only their similarities with all the texts are
+    computed. The new questions join the existing clusters (see `__add_questions_to_clusters`), unless `recluster` is
+    true or the state had no questions, then the clustering algorithm of the state clusters all the questions again.
+
+    The question texts must not be empty.
+
+    :param state: The match state, it's updated with the new instruments.
+    :param instruments: The new instruments.
+    :param vectorisation_function: A function to vectorise texts.
+    :param query: The query, only used when the state has no query yet.
+    :param mhc_questions: The MHC questions.
+    :param mhc_all_metadatas: The MHC metadata.
+    :param mhc_embeddings: The MHC embeddings.
+    :param texts_cached_vectors: The cached vectors of the texts.
+    :param recluster: Whether to cluster all the questions again.
+    :return: The match result of the new questions: `similarity_with_polarity` is the similarity of the new questions
+        with all the questions, `query_similarity` the similarity of the new questions with the query, and the
+        instrument to instrument similarities and the clusters are those of all the instruments. The response options
+        similarity is not computed.
+    """
+
+    new_questions: List[Question] = []
+    for instrument in instruments:
+        new_questions.extend(instrument.questions)
+
+    first_new_instrument_idx = len(state.instruments)
+    first_new_question_idx = len(state.questions)
+    is_first_match = first_new_question_idx == 0
+
+    # Vectors of the new distinct texts, the new negated texts and the query
+    new_distinct_texts, _ = get_distinct_texts([q.question_text for q in new_questions])
+    new_texts = [text for text in new_distinct_texts if text not in state.text_to_idx]
+    has_query = state.vector_query is None and bool(query and query.strip())
+    new_vectors_pos, new_vectors_neg, vector_query, new_vectors_dict = __get_vectors(
+        texts=new_texts,
+        query=query if has_query else None,
+        vectorisation_function=vectorisation_function,
+        texts_cached_vectors=texts_cached_vectors,
+        is_negate=state.is_negate,
+    )
+    if has_query:
+        state.vector_query = vector_query
+
+    # Add the new texts and their similarity with polarity with all the texts
+    if new_texts:
+        is_valid_text = np.all(np.isfinite(new_vectors_pos), axis=1) & (np.linalg.norm(new_vectors_pos, axis=1) > 0)
+        if new_vectors_neg is not None:
+            is_valid_text &= np.all(np.isfinite(new_vectors_neg), axis=1) & (
+                    np.linalg.norm(new_vectors_neg, axis=1) > 0
+            )
+
+        first_new_text_idx = state.num_texts
+        for text in new_texts:
+            state.text_to_idx[text] = len(state.text_to_idx)
+        if state.vectors_pos is None:
+            state.vectors_pos, state.vectors_neg = new_vectors_pos, new_vectors_neg
+        else:
+            state.vectors_pos = np.concatenate([state.vectors_pos, new_vectors_pos])
+            if new_vectors_neg is not None:
+                state.vectors_neg = np.concatenate([state.vectors_neg, new_vectors_neg])
+        state.is_valid_text = np.concatenate([state.is_valid_text, is_valid_text])
+
+        similarity_rows = np.empty((len(new_texts), state.num_texts))
+        tile_rows = get_tile_rows(SIMILARITY_WITH_POLARITY_TILE_MATRICES * state.num_texts)
+        for start in range(first_new_text_idx, state.num_texts, tile_rows):
+            end = min(start + tile_rows, state.num_texts)
+            similarity_rows[start - first_new_text_idx:end - first_new_text_idx] = __get_similarity_with_polarity_tile(
+                state.vectors_pos, state.vectors_neg, start, end
+            )
+        state.add_similarity_rows(similarity_rows)
+
+    # Add the new questions
+    new_question_idx_to_text_idx = np.array([state.text_to_idx[q.question_text] for q in new_questions], dtype=np.int64)
+    state.instruments.extend(instruments)
+    state.questions.extend(new_questions)
+    state.question_idx_to_text_idx = np.concatenate([state.question_idx_to_text_idx, new_question_idx_to_text_idx])
+    similarity_with_polarity = state.similarity_with_polarity
+
+    # Similarity of the new questions with all the questions
+    new_similarity_with_polarity = similarity_with_polarity[
+        np.ix_(new_question_idx_to_text_idx, state.question_idx_to_text_idx)
+    ]
+
+    # Query similarity
+    if state.vector_query is not None and new_questions:
+        query_similarity = cosine_similarity(
+            state.vectors_pos[new_question_idx_to_text_idx], state.vector_query
+        )[:, 0]
+    else:
+        query_similarity = np.array([])
+
+    # MHC topics of the new instruments, from the vectors of their texts only
+    new_text_idxs, new_question_idx_to_new_text_idx = np.unique(new_question_idx_to_text_idx, return_inverse=True)
+    __assign_mhc_topics(
+        all_questions=new_questions,
+        vectors_pos=state.vectors_pos[new_text_idxs] if new_questions else np.array([]),
+        question_idx_to_text_idx=new_question_idx_to_new_text_idx,
+        mhc_questions=mhc_questions,
+        mhc_all_metadatas=mhc_all_metadatas,
+        mhc_embeddings=mhc_embeddings,
+    )
+
+    # Instrument to instrument similarities of the new pairs of instruments
+    if new_questions:
+        def get_similarity(text_idxs_1: np.ndarray, text_idxs_2: np.ndarray) -> np.ndarray:
+            return similarity_with_polarity[np.ix_(text_idxs_1, text_idxs_2)]
+
+        state.instrument_to_instrument_similarities.extend(
+            __get_instrument_similarity(
+                state.instruments,
+                state.question_idx_to_text_idx,
+                state.is_valid_text,
+                get_similarity,
+                first_new_instrument_idx,
+            )
+        )
+        state.instrument_to_instrument_similarities.sort(key=lambda x: (x.instrument_1_idx, x.instrument_2_idx))
+
+    # Clusters
+    if state.questions and (is_first_match or recluster):
+        clustering_algorithm = get_clustering_algorithm(state.clustering_algorithm, len(state.questions))
+        clusters = __get_clusters(
+            all_questions=state.questions,
+            has_similarity=True,
+            similarity_with_polarity=similarity_with_polarity[
+                np.ix_(state.question_idx_to_text_idx, state.question_idx_to_text_idx)
+            ] if clustering_algorithm in DENSE_SIMILARITY_CLUSTERING_ALGORITHMS else np.array([]),
+            distinct_vectors_pos=state.vectors_pos,
+            question_idx_to_text_idx=state.question_idx_to_text_idx,
+            get_knn_similarity=lambda: get_sparse_similarity(
+                similarity_with_polarity, np.arange(state.num_texts), top_k=settings.CLUSTERING_KNN
+            ),
+            clustering_algorithm=clustering_algorithm,
+            num_clusters_for_kmeans=None,
+        )
+        __set_clusters(state, clusters)
+    elif new_questions:
+        __add_questions_to_clusters(state, first_new_question_idx)
+
+    # User-given topics
+    if state.topics and new_questions:
+        __assign_topics(new_questions, state.topics, vectorisation_function)
+
+    return MatchResult(
+        questions=new_questions,
+        similarity_with_polarity=new_similarity_with_polarity,
+        response_options_similarity=np.array([]),
+        query_similarity=query_similarity,
+        new_vectors_dict=new_vectors_dict,
+        instrument_to_instrument_similarities=state.instrument_to_instrument_similarities,
+        clusters=state.get_clusters(),
+    )
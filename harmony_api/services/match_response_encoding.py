@@ -0,0 +1,157 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import importlib.util
+import json
+from typing import Literal
+
+import numpy as np
+from scipy.sparse import coo_matrix
+
+from harmony_api.utils.media_types import get_accepted_media_types
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Media type -> the package needed to encode it
+BINARY_MEDIA_TYPES = {
+    MSGPACK_MEDIA_TYPE: "msgpack",
+    "application/x-msgpack": "msgpack",
+    ARROW_MEDIA_TYPE: "pyarrow",
+}
+
+MatricesDtype = Literal["float16", "float32", "float64"]
+
+
+def __is_package_available(package: str) -> bool:
+    return importlib.util.find_spec(package) is not None
+
+
+def get_binary_media_type(accept: str | None) -> str | None:
+    """
+    Get the binary media type preferred by the client, if its encoder is installed.
+
+    JSON is used when the client accepts JSON (or anything) at least as much as any available binary media type.
+
+    :param accept: The Accept header.
+    :return: The binary media type, or None for JSON.
+    """
+
+    for media_type in get_accepted_media_types(accept):
+        if media_type in ["application/json", "application/*", "*/*"]:
+            return None
+        if media_type in BINARY_MEDIA_TYPES and __is_package_available(BINARY_MEDIA_TYPES[media_type]):
+            return MSGPACK_MEDIA_TYPE if BINARY_MEDIA_TYPES[media_type] == "msgpack" else media_type
+
+    return None
+
+
+def __encode_msgpack(response: dict, matrices: dict[str, np.ndarray | coo_matrix], dtype: np.dtype) -> bytes:
+    """
+    Every dense matrix is a map with its dtype, shape and raw little-endian data. Every sparse matrix is a map with
+    its dtype, shape and raw little-endian rows (int32), cols (int32) and scores.
+    """
+
+    import msgpack
+
+    payload = dict(response)
+    for name, matrix in matrices.items():
+        if isinstance(matrix, coo_matrix):
+            payload[name] = {
+                "dtype": dtype.str,
+                "shape": list(matrix.shape),
+                "rows": matrix.row.astype("<i4").tobytes(),
+                "cols": matrix.col.astype("<i4").tobytes(),
+                "scores": matrix.data.astype(dtype).tobytes(),
+            }
+        else:
+            payload[name] = {
+                "dtype": dtype.str,
+                "shape": list(matrix.shape),
+                "data": np.ascontiguousarray(matrix, dtype=dtype).tobytes(),
+            }
+
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def __encode_arrow(response: dict, matrices: dict[str, np.ndarray | coo_matrix], dtype: np.dtype) -> bytes:
+    """
+    A stream with one record batch of one row. Every dense matrix is a list column holding the flattened matrix, and
+    every sparse matrix is three list columns `<name>_rows`, `<name>_cols` and `<name>_scores`. The other fields of
+    the response are JSON in the schema metadata key "response", and the shapes of the matrices in the key "shapes".
+    """
+
+    import pyarrow as pa
+
+    def to_list_array(values: np.ndarray) -> pa.ListArray:
+        return pa.ListArray.from_arrays(pa.array([0, len(values)], type=pa.int32()), pa.array(values))
+
+    columns = {}
+    shapes = {}
+    for name, matrix in matrices.items():
+        shapes[name] = list(matrix.shape)
+        if isinstance(matrix, coo_matrix):
+            columns[f"{name}_rows"] = to_list_array(matrix.row.astype(np.int32))
+            columns[f"{name}_cols"] = to_list_array(matrix.col.astype(np.int32))
+            columns[f"{name}_scores"] = to_list_array(matrix.data.astype(dtype))
+        else:
+            columns[name] = to_list_array(np.ascontiguousarray(matrix, dtype=dtype).ravel())
+
+    record_batch = pa.RecordBatch.from_pydict(columns)
+    schema = record_batch.schema.with_metadata(
+        {"response": json.dumps(response, ensure_ascii=False), "shapes": json.dumps(shapes)}
+    )
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(record_batch.replace_schema_metadata(schema.metadata))
+
+    return sink.getvalue().to_pybytes()
+
+
+def encode(
+        media_type: str,
+        response: dict,
+        matrices: dict[str, np.ndarray | coo_matrix],
+        dtype: MatricesDtype = "float32",
+) -> bytes:
+    """
+    Encode a match response with its matrices as raw binary buffers.
+
+    :param media_type: The binary media type, see `get_binary_media_type`.
+    :param response: The JSON-compatible fields of the response, without the matrices.
+    :param matrices: The dense or sparse matrices of the response.
+    :param dtype: The dtype of the matrix values.
+    """
+
+    numpy_dtype = np.dtype(dtype).newbyteorder("<")
+
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return __encode_msgpack(response, matrices, numpy_dtype)
+    elif media_type == ARROW_MEDIA_TYPE:
+        return __encode_arrow(response, matrices, numpy_dtype)
+
+    raise ValueError(f"Unsupported media type {media_type}")
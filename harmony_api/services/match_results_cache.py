@@ -0,0 +1,123 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+from harmony_api.core.settings import get_settings
+from harmony_api.services.metrics import Metrics
+from harmony_api.utils.singleton_meta import SingletonMeta
+
+settings = get_settings()
+
+
+class CachedMatchResponse(NamedTuple):
+    etag: str
+    media_type: str
+    content: bytes
+
+
+class MatchResultsCache(metaclass=SingletonMeta):
+    """
+    This class is responsible for keeping the encoded responses of the latest matches in memory (Singleton class).
+
+    The responses are keyed by a canonical hash of the request, and the least recently used responses are removed
+    once the cache holds more than `MATCH_RESULTS_CACHE_MAX_MB`. The cache is not saved, so it's emptied on restart,
+    when the catalogue data and the models are loaded again. The data that can change while running, e.g. the MHC
+    embeddings, must be part of the request key.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__max_size = max(0, settings.MATCH_RESULTS_CACHE_MAX_MB) * 1024 * 1024
+        self.__size = 0
+
+        # Key -> match result
+        self.__cache: OrderedDict[str, CachedMatchResponse] = OrderedDict()
+
+    @staticmethod
+    def get_key(request: dict) -> str:
+        """
+        Get the key of a request.
+
+        :param request: Everything that the response depends on, JSON-serialisable.
+        """
+
+        canonical_request = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+        return hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()
+
+    def is_enabled(self) -> bool:
+        return self.__max_size > 0
+
+    def get(self, key: str) -> CachedMatchResponse | None:
+        """
+        Get a cached response.
+
+        :param key: The request key.
+        """
+
+        with self.__lock:
+            cached_match_response = self.__cache.get(key)
+            if cached_match_response is not None:
+                self.__cache.move_to_end(key)
+
+        Metrics().increment("match_results_cache_hits" if cached_match_response else "match_results_cache_misses")
+
+        return cached_match_response
+
+    def set(self, key: str, media_type: str, content: bytes) -> CachedMatchResponse:
+        """
+        Cache a response, unless it's larger than the cache.
+
+        :param key: The request key.
+        :param media_type: The media type of the response.
+        :param content: The encoded response.
+        :return: The response with its ETag.
+        """
+
+        cached_match_response = CachedMatchResponse(
+            etag=f'"{hashlib.sha256(content).hexdigest()}"', media_type=media_type, content=content
+        )
+        if len(content) > self.__max_size:
+            return cached_match_response
+
+        with self.__lock:
+            previous_cached_match_response = self.__cache.pop(key, None)
+            if previous_cached_match_response is not None:
+                self.__size -= len(previous_cached_match_response.content)
+
+            self.__cache[key] = cached_match_response
+            self.__size += len(content)
+
+            while self.__size > self.__max_size:
+                _, evicted_cached_match_response = self.__cache.popitem(last=False)
+                self.__size -= len(evicted_cached_match_response.content)
+
+        return cached_match_response
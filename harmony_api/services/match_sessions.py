@@ -0,0 +1,155 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from harmony_api.core.settings import get_settings
+from harmony_api.services.match_pipeline import MatchState
+from harmony_api.utils.singleton_meta import SingletonMeta
+
+settings = get_settings()
+
+
+@dataclass
+class MatchSession:
+    """
+    A match that more instruments can be added to.
+
+    :param session_id: The session ID.
+    :param model: The model dict containing the framework and the model name.
+    :param state: The match state.
+    :param lock: Held while the session is matched, a session is matched one request at a time.
+    :param size: The size of the state accounted in the sessions, in bytes.
+    """
+
+    session_id: str
+    model: dict
+    state: MatchState
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    size: int = 0
+
+
+class MatchSessions(metaclass=SingletonMeta):
+    """
+    This class is responsible for keeping the match sessions in memory (Singleton class).
+
+    A session expires when it's not used for `MATCH_SESSION_TTL_SECONDS`, and the least recently used sessions are
+    removed when there are more than `MATCH_SESSIONS_MAX_SIZE` sessions or when their states take more than
+    `MATCH_SESSIONS_MAX_MB`.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__max_size = max(0, settings.MATCH_SESSIONS_MAX_MB) * 1024 * 1024
+        self.__size = 0
+
+        # Session ID -> (expiry time, session)
+        self.__sessions: OrderedDict[str, tuple[float, MatchSession]] = OrderedDict()
+
+    def __remove_expired_sessions(self):
+        now = time.monotonic()
+        while self.__sessions:
+            session_id, (expiry_time, _) = next(iter(self.__sessions.items()))
+            if expiry_time > now:
+                break
+            self.__remove(session_id)
+
+    def __remove_least_recently_used_sessions(self):
+        while self.__sessions and (
+                len(self.__sessions) > max(1, settings.MATCH_SESSIONS_MAX_SIZE) or self.__size > self.__max_size
+        ):
+            self.__remove(next(iter(self.__sessions)))
+
+    def __remove(self, session_id: str) -> bool:
+        _, session = self.__sessions.pop(session_id, (None, None))
+        if session is None:
+            return False
+        self.__size -= session.size
+
+        return True
+
+    def create(self, model: dict, state: MatchState) -> MatchSession:
+        """
+        Create a session.
+
+        :param model: The model dict containing the framework and the model name.
+        :param state: The match state.
+        """
+
+        session = MatchSession(session_id=uuid.uuid4().hex, model=model, state=state)
+        with self.__lock:
+            self.__remove_expired_sessions()
+            self.__sessions[session.session_id] = (time.monotonic() + settings.MATCH_SESSION_TTL_SECONDS, session)
+            self.__remove_least_recently_used_sessions()
+
+        return session
+
+    def get(self, session_id: str) -> MatchSession | None:
+        """
+        Get a session, and extend its expiry time.
+
+        :param session_id: The session ID.
+        """
+
+        with self.__lock:
+            self.__remove_expired_sessions()
+            if session_id not in self.__sessions:
+                return None
+            _, session = self.__sessions.pop(session_id)
+            self.__sessions[session_id] = (time.monotonic() + settings.MATCH_SESSION_TTL_SECONDS, session)
+
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Delete a session.
+
+        :param session_id: The session ID.
+        :return: Whether the session existed.
+        """
+
+        with self.__lock:
+            return self.__remove(session_id)
+
+    def update_size(self, session: MatchSession):
+        """
+        Account the size of the state of a session after it's matched, and remove the least recently used sessions
+        while the sessions are too large. A session larger than `MATCH_SESSIONS_MAX_MB` on its own is removed too.
+
+        :param session: The session, its lock must be held.
+        """
+
+        size = session.state.nbytes
+        with self.__lock:
+            if self.__sessions.get(session.session_id, (None, None))[1] is not session:
+                return
+            self.__size += size - session.size
+            session.size = size
+            self.__remove_least_recently_used_sessions()
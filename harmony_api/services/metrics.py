@@ -0,0 +1,58 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import threading
+
+from harmony_api.utils.singleton_meta import SingletonMeta
+
+
+class Metrics(metaclass=SingletonMeta):
+    """
+    This class is responsible for counting events since the application started (Singleton class).
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__counters: dict[str, int] = {}
+
+    def increment(self, name: str, value: int = 1):
+        """
+        Increment a counter.
+
+        :param name: The counter name.
+        :param value: The value to add to the counter.
+        """
+
+        with self.__lock:
+            self.__counters[name] = self.__counters.get(name, 0) + value
+
+    def get_metrics(self) -> dict[str, int]:
+        """
+        Get all counters.
+        """
+
+        with self.__lock:
+            return dict(self.__counters)
@@ -0,0 +1,146 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import json
+import os
+import threading
+from typing import List
+
+import numpy as np
+from harmony.schemas.requests.text import Question
+
+from harmony_api.utils.singleton_meta import SingletonMeta
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+mhc_data_path = os.path.join(dir_path, "../../mhc_embeddings")  # submodule
+
+MHC_QUESTIONS_FILENAME = "mhc_questions.txt"
+MHC_ALL_METADATAS_FILENAME = "mhc_all_metadatas.json"
+
+
+def get_mhc_embeddings_filename(model_name: str) -> str:
+    return f"mhc_embeddings_{model_name.replace('/', '-')}.npy"
+
+
+class MhcEmbeddingsStore(metaclass=SingletonMeta):
+    """
+    This class is responsible for keeping the MHC questions, metadata and embeddings in memory (Singleton class).
+
+    The data is loaded once and shared by all requests, so it must not be modified. The embeddings are memory-mapped
+    when possible. A file is loaded again when its modification time changes.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+
+        self.__questions: List[Question] = []
+        self.__questions_mtime: float | None = None
+
+        self.__all_metadata: List[dict] = []
+        self.__all_metadata_mtime: float | None = None
+
+        # Model name -> (modification time, embeddings)
+        self.__embeddings: dict[str, tuple[float | None, np.ndarray]] = {}
+
+    @staticmethod
+    def __get_mtime(file_path: str) -> float | None:
+        try:
+            return os.path.getmtime(file_path)
+        except OSError:
+            return None
+
+    def __load_questions(self):
+        file_path = os.path.join(mhc_data_path, MHC_QUESTIONS_FILENAME)
+        mtime = self.__get_mtime(file_path)
+        if self.__questions and mtime == self.__questions_mtime:
+            return
+
+        questions = []
+        with open(file_path, "r", encoding="utf-8") as file:
+            for line in file:
+                questions.append(Question(question_text=line))
+
+        self.__questions = questions
+        self.__questions_mtime = mtime
+
+    def __load_all_metadata(self):
+        file_path = os.path.join(mhc_data_path, MHC_ALL_METADATAS_FILENAME)
+        mtime = self.__get_mtime(file_path)
+        if self.__all_metadata and mtime == self.__all_metadata_mtime:
+            return
+
+        all_metadata = []
+        with open(file_path, "r", encoding="utf-8") as file:
+            for line in file:
+                all_metadata.append(json.loads(line))
+
+        self.__all_metadata = all_metadata
+        self.__all_metadata_mtime = mtime
+
+    def __load_embeddings(self, model_name: str) -> np.ndarray:
+        file_path = os.path.join(mhc_data_path, get_mhc_embeddings_filename(model_name))
+        mtime = self.__get_mtime(file_path)
+        if model_name in self.__embeddings and mtime == self.__embeddings[model_name][0]:
+            return self.__embeddings[model_name][1]
+
+        try:
+            embeddings = np.load(file_path, mmap_mode="r")
+        except ValueError:
+            # Arrays saved as pickled objects cannot be memory-mapped
+            embeddings = np.load(file_path, allow_pickle=True)
+            embeddings = np.asarray(embeddings.tolist() if embeddings.dtype == object else embeddings)
+            embeddings.setflags(write=False)
+
+        self.__embeddings[model_name] = (mtime, embeddings)
+
+        return embeddings
+
+    def get(self, model_name: str) -> tuple[List[Question], List[dict], np.ndarray]:
+        """
+        Get the MHC questions, metadata and embeddings for a model.
+
+        :param model_name: The model name.
+        """
+
+        with self.__lock:
+            self.__load_questions()
+            self.__load_all_metadata()
+            embeddings = self.__load_embeddings(model_name)
+
+            return self.__questions, self.__all_metadata, embeddings
+
+    def get_version(self, model_name: str) -> List[float | None]:
+        """
+        Get the version of the MHC data for a model, the modification times of its files.
+
+        :param model_name: The model name.
+        """
+
+        return [
+            self.__get_mtime(os.path.join(mhc_data_path, MHC_QUESTIONS_FILENAME)),
+            self.__get_mtime(os.path.join(mhc_data_path, MHC_ALL_METADATAS_FILENAME)),
+            self.__get_mtime(os.path.join(mhc_data_path, get_mhc_embeddings_filename(model_name))),
+        ]
@@ -0,0 +1,282 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from dataclasses import dataclass
+from typing import Callable, List
+
+import numpy as np
+
+from harmony_api.constants import (
+    HUGGINGFACE_MINILM_L12_V2,
+    HUGGINGFACE_MPNET_BASE_V2,
+    HUGGINGFACE_MENTAL_HEALTH_HARMONISATION_1,
+    OPENAI_ADA_02,
+    OPENAI_3_LARGE,
+    GOOGLE_GECKO_003,
+    GOOGLE_GECKO_MULTILINGUAL,
+    AZURE_OPENAI_3_LARGE,
+    AZURE_OPENAI_ADA_02,
+)
+from harmony_api.core.settings import get_settings
+from harmony_api.services import azure_openai_embeddings
+from harmony_api.services import google_embeddings
+from harmony_api.services import hugging_face_embeddings
+from harmony_api.services import openai_embeddings
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class ModelProvider:
+    """
+    Declares a model and its capabilities.
+
+    :param framework: The framework of the model e.g. "huggingface".
+    :param model: The model name.
+    :param embedding_function: Function that receives a list of texts and returns their vectors.
+    :param availability_function: Function that returns whether the model can currently be used.
+    :param max_batch_size: The max number of texts sent to the embedding function in one call.
+    :param vector_dimension: The dimension of the vectors returned by the model.
+    :param dtype: The dtype of the vectors returned by the model.
+    :param is_normalised: Whether the vectors returned by the model have a unit length.
+    :param has_catalogue_embeddings: Whether catalogue embeddings exist for the model.
+    :param has_mhc_embeddings: Whether MHC embeddings exist for the model.
+    :param is_local: Whether the model runs on this server, rather than behind a third-party API.
+    :param version: The version of the vectors returned by the model, the cached vectors of other versions aren't used.
+    """
+
+    framework: str
+    model: str
+    embedding_function: Callable[[List[str]], np.ndarray]
+    availability_function: Callable[[], bool]
+    max_batch_size: int
+    vector_dimension: int
+    dtype: str = "float32"
+    is_normalised: bool = False
+    has_catalogue_embeddings: bool = False
+    has_mhc_embeddings: bool = False
+    is_local: bool = False
+    version: str = ""
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return self.framework, self.model
+
+    def is_available(self) -> bool:
+        """
+        Check model availability.
+        """
+
+        return self.availability_function()
+
+    def vectorise(self, texts: List[str]) -> np.ndarray:
+        """
+        Get the vectors of texts, calling the embedding function in batches of at most `max_batch_size` texts.
+
+        :param texts: List of texts.
+        """
+
+        if not texts:
+            return np.array([])
+
+        batches = [
+            texts[i: i + self.max_batch_size]
+            for i in range(0, len(texts), self.max_batch_size)
+        ]
+        vectors = [self.embedding_function(batch) for batch in batches]
+
+        return np.concatenate(vectors, axis=0).astype(self.dtype, copy=False)
+
+    def to_dict(self) -> dict:
+        """
+        Get the declared capabilities of the model as a dict.
+        """
+
+        return {
+            "framework": self.framework,
+            "model": self.model,
+            "max_batch_size": self.max_batch_size,
+            "vector_dimension": self.vector_dimension,
+            "dtype": self.dtype,
+            "is_normalised": self.is_normalised,
+            "has_catalogue_embeddings": self.has_catalogue_embeddings,
+            "has_mhc_embeddings": self.has_mhc_embeddings,
+            "is_local": self.is_local,
+            "version": self.version,
+        }
+
+
+def __is_hugging_face_model_available() -> bool:
+    # Hugging Face models are loaded on startup, no checks required
+    return True
+
+
+def __is_openai_model_available(model_name: str) -> bool:
+    if not settings.OPENAI_API_KEY:
+        return False
+
+    return model_name in openai_embeddings.HARMONY_API_AVAILABLE_OPENAI_MODELS_LIST
+
+
+def __is_azure_openai_model_available(model_name: str) -> bool:
+    return (
+            model_name
+            in azure_openai_embeddings.HARMONY_API_AVAILABLE_AZURE_OPENAI_MODELS_LIST
+    )
+
+
+def __is_google_model_available(model_name: str) -> bool:
+    if not google_embeddings.GOOGLE_APPLICATION_CREDENTIALS_DICT:
+        return False
+
+    return model_name in google_embeddings.HARMONY_API_AVAILABLE_GOOGLE_MODELS_LIST
+
+
+# The OpenAI and Azure OpenAI embeddings endpoints accept at most 2048 inputs per request
+OPENAI_MAX_BATCH_SIZE = 2048
+
+# Vertex AI accepts at most 250 texts per request
+GOOGLE_MAX_BATCH_SIZE = 250
+
+# Local models, this has been tested on a 16 GB RAM server
+HUGGING_FACE_MAX_BATCH_SIZE = 1000
+
+# The version of the vectors of the models behind an API, which can't be read from the API. Bump it when the vectors of
+# the API models change, e.g. another endpoint or dimension.
+API_MODELS_VERSION = "1"
+
+MODEL_PROVIDERS_LIST: List[ModelProvider] = [
+    # Hugging Face
+    ModelProvider(
+        framework=HUGGINGFACE_MINILM_L12_V2["framework"],
+        model=HUGGINGFACE_MINILM_L12_V2["model"],
+        version=hugging_face_embeddings.HUGGING_FACE_MODEL_VERSIONS[HUGGINGFACE_MINILM_L12_V2["model"]],
+        embedding_function=hugging_face_embeddings.get_hugging_face_embeddings_minilm_l12_v2,
+        availability_function=__is_hugging_face_model_available,
+        max_batch_size=HUGGING_FACE_MAX_BATCH_SIZE,
+        is_local=True,
+        vector_dimension=hugging_face_embeddings.model_huggingface_minilm_l12_v2.get_sentence_embedding_dimension(),
+        has_catalogue_embeddings=True,
+        has_mhc_embeddings=True,
+    ),
+    ModelProvider(
+        framework=HUGGINGFACE_MPNET_BASE_V2["framework"],
+        model=HUGGINGFACE_MPNET_BASE_V2["model"],
+        version=hugging_face_embeddings.HUGGING_FACE_MODEL_VERSIONS[HUGGINGFACE_MPNET_BASE_V2["model"]],
+        embedding_function=hugging_face_embeddings.get_hugging_face_embeddings_mpnet_base_v2,
+        availability_function=__is_hugging_face_model_available,
+        max_batch_size=HUGGING_FACE_MAX_BATCH_SIZE,
+        is_local=True,
+        vector_dimension=hugging_face_embeddings.model_huggingface_mpnet_base_v2.get_sentence_embedding_dimension(),
+        has_mhc_embeddings=True,
+    ),
+    ModelProvider(
+        framework=HUGGINGFACE_MENTAL_HEALTH_HARMONISATION_1["framework"],
+        model=HUGGINGFACE_MENTAL_HEALTH_HARMONISATION_1["model"],
+        version=hugging_face_embeddings.HUGGING_FACE_MODEL_VERSIONS[HUGGINGFACE_MENTAL_HEALTH_HARMONISATION_1["model"]],
+        embedding_function=hugging_face_embeddings.get_hugging_face_embeddings_harmonydata_mental_health_harmonisation_1,
+        availability_function=__is_hugging_face_model_available,
+        max_batch_size=HUGGING_FACE_MAX_BATCH_SIZE,
+        is_local=True,
+        vector_dimension=hugging_face_embeddings.model_huggingface_mental_health_harmonisation.get_sentence_embedding_dimension(),
+    ),
+    # OpenAI
+    ModelProvider(
+        framework=OPENAI_ADA_02["framework"],
+        model=OPENAI_ADA_02["model"],
+        version=API_MODELS_VERSION,
+        embedding_function=openai_embeddings.get_openai_embeddings_ada_02,
+        availability_function=lambda: __is_openai_model_available(OPENAI_ADA_02["model"]),
+        max_batch_size=OPENAI_MAX_BATCH_SIZE,
+        vector_dimension=1536,
+        is_normalised=True,
+    ),
+    ModelProvider(
+        framework=OPENAI_3_LARGE["framework"],
+        model=OPENAI_3_LARGE["model"],
+        version=API_MODELS_VERSION,
+        embedding_function=openai_embeddings.get_openai_embeddings_3_large,
+        availability_function=lambda: __is_openai_model_available(OPENAI_3_LARGE["model"]),
+        max_batch_size=OPENAI_MAX_BATCH_SIZE,
+        vector_dimension=3072,
+        is_normalised=True,
+    ),
+    # Google
+    ModelProvider(
+        framework=GOOGLE_GECKO_003["framework"],
+        model=GOOGLE_GECKO_003["model"],
+        version=API_MODELS_VERSION,
+        embedding_function=google_embeddings.get_google_embeddings_gecko_003,
+        availability_function=lambda: __is_google_model_available(GOOGLE_GECKO_003["model"]),
+        max_batch_size=GOOGLE_MAX_BATCH_SIZE,
+        vector_dimension=768,
+    ),
+    ModelProvider(
+        framework=GOOGLE_GECKO_MULTILINGUAL["framework"],
+        model=GOOGLE_GECKO_MULTILINGUAL["model"],
+        version=API_MODELS_VERSION,
+        embedding_function=google_embeddings.get_google_embeddings_gecko_multilingual,
+        availability_function=lambda: __is_google_model_available(GOOGLE_GECKO_MULTILINGUAL["model"]),
+        max_batch_size=GOOGLE_MAX_BATCH_SIZE,
+        vector_dimension=768,
+    ),
+    # Azure OpenAI
+    ModelProvider(
+        framework=AZURE_OPENAI_3_LARGE["framework"],
+        model=AZURE_OPENAI_3_LARGE["model"],
+        version=API_MODELS_VERSION,
+        embedding_function=azure_openai_embeddings.get_azure_openai_embeddings_3_large,
+        availability_function=lambda: __is_azure_openai_model_available(AZURE_OPENAI_3_LARGE["model"]),
+        max_batch_size=OPENAI_MAX_BATCH_SIZE,
+        vector_dimension=3072,
+        is_normalised=True,
+    ),
+    ModelProvider(
+        framework=AZURE_OPENAI_ADA_02["framework"],
+        model=AZURE_OPENAI_ADA_02["model"],
+        version=API_MODELS_VERSION,
+        embedding_function=azure_openai_embeddings.get_azure_openai_embeddings_ada_02,
+        availability_function=lambda: __is_azure_openai_model_available(AZURE_OPENAI_ADA_02["model"]),
+        max_batch_size=OPENAI_MAX_BATCH_SIZE,
+        vector_dimension=1536,
+        is_normalised=True,
+    ),
+]
+
+# Registry: (framework, model) -> model provider
+MODEL_PROVIDERS: dict[tuple[str, str], ModelProvider] = {
+    model_provider.key: model_provider for model_provider in MODEL_PROVIDERS_LIST
+}
+
+
+def get_model_provider(model: dict) -> ModelProvider | None:
+    """
+    Get the model provider for a model.
+
+    :param model: The model dict containing the framework and the model name.
+    """
+
+    return MODEL_PROVIDERS.get((model.get("framework"), model.get("model")))
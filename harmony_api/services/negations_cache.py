@@ -0,0 +1,127 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from harmony.matching.negator import negate
+
+from harmony_api import constants
+from harmony_api.core.settings import get_settings
+from harmony_api.utils.singleton_meta import SingletonMeta
+
+settings = get_settings()
+
+data_path = os.getenv("HARMONY_DATA_PATH", os.getcwd())
+cache_file_path = os.path.join(data_path, constants.NEGATIONS_CACHE_JSON_FILENAME)
+
+
+class NegationsCache(metaclass=SingletonMeta):
+    """
+    This class is responsible for caching negated texts (Singleton class).
+
+    The cache is keyed by language and text, and the least recently used entries are evicted when it is full.
+    """
+
+    def __init__(self):
+        print("INFO:\t  Loading negations cache...")
+
+        self.__max_size = settings.NEGATIONS_CACHE_MAX_SIZE
+        self.__lock = threading.Lock()
+        self.__cache: OrderedDict[tuple[str, str], str] = OrderedDict()
+
+        self.__load()
+
+    def __load(self):
+        """
+        Load cache.
+        """
+
+        cache: OrderedDict[tuple[str, str], str] = OrderedDict()
+        if os.path.isfile(cache_file_path):
+            with open(cache_file_path, "r", encoding="utf8") as file:
+                try:
+                    for language, text, negated_text in json.loads(file.read()):
+                        cache[(language, text)] = negated_text
+                except (json.decoder.JSONDecodeError, TypeError, ValueError):
+                    cache = OrderedDict()
+
+        self.__cache = cache
+        self.__evict()
+
+    def __evict(self):
+        """
+        Remove the least recently used entries until the cache fits its max size.
+        """
+
+        while len(self.__cache) > max(0, self.__max_size):
+            self.__cache.popitem(last=False)
+
+    def negate(self, text: str, language: str = "en") -> str:
+        """
+        Get the negated text, negating it only if it's not in the cache.
+
+        :param text: The text.
+        :param language: The language of the text.
+        """
+
+        key = (language, text)
+        with self.__lock:
+            if key in self.__cache:
+                self.__cache.move_to_end(key)
+                return self.__cache[key]
+
+        negated_text = negate(text, language)
+
+        with self.__lock:
+            self.__cache[key] = negated_text
+            self.__evict()
+
+        return negated_text
+
+    def get_cache(self) -> OrderedDict[tuple[str, str], str]:
+        """
+        Get the whole cache from memory.
+        """
+
+        return self.__cache
+
+    def save(self):
+        """
+        Save cache to disk.
+
+        This is saved as a list of [language, text, negated text] lists, from the least to the most recently used.
+        """
+
+        with self.__lock:
+            entries = [[language, text, negated_text] for (language, text), negated_text in self.__cache.items()]
+
+        with open(cache_file_path, "w", encoding="utf8") as file:
+            file.write(json.dumps(entries, ensure_ascii=False))
+
+        print(f"INFO:\t  Cache {constants.NEGATIONS_CACHE_JSON_FILENAME} saved...")
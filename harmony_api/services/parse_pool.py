@@ -0,0 +1,248 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import io
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Iterator, List, NamedTuple
+
+from harmony.parsing.wrapper_all_parsers import convert_files_to_instruments
+from harmony.schemas.enums.file_types import FileType
+from harmony.schemas.requests.text import Instrument, RawFile
+
+from harmony_api.core.settings import get_settings
+from harmony_api.services import instruments_cache, process_pool, text_extraction, uploaded_files
+from harmony_api.services.instruments_cache import InstrumentsCache
+from harmony_api.services.single_flight import SingleFlight
+from harmony_api.services.uploaded_files import UploadedFile
+
+settings = get_settings()
+
+# These file types are parsed in the process pool, when it's enabled, and under the concurrency governor, because their
+# parsing is CPU-bound: the questions of PDFs and Word documents are predicted by a model, and spreadsheets are read
+# with pandas. Text and CSV files are cheap to parse.
+CPU_BOUND_FILE_TYPES = [FileType.pdf, FileType.docx, FileType.xlsx]
+
+# The threads parsing files, shared by all requests so the number of files parsed at the same time is capped globally
+__executor = ThreadPoolExecutor(max_workers=max(1, settings.PARSE_MAX_CONCURRENT_FILES), thread_name_prefix="parse")
+
+# The files parsed at the same time by several requests are parsed once, by instruments cache key
+__single_flight = SingleFlight("parse")
+
+
+def __parse_document(file: RawFile, pages: List[str]) -> List[Instrument]:
+    """
+    Parse a PDF or a Word document from the plain text of its pages.
+
+    The Harmony PDF parser predicts the questions of chunks of pages, but of one chunk when it's given the text of the
+    document. So every chunk is parsed on its own, and the questions of the chunks are joined into one instrument and
+    numbered like the parser does.
+    """
+
+    # Nothing to parse, e.g. a scanned PDF with no text
+    if not "".join(pages):
+        return []
+
+    instruments: List[Instrument] = []
+    for text_chunk in text_extraction.get_text_chunks(pages):
+        instruments.extend(process_pool.parse_file(file.model_copy(update={"text_content": text_chunk})))
+    if len(instruments) <= 1:
+        return instruments
+
+    questions = [question for instrument in instruments for question in instrument.questions]
+    for question_idx, question in enumerate(questions):
+        question.question_no = str(question_idx + 1)
+
+    return [instruments[0].model_copy(update={"questions": questions})]
+
+
+def __parse_file(file: RawFile) -> List[Instrument]:
+    # PDFs and Word documents are converted to plain text here, with pypdf or the pooled Tika client, instead of by the
+    # Harmony parser
+    if file.file_type in text_extraction.DOCUMENT_FILE_TYPES and not file.text_content:
+        content_bytes = instruments_cache.get_content_bytes(file.content)
+
+        return __parse_document(file, text_extraction.get_pages(io.BytesIO(content_bytes), file.file_type))
+
+    if file.file_type in CPU_BOUND_FILE_TYPES:
+        return process_pool.parse_file(file)
+
+    return convert_files_to_instruments([file])
+
+
+def __parse_uploaded_file(uploaded_file: UploadedFile) -> List[Instrument]:
+    file = uploaded_files.to_raw_file(uploaded_file)
+
+    # PDFs and Word documents are streamed from the spooled file
+    if uploaded_file.file_type in text_extraction.DOCUMENT_FILE_TYPES:
+        uploaded_file.file.seek(0)
+
+        return __parse_document(file, text_extraction.get_pages(uploaded_file.file, uploaded_file.file_type))
+
+    # Nothing to parse, e.g. an empty text file
+    if not file.content:
+        return []
+
+    return __parse_file(file)
+
+
+class ParsedFile(NamedTuple):
+    """
+    The result of parsing a file.
+    """
+
+    file_idx: int
+    instruments: List[Instrument] | None
+    error: Exception | None
+    parse_time: float
+
+
+def __parse_timed(parse_function: Callable, file) -> tuple[List[Instrument] | None, Exception | None, float]:
+    start_time = time.perf_counter()
+    try:
+        return parse_function(file), None, time.perf_counter() - start_time
+    except (Exception,) as e:
+        return None, e, time.perf_counter() - start_time
+
+
+def __parse_and_cache(parse_function: Callable, file, key: str, future: Future):
+    """
+    Parse a file claimed in the single flight, cache its instruments, and resolve the file for the requests waiting for
+    it.
+    """
+
+    try:
+        instruments, error, parse_time = __parse_timed(parse_function, file)
+        if error is None:
+            InstrumentsCache().set(key, instruments)
+        __single_flight.set_result(key, future, (instruments, error, parse_time))
+    except BaseException as e:
+        __single_flight.set_exception(key, future, e)
+        raise
+
+
+def __iter_parsed_concurrently(parse_function: Callable, files: list, keys: List[str]) -> Iterator[ParsedFile]:
+    """
+    Parse files with `parse_function` concurrently, keeping at most PARSE_MAX_CONCURRENT_FILES_PER_REQUEST files of
+    the request in flight, and yield every file as soon as it's parsed. The instruments are cached with the key of the
+    file.
+
+    A file being parsed for another request isn't parsed again, its parsing is awaited. The files not parsed yet are
+    cancelled when the iteration stops early, unless another request waits for them.
+    """
+
+    max_concurrent_files = max(1, settings.PARSE_MAX_CONCURRENT_FILES_PER_REQUEST)
+
+    # Single flight future -> file index
+    futures: dict[Future, int] = {}
+
+    # Single flight future -> the job parsing the file, for the files parsed by this request
+    jobs: dict[Future, Future] = {}
+
+    next_file_idx = 0
+    try:
+        while next_file_idx < len(files) or futures:
+            while next_file_idx < len(files) and len(futures) < max_concurrent_files:
+                future, is_leader = __single_flight.claim(keys[next_file_idx])
+                if is_leader:
+                    jobs[future] = __executor.submit(
+                        __parse_and_cache, parse_function, files[next_file_idx], keys[next_file_idx], future
+                    )
+                futures[future] = next_file_idx
+                next_file_idx += 1
+
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_idx = futures.pop(future)
+                jobs.pop(future, None)
+                instruments, error, parse_time = future.result()
+                yield ParsedFile(file_idx=file_idx, instruments=instruments, error=error, parse_time=parse_time)
+    finally:
+        for future, file_idx in futures.items():
+            job = jobs.get(future)
+            __single_flight.release(keys[file_idx], future, job.cancel if job is not None else None)
+
+
+def __parse_concurrently(parse_function: Callable, files: list, keys: List[str]) -> List[List[Instrument]]:
+    instruments_per_file: List[List[Instrument] | None] = [None] * len(files)
+    for parsed_file in __iter_parsed_concurrently(parse_function, files, keys):
+        if parsed_file.error is not None:
+            raise parsed_file.error
+        instruments_per_file[parsed_file.file_idx] = parsed_file.instruments
+
+    return instruments_per_file
+
+
+def parse_files(files: List[RawFile], keys: List[str]) -> List[List[Instrument]]:
+    """
+    Parse files into instruments concurrently, and cache the instruments.
+
+    At most PARSE_MAX_CONCURRENT_FILES_PER_REQUEST files of the request, and PARSE_MAX_CONCURRENT_FILES files of all
+    requests, are parsed at the same time. A file with the same key as a file being parsed for another request waits
+    for its instruments instead of being parsed again.
+
+    :param files: The files.
+    :param keys: The instruments cache key of every file.
+    :return: The instruments of every file, in the order of the files.
+    """
+
+    return __parse_concurrently(__parse_file, files, keys)
+
+
+def parse_uploaded_files(files: List[UploadedFile], keys: List[str]) -> List[List[Instrument]]:
+    """
+    Parse uploaded files into instruments concurrently, like `parse_files`.
+
+    :param files: The uploaded files.
+    :param keys: The instruments cache key of every file.
+    :return: The instruments of every file, in the order of the files.
+    """
+
+    return __parse_concurrently(__parse_uploaded_file, files, keys)
+
+
+def iter_parsed_files(files: List[RawFile], keys: List[str]) -> Iterator[ParsedFile]:
+    """
+    Parse files into instruments concurrently, like `parse_files`, and yield every file as soon as it's parsed. A file
+    whose parsing fails is yielded with the error.
+
+    :param files: The files.
+    :param keys: The instruments cache key of every file.
+    """
+
+    return __iter_parsed_concurrently(__parse_file, files, keys)
+
+
+def iter_parsed_uploaded_files(files: List[UploadedFile], keys: List[str]) -> Iterator[ParsedFile]:
+    """
+    Parse uploaded files into instruments concurrently, like `parse_files`, and yield every file as soon as it's
+    parsed. A file whose parsing fails is yielded with the error.
+
+    :param files: The uploaded files.
+    :param keys: The instruments cache key of every file.
+    """
+
+    return __iter_parsed_concurrently(__parse_uploaded_file, files, keys)
@@ -0,0 +1,68 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from pydantic import BaseModel
+
+from harmony_api.utils.media_types import get_accepted_media_types
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+STREAMING_MEDIA_TYPES = [NDJSON_MEDIA_TYPE, SSE_MEDIA_TYPE]
+
+
+def get_streaming_media_type(accept: str | None) -> str | None:
+    """
+    Get the streaming media type preferred by the client.
+
+    JSON is used when the client accepts JSON (or anything) at least as much as a streaming media type.
+
+    :param accept: The Accept header.
+    :return: The streaming media type, or None for JSON.
+    """
+
+    for media_type in get_accepted_media_types(accept):
+        if media_type in ["application/json", "application/*", "*/*"]:
+            return None
+        if media_type in STREAMING_MEDIA_TYPES:
+            return media_type
+
+    return None
+
+
+def encode(media_type: str, event: BaseModel) -> bytes:
+    """
+    Encode an event of the stream, as a line of JSON or as a Server-Sent Event.
+
+    :param media_type: The streaming media type.
+    :param event: The event.
+    """
+
+    data = event.model_dump_json(exclude_none=True)
+    if media_type == SSE_MEDIA_TYPE:
+        return f"event: file\ndata: {data}\n\n".encode()
+
+    return f"{data}\n".encode()
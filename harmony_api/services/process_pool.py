@@ -0,0 +1,256 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+import numpy as np
+from harmony.schemas.requests.text import Instrument, RawFile
+from harmony.schemas.responses.text import MatchResult
+
+from harmony_api.core.settings import get_settings
+from harmony_api.schemas.enums import HarmonyApiClusteringAlgorithm
+from harmony_api.services.concurrency_governor import ConcurrencyGovernor
+
+settings = get_settings()
+
+__executor: ProcessPoolExecutor | None = None
+
+
+def __init_worker(torch_num_threads: int):
+    """
+    Initialise a worker process.
+
+    Limit the torch and BLAS threads so the workers don't oversubscribe the CPUs, and load the models once.
+    """
+
+    import torch
+    from threadpoolctl import threadpool_limits
+
+    torch.set_num_threads(torch_num_threads)
+    threadpool_limits(limits=torch_num_threads)
+
+    # Importing the model registry loads the models
+    from harmony_api.services import model_registry  # noqa: F401
+
+
+def __warm_up_job() -> int:
+    return os.getpid()
+
+
+def __encode_job(model: dict, texts: List[str]) -> np.ndarray:
+    from harmony_api.services.model_registry import get_model_provider
+
+    return get_model_provider(model).vectorise(texts)
+
+
+def __parse_job(file: RawFile) -> List[Instrument]:
+    from harmony.parsing.wrapper_all_parsers import convert_files_to_instruments
+
+    return convert_files_to_instruments([file])
+
+
+def __match_job(
+        model: dict,
+        instruments: List[Instrument],
+        query: str | None,
+        topics: List,
+        texts_cached_vectors: dict[str, List[float]],
+        is_negate: bool,
+        clustering_algorithm: HarmonyApiClusteringAlgorithm,
+        top_k: int | None = None,
+        threshold: float | None = None,
+        clustering_time_budget: float | None = None,
+) -> tuple[List[Instrument], MatchResult]:
+    from harmony_api import helpers
+    from harmony_api.services import match_pipeline
+    from harmony_api.services.model_registry import get_model_provider
+
+    mhc_questions, mhc_all_metadata, mhc_embeddings = helpers.get_mhc_embeddings(model)
+
+    match_result = match_pipeline.match_instruments(
+        instruments=instruments,
+        query=query,
+        topics=topics,
+        mhc_questions=mhc_questions,
+        mhc_all_metadatas=mhc_all_metadata,
+        mhc_embeddings=mhc_embeddings,
+        texts_cached_vectors=texts_cached_vectors,
+        vectorisation_function=get_model_provider(model).vectorise,
+        is_negate=is_negate,
+        clustering_algorithm=clustering_algorithm,
+        top_k=top_k,
+        threshold=threshold,
+        clustering_time_budget=clustering_time_budget,
+    )
+
+    # The instruments are returned too, because the matching adds data to their questions
+    return instruments, match_result
+
+
+def get_pool_size() -> int:
+    """
+    Get the number of worker processes.
+    """
+
+    if settings.PROCESS_POOL_SIZE > 0:
+        return settings.PROCESS_POOL_SIZE
+
+    return max(1, (os.cpu_count() or 1) // max(1, settings.PROCESS_POOL_TORCH_NUM_THREADS))
+
+
+def is_enabled() -> bool:
+    """
+    Check if the work is sent to the process pool.
+    """
+
+    return __executor is not None
+
+
+def start():
+    """
+    Start the process pool if it's enabled in the settings, and load the models in every worker.
+    """
+
+    global __executor
+
+    if not settings.PROCESS_POOL_ENABLED or __executor is not None:
+        return
+
+    pool_size = get_pool_size()
+    print(f"INFO:\t  Starting process pool with {pool_size} workers...")
+
+    __executor = ProcessPoolExecutor(
+        max_workers=pool_size,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=__init_worker,
+        initargs=(max(1, settings.PROCESS_POOL_TORCH_NUM_THREADS),),
+    )
+
+    # Start the workers now instead of on the first requests
+    futures = [__executor.submit(__warm_up_job) for _ in range(pool_size)]
+    for future in futures:
+        future.result()
+
+
+def shutdown():
+    """
+    Shutdown the process pool.
+    """
+
+    global __executor
+
+    if __executor is not None:
+        __executor.shutdown(wait=True, cancel_futures=True)
+        __executor = None
+
+
+def encode(model: dict, texts: List[str]) -> np.ndarray:
+    """
+    Get the vectors of texts.
+
+    This runs in the process pool when it's enabled, else in the current thread. The number of encodings running at
+    the same time is limited by the concurrency governor.
+
+    :param model: The model.
+    :param texts: List of texts.
+    """
+
+    with ConcurrencyGovernor().cpu_job(set_threads=__executor is None):
+        if __executor is None:
+            return __encode_job(model, texts)
+
+        return __executor.submit(__encode_job, model, texts).result()
+
+
+def parse_file(file: RawFile) -> List[Instrument]:
+    """
+    Parse a file into instruments.
+
+    This runs in the process pool when it's enabled, else in the current thread. The number of parses running at the
+    same time is limited by the concurrency governor.
+
+    :param file: The file.
+    """
+
+    with ConcurrencyGovernor().cpu_job(set_threads=__executor is None):
+        if __executor is None:
+            return __parse_job(file)
+
+        return __executor.submit(__parse_job, file).result()
+
+
+def match_instruments(
+        model: dict,
+        instruments: List[Instrument],
+        query: str | None,
+        topics: List,
+        texts_cached_vectors: dict[str, List[float]],
+        is_negate: bool,
+        clustering_algorithm: HarmonyApiClusteringAlgorithm,
+        top_k: int | None = None,
+        threshold: float | None = None,
+        clustering_time_budget: float | None = None,
+) -> tuple[List[Instrument], MatchResult]:
+    """
+    Match instruments.
+
+    This runs in the process pool when it's enabled, else in the current thread. The number of matches running at the
+    same time is limited by the concurrency governor.
+
+    :param model: The model.
+    :param instruments: The instruments.
+    :param query: The query.
+    :param topics: Topics with which to tag the questions.
+    :param texts_cached_vectors: The cached vectors of the texts.
+    :param is_negate: Whether to negate the texts.
+    :param clustering_algorithm: The clustering algorithm.
+    :param top_k: The max number of matches of every question, the matches are then a sparse matrix.
+    :param threshold: The min score of a match, the matches are then a sparse matrix.
+    :param clustering_time_budget: The time in seconds after which the scalable clustering algorithms stop iterating.
+    :return: The instruments (with the data added by the matching to their questions) and the match result.
+    """
+
+    kwargs = {
+        "model": model,
+        "instruments": instruments,
+        "query": query,
+        "topics": topics,
+        "texts_cached_vectors": texts_cached_vectors,
+        "is_negate": is_negate,
+        "clustering_algorithm": clustering_algorithm,
+        "top_k": top_k,
+        "threshold": threshold,
+        "clustering_time_budget": clustering_time_budget,
+    }
+
+    with ConcurrencyGovernor().cpu_job(set_threads=__executor is None):
+        if __executor is None:
+            return __match_job(**kwargs)
+
+        return __executor.submit(__match_job, **kwargs).result()
@@ -0,0 +1,221 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import time
+from typing import List
+
+import numpy as np
+from harmony.matching.generate_cluster_topics import generate_cluster_topics
+from harmony.schemas.requests.text import Question
+from harmony.schemas.responses.text import HarmonyCluster
+from scipy.sparse import coo_matrix, csr_matrix
+from sklearn.cluster import MiniBatchKMeans
+
+# Two texts are linked in the kNN graph when their similarity is at least this
+KNN_GRAPH_MIN_SIMILARITY = 0.5
+
+# The max number of label propagation iterations on the kNN graph
+KNN_GRAPH_MAX_ITERATIONS = 30
+
+# The number of texts in a mini-batch of the mini-batch k-means
+MINIBATCH_KMEANS_BATCH_SIZE = 1024
+
+# The max number of passes of the mini-batch k-means over the texts
+MINIBATCH_KMEANS_MAX_EPOCHS = 10
+
+
+def __is_past_deadline(deadline: float | None) -> bool:
+    return deadline is not None and time.monotonic() > deadline
+
+
+def __get_clusters(
+        questions: List[Question],
+        question_idx_to_text_idx: np.ndarray,
+        text_cluster_ids: np.ndarray,
+        centroid_text_idxs: np.ndarray,
+) -> List[HarmonyCluster]:
+    """
+    Get the clusters of the questions from the clusters of their distinct texts.
+
+    :param questions: The questions.
+    :param question_idx_to_text_idx: For every question, the index of its distinct text.
+    :param text_cluster_ids: For every distinct text, the ID of its cluster, from 0 to the number of clusters.
+    :param centroid_text_idxs: For every cluster, the index of its central distinct text.
+    """
+
+    question_cluster_ids = text_cluster_ids[question_idx_to_text_idx]
+    text_idx_to_first_question_idx = {}
+    for question_idx, text_idx in enumerate(question_idx_to_text_idx):
+        text_idx_to_first_question_idx.setdefault(int(text_idx), question_idx)
+
+    clusters = []
+    for cluster_id, centroid_text_idx in enumerate(centroid_text_idxs):
+        item_ids = np.flatnonzero(question_cluster_ids == cluster_id).tolist()
+        centroid_id = text_idx_to_first_question_idx[int(centroid_text_idx)]
+        clusters.append(
+            HarmonyCluster(
+                cluster_id=cluster_id,
+                centroid_id=centroid_id,
+                centroid=questions[centroid_id],
+                items=[questions[idx] for idx in item_ids],
+                item_ids=item_ids,
+                text_description=questions[centroid_id].question_text,
+                keywords=[],
+            )
+        )
+
+    try:
+        clusters_keywords = generate_cluster_topics(clusters, top_k_topics=5)
+    except (Exception,):
+        # The keywords can't be generated e.g. when the questions have no words
+        clusters_keywords = [[] for _ in clusters]
+    for cluster, keywords in zip(clusters, clusters_keywords):
+        cluster.keywords = keywords
+
+    return clusters
+
+
+def cluster_questions_knn_graph(
+        questions: List[Question],
+        question_idx_to_text_idx: np.ndarray,
+        knn_similarity: coo_matrix,
+        deadline: float | None = None,
+) -> List[HarmonyCluster]:
+    """
+    Cluster the questions by label propagation on the k nearest neighbours graph of their distinct texts.
+
+    Every distinct text is linked to its nearest neighbours with a similarity of at least KNN_GRAPH_MIN_SIMILARITY,
+    and then, one text at a time in a random order, takes the cluster with the largest total similarity among its
+    neighbours, until the clusters don't change, KNN_GRAPH_MAX_ITERATIONS or the deadline. Every iteration is linear in
+    the number of links. The central text of a cluster is the one with the largest total similarity with the other
+    texts of the cluster.
+
+    :param questions: The questions.
+    :param question_idx_to_text_idx: For every question, the index of its distinct text.
+    :param knn_similarity: The sparse similarity of every distinct text with its nearest neighbours.
+    :param deadline: Stop the label propagation at this `time.monotonic()` time.
+    """
+
+    num_texts = knn_similarity.shape[0]
+    is_link = knn_similarity.data >= KNN_GRAPH_MIN_SIMILARITY
+    graph = csr_matrix(
+        (knn_similarity.data[is_link], (knn_similarity.row[is_link], knn_similarity.col[is_link])),
+        shape=(num_texts, num_texts),
+    )
+    graph = graph.maximum(graph.T).tocsr()
+
+    # Every text starts in its own cluster. The texts are updated one at a time in a random order, so that linked texts
+    # join the same cluster instead of swapping their clusters. A text keeps its cluster unless another one is strictly
+    # better.
+    indptr, indices, similarities = graph.indptr.tolist(), graph.indices.tolist(), graph.data.tolist()
+    text_cluster_ids = list(range(num_texts))
+    rng = np.random.default_rng(0)
+    is_stopped = False
+    for _ in range(KNN_GRAPH_MAX_ITERATIONS):
+        is_changed = False
+        for text_idx in rng.permutation(num_texts).tolist():
+            if __is_past_deadline(deadline):
+                is_stopped = True
+                break
+            cluster_scores: dict[int, float] = {}
+            for link_idx in range(indptr[text_idx], indptr[text_idx + 1]):
+                cluster_id = text_cluster_ids[indices[link_idx]]
+                cluster_scores[cluster_id] = cluster_scores.get(cluster_id, 0.0) + similarities[link_idx]
+            if not cluster_scores:
+                continue
+            best_cluster_id = max(cluster_scores, key=cluster_scores.get)
+            if cluster_scores[best_cluster_id] > cluster_scores.get(text_cluster_ids[text_idx], 0.0):
+                text_cluster_ids[text_idx] = best_cluster_id
+                is_changed = True
+        if is_stopped or not is_changed:
+            break
+
+    graph = graph.tocoo()
+    _, text_cluster_ids = np.unique(np.asarray(text_cluster_ids), return_inverse=True)
+
+    # The central text of every cluster
+    is_intra_cluster = text_cluster_ids[graph.row] == text_cluster_ids[graph.col]
+    intra_cluster_similarity = np.bincount(
+        graph.row[is_intra_cluster], weights=graph.data[is_intra_cluster], minlength=num_texts
+    )
+    order = np.lexsort((-intra_cluster_similarity, text_cluster_ids))
+    is_first_of_cluster = np.r_[True, text_cluster_ids[order][1:] != text_cluster_ids[order][:-1]]
+    centroid_text_idxs = order[is_first_of_cluster]
+
+    return __get_clusters(questions, question_idx_to_text_idx, text_cluster_ids, centroid_text_idxs)
+
+
+def cluster_questions_minibatch_kmeans(
+        questions: List[Question],
+        question_idx_to_text_idx: np.ndarray,
+        vectors: np.ndarray,
+        num_clusters: int,
+        deadline: float | None = None,
+) -> List[HarmonyCluster]:
+    """
+    Cluster the questions with mini-batch k-means on the vectors of their distinct texts.
+
+    Every distinct text is weighted by its number of questions. The mini-batches are fitted until
+    MINIBATCH_KMEANS_MAX_EPOCHS passes over the texts or the deadline, at least one mini-batch is always fitted, and
+    the first mini-batch holds at least one text per cluster. The central text of a cluster is the one nearest to its
+    centre.
+
+    :param questions: The questions.
+    :param question_idx_to_text_idx: For every question, the index of its distinct text.
+    :param vectors: The vectors of the distinct texts.
+    :param num_clusters: The number of clusters.
+    :param deadline: Stop fitting at this `time.monotonic()` time.
+    """
+
+    num_texts = len(vectors)
+    num_clusters = max(1, min(num_clusters, num_texts))
+    sample_weight = np.bincount(question_idx_to_text_idx, minlength=num_texts).astype(float)
+    batch_size = max(MINIBATCH_KMEANS_BATCH_SIZE, num_clusters)
+
+    kmeans = MiniBatchKMeans(n_clusters=num_clusters, batch_size=batch_size, n_init=1, random_state=0)
+    rng = np.random.default_rng(0)
+    is_fitted = False
+    for _ in range(MINIBATCH_KMEANS_MAX_EPOCHS):
+        order = rng.permutation(num_texts)
+        for start in range(0, num_texts, batch_size):
+            if is_fitted and __is_past_deadline(deadline):
+                break
+            batch_idxs = order[start:start + batch_size]
+            kmeans.partial_fit(vectors[batch_idxs], sample_weight=sample_weight[batch_idxs])
+            is_fitted = True
+        if __is_past_deadline(deadline):
+            break
+
+    labels = kmeans.predict(vectors)
+    _, text_cluster_ids = np.unique(labels, return_inverse=True)
+
+    # The central text of every cluster
+    distances = np.linalg.norm(vectors - kmeans.cluster_centers_[labels], axis=1)
+    order = np.lexsort((distances, text_cluster_ids))
+    is_first_of_cluster = np.r_[True, text_cluster_ids[order][1:] != text_cluster_ids[order][:-1]]
+    centroid_text_idxs = order[is_first_of_cluster]
+
+    return __get_clusters(questions, question_idx_to_text_idx, text_cluster_ids, centroid_text_idxs)
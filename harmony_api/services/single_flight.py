@@ -0,0 +1,122 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Callable, Hashable
+
+from harmony_api.services.metrics import Metrics
+
+
+class SingleFlight:
+    """
+    Share one computation between the concurrent callers asking for the same key.
+
+    The first caller to claim a key leads: it runs the computation and resolves the future of the key. The other
+    callers claiming the key before it's resolved get the same future and wait for it, instead of running the
+    computation again. A resolved key is forgotten, the result is expected to be cached by the leader before.
+    """
+
+    def __init__(self, name: str):
+        """
+        :param name: The name of the computation, the number of callers which joined a computation in flight is
+            counted in the metric `<name>_single_flight_joins`.
+        """
+
+        self.__name = name
+        self.__lock = threading.RLock()
+
+        # Key -> the future of the computation in flight and its number of callers
+        self.__calls: dict[Hashable, tuple[Future, int]] = {}
+
+    def claim(self, key: Hashable) -> tuple[Future, bool]:
+        """
+        Claim a key.
+
+        :param key: The key.
+        :return: The future of the computation of the key, and whether the caller leads the computation and must
+            resolve the future with `set_result` or `set_exception`.
+        """
+
+        with self.__lock:
+            call = self.__calls.get(key)
+            if call is not None:
+                future, callers = call
+                self.__calls[key] = (future, callers + 1)
+                Metrics().increment(f"{self.__name}_single_flight_joins")
+                return future, False
+
+            future = Future()
+            self.__calls[key] = (future, 1)
+
+            return future, True
+
+    def __pop(self, key: Hashable, future: Future):
+        with self.__lock:
+            call = self.__calls.get(key)
+            if call is not None and call[0] is future:
+                del self.__calls[key]
+
+    def set_result(self, key: Hashable, future: Future, result):
+        """
+        Resolve the computation of a key with its result.
+        """
+
+        self.__pop(key, future)
+        future.set_result(result)
+
+    def set_exception(self, key: Hashable, future: Future, exception: BaseException):
+        """
+        Resolve the computation of a key with an error, every caller waiting for it gets the error.
+        """
+
+        self.__pop(key, future)
+        future.set_exception(exception)
+
+    def release(self, key: Hashable, future: Future, cancel_function: Callable[[], bool] | None = None):
+        """
+        Stop waiting for the computation of a key before it's resolved.
+
+        When no other caller waits for it, the computation is cancelled with `cancel_function`, which returns whether
+        it could be cancelled, e.g. a job which hasn't started yet.
+
+        :param key: The key.
+        :param future: The future returned by `claim`.
+        :param cancel_function: Function that cancels the computation, for the leader.
+        """
+
+        with self.__lock:
+            call = self.__calls.get(key)
+            if call is None or call[0] is not future:
+                return
+
+            callers = call[1] - 1
+            if callers == 0 and cancel_function is not None and cancel_function():
+                del self.__calls[key]
+                future.cancel()
+                return
+
+            self.__calls[key] = (future, callers)
@@ -0,0 +1,98 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from typing import BinaryIO, List
+
+from harmony.schemas.enums.file_types import FileType
+
+from harmony_api.core.settings import get_settings
+from harmony_api.services.metrics import Metrics
+from harmony_api.services.tika_client import TikaClient
+
+settings = get_settings()
+
+# These file types are converted to plain text, with Tika or pypdf, before they're parsed
+DOCUMENT_FILE_TYPES = [FileType.pdf, FileType.docx]
+
+# The Harmony PDF parser predicts the questions of a document in chunks of this number of pages
+PAGES_PER_CHUNK = 10
+
+
+def get_simple_pdf_pages(file: BinaryIO) -> List[str] | None:
+    """
+    Extract the text of the pages of a simple PDF with pypdf, without Tika.
+
+    A PDF is simple when it isn't encrypted and every page has text. None is returned for the other PDFs, e.g. the
+    scanned PDFs, which need Tika.
+
+    :param file: The PDF file.
+    """
+
+    from pypdf import PdfReader
+
+    try:
+        reader = PdfReader(file)
+        if reader.is_encrypted:
+            return None
+        pages = [page.extract_text() or "" for page in reader.pages]
+    except (Exception,) as e:
+        print(f"Could not extract the text of the PDF with pypdf, falling back to Tika. Error: {str(e)}")
+        return None
+
+    if not pages or not all(page.strip() for page in pages):
+        return None
+
+    return pages
+
+
+def get_pages(file: BinaryIO, file_type: FileType) -> List[str]:
+    """
+    Convert a PDF or a Word document to the plain text of its pages.
+
+    The simple PDFs are converted with pypdf when PARSE_PDF_WITHOUT_TIKA is set, the other documents with Tika.
+
+    :param file: The file.
+    :param file_type: The file type.
+    """
+
+    if file_type == FileType.pdf and settings.PARSE_PDF_WITHOUT_TIKA:
+        pages = get_simple_pdf_pages(file)
+        if pages is not None:
+            Metrics().increment("pdfs_converted_without_tika")
+            return pages
+        file.seek(0)
+
+    return TikaClient().get_pages(file)
+
+
+def get_text_chunks(pages: List[str]) -> List[str]:
+    """
+    Join the pages of a document into chunks of PAGES_PER_CHUNK pages, like the Harmony PDF parser does.
+
+    :param pages: The plain text of the pages.
+    """
+
+    return ["\n".join(pages[start:start + PAGES_PER_CHUNK]) for start in range(0, len(pages), PAGES_PER_CHUNK)]
@@ -0,0 +1,175 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import threading
+import time
+from typing import BinaryIO, List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from harmony_api.core.settings import get_settings
+from harmony_api.services.metrics import Metrics
+from harmony_api.utils.singleton_meta import SingletonMeta
+
+settings = get_settings()
+
+# The Tika server, the environment variable read by the tika package comes first
+tika_endpoint = os.getenv("TIKA_SERVER_ENDPOINT", settings.TIKA_ENDPOINT).rstrip("/")
+
+# The timeout of a health check of Tika
+HEALTH_CHECK_TIMEOUT_SECONDS = 5
+
+
+class TikaUnavailableError(Exception):
+    """
+    Tika isn't called because its circuit breaker is open.
+    """
+
+
+class TikaClient(metaclass=SingletonMeta):
+    """
+    This class is responsible for the requests to Tika (Singleton class).
+
+    The connections to Tika are kept alive and reused, and at most TIKA_MAX_CONCURRENT_REQUESTS requests are sent at
+    the same time, the other requests wait for their turn.
+
+    After TIKA_CIRCUIT_BREAKER_FAILURES consecutive failed requests the circuit breaker opens: the requests fail
+    without calling Tika, and every TIKA_CIRCUIT_BREAKER_RESET_SECONDS one request checks the health of Tika. The
+    circuit breaker closes once a health check passes. A file Tika can't convert isn't a failure, only the connection
+    errors, the timeouts and the server errors are.
+    """
+
+    def __init__(self):
+        max_concurrent_requests = max(1, settings.TIKA_MAX_CONCURRENT_REQUESTS)
+        self.__semaphore = threading.BoundedSemaphore(max_concurrent_requests)
+
+        self.__session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrent_requests)
+        self.__session.mount("http://", adapter)
+        self.__session.mount("https://", adapter)
+
+        self.__lock = threading.Lock()
+        self.__consecutive_failures = 0
+
+        # When the next health check is due, None while the circuit breaker is closed
+        self.__next_health_check_time: float | None = None
+
+    def is_healthy(self) -> bool:
+        """
+        Check if Tika answers.
+        """
+
+        try:
+            response = self.__session.get(f"{tika_endpoint}/tika", timeout=HEALTH_CHECK_TIMEOUT_SECONDS)
+            response.close()
+
+            return response.status_code == 200
+        except requests.RequestException:
+            return False
+
+    def is_circuit_breaker_open(self) -> bool:
+        """
+        Check if the requests fail without calling Tika.
+        """
+
+        return self.__next_health_check_time is not None
+
+    def __check_circuit_breaker(self):
+        """
+        Raise TikaUnavailableError while the circuit breaker is open, one caller checks the health of Tika when it's
+        due and the others keep failing.
+        """
+
+        with self.__lock:
+            if self.__next_health_check_time is None:
+                return
+            if time.monotonic() < self.__next_health_check_time:
+                raise TikaUnavailableError("Tika is unavailable, it failed too many times in a row.")
+            self.__next_health_check_time = time.monotonic() + settings.TIKA_CIRCUIT_BREAKER_RESET_SECONDS
+
+        if not self.is_healthy():
+            raise TikaUnavailableError("Tika is unavailable, it failed its health check.")
+
+        with self.__lock:
+            self.__next_health_check_time = None
+            self.__consecutive_failures = 0
+        print("INFO:\t  Tika passed its health check, closing the circuit breaker...")
+
+    def __count_result(self, is_failure: bool):
+        with self.__lock:
+            if not is_failure:
+                self.__consecutive_failures = 0
+                return
+
+            self.__consecutive_failures += 1
+            Metrics().increment("tika_failures")
+            if (
+                    0 < settings.TIKA_CIRCUIT_BREAKER_FAILURES <= self.__consecutive_failures
+                    and self.__next_health_check_time is None
+            ):
+                self.__next_health_check_time = time.monotonic() + settings.TIKA_CIRCUIT_BREAKER_RESET_SECONDS
+                Metrics().increment("tika_circuit_breaker_opens")
+                print(f"Tika failed {self.__consecutive_failures} times in a row, opening the circuit breaker.")
+
+    def get_pages(self, file: BinaryIO) -> List[str]:
+        """
+        Convert a PDF or a Word document to the plain text of its pages with Tika, the same way as the Harmony PDF
+        parser does. The file is streamed to Tika.
+
+        :param file: The file.
+        """
+
+        from lxml import html
+
+        self.__check_circuit_breaker()
+
+        with self.__semaphore:
+            Metrics().increment("tika_requests")
+            try:
+                response = self.__session.put(
+                    f"{tika_endpoint}/rmeta/xml",
+                    data=file,
+                    headers={"Accept": "application/json"},
+                    timeout=settings.TIKA_TIMEOUT_SECONDS,
+                )
+            except requests.RequestException:
+                self.__count_result(is_failure=True)
+                raise
+
+        self.__count_result(is_failure=response.status_code >= 500)
+        response.raise_for_status()
+
+        # The content of the document and of its embedded documents
+        content = "".join(document.get("X-TIKA:content", "") for document in response.json())
+        if not content:
+            return []
+
+        et = html.fromstring(content)
+        pages = et.getchildren()[1].getchildren()
+
+        return [str(page.text_content()) for page in pages]
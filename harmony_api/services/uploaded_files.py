@@ -0,0 +1,165 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import base64
+import io
+import os
+import uuid
+from typing import BinaryIO, List, NamedTuple
+
+from fastapi import UploadFile
+from harmony.schemas.enums.file_types import FileType
+from harmony.schemas.requests.text import RawFile
+
+from harmony_api.services import instruments_cache, text_extraction
+
+# The size of the chunks in which uploaded files are read
+CHUNK_SIZE = 1024 * 1024
+
+# Content type -> file type, for the uploaded files whose name has no known extension
+CONTENT_TYPE_TO_FILE_TYPE: dict[str, FileType] = {
+    "application/pdf": FileType.pdf,
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": FileType.xlsx,
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": FileType.docx,
+    "text/plain": FileType.txt,
+    "text/csv": FileType.csv,
+    "text/html": FileType.html,
+}
+
+# File type -> content type, for the data URIs of the files parsed from base64
+FILE_TYPE_TO_CONTENT_TYPE: dict[FileType, str] = {
+    file_type: content_type for content_type, file_type in CONTENT_TYPE_TO_FILE_TYPE.items()
+}
+
+# These file types are plain text
+TEXT_FILE_TYPES = [FileType.txt, FileType.csv, FileType.html, FileType.htm]
+
+
+class UploadedFile(NamedTuple):
+    """
+    A file uploaded as multipart/form-data.
+
+    The file is spooled by Starlette, in memory for small files and in a temporary file on disk for large files.
+    """
+
+    file_id: str
+    file_name: str
+    file_type: FileType
+    key: str
+    file: BinaryIO
+
+
+def get_file_type(upload: UploadFile) -> FileType | None:
+    """
+    Get the file type of an uploaded file, from the extension of its name or else from its content type.
+    """
+
+    extension = os.path.splitext(upload.filename or "")[1].lower().removeprefix(".")
+    if extension in FileType.__members__:
+        return FileType(extension)
+
+    content_type = (upload.content_type or "").split(";")[0].strip().lower()
+
+    return CONTENT_TYPE_TO_FILE_TYPE.get(content_type)
+
+
+def get_key(file: BinaryIO, file_type: FileType) -> str:
+    """
+    Get the instruments cache key of an uploaded file.
+
+    The file is hashed in chunks, so it's never held in memory as a whole. The key of a file is the key of the same
+    file sent as a RawFile to /text/parse.
+    """
+
+    file.seek(0)
+    key_hash = instruments_cache.get_key_hash(file_type)
+    while chunk := file.read(CHUNK_SIZE):
+        key_hash.update(chunk)
+    file.seek(0)
+
+    return key_hash.hexdigest()
+
+
+def get_uploaded_file(upload: UploadFile) -> UploadedFile | None:
+    """
+    Get an uploaded file with its file type and instruments cache key, or None if the file type isn't supported.
+    """
+
+    file_type = get_file_type(upload)
+    if file_type is None:
+        return None
+
+    return UploadedFile(
+        file_id=uuid.uuid4().hex,
+        file_name=upload.filename or "Untitled file",
+        file_type=file_type,
+        key=get_key(upload.file, file_type),
+        file=upload.file,
+    )
+
+
+def detach(upload: UploadFile):
+    """
+    Detach the spooled file from an upload, so it stays open when FastAPI closes the uploads. It must then be closed
+    with `close`.
+    """
+
+    upload.file = io.BytesIO()
+
+
+def close(uploaded_files: List[UploadedFile]):
+    """
+    Close the spooled files of uploaded files.
+    """
+
+    for uploaded_file in uploaded_files:
+        uploaded_file.file.close()
+
+
+def to_raw_file(uploaded_file: UploadedFile) -> RawFile:
+    """
+    Convert an uploaded file to a RawFile that the Harmony parsers accept.
+
+    PDFs and Word documents aren't read here, their pages are extracted from the spooled file when they're parsed, so
+    the parser gets no base64 content. The Harmony Excel parser only reads base64 data URIs, so Excel files are still encoded.
+    """
+
+    file = uploaded_file.file
+    file.seek(0)
+
+    content = ""
+    if uploaded_file.file_type in TEXT_FILE_TYPES:
+        content = file.read().decode("utf-8", errors="replace")
+    elif uploaded_file.file_type not in text_extraction.DOCUMENT_FILE_TYPES:
+        content_type = FILE_TYPE_TO_CONTENT_TYPE[uploaded_file.file_type]
+        content = f"data:{content_type};base64,{base64.b64encode(file.read()).decode()}"
+
+    return RawFile(
+        file_id=uploaded_file.file_id,
+        file_name=uploaded_file.file_name,
+        file_type=uploaded_file.file_type,
+        content=content,
+    )
@@ -0,0 +1,283 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import base64
+import hashlib
+import threading
+import time
+import urllib.parse
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import List, NamedTuple
+
+import requests
+from harmony.schemas.enums.file_types import FileType
+from harmony.schemas.errors.base import BadRequestError, ConflictError, ForbiddenError, SomethingWrongError
+from harmony.schemas.requests.text import Instrument, RawFile
+from harmony.util.url_loader import DOWNLOAD_TIMEOUT, MIME_TO_FILE_TYPE, URLDownloader
+
+from harmony_api.core.settings import get_settings
+from harmony_api.services import parse_pool
+from harmony_api.services.instruments_cache import InstrumentsCache, get_key_hash
+from harmony_api.services.metrics import Metrics
+from harmony_api.services.single_flight import SingleFlight
+from harmony_api.utils.singleton_meta import SingletonMeta
+
+settings = get_settings()
+
+# The file types downloaded as a data URI, the others are decoded as UTF-8
+BINARY_FILE_TYPES = [FileType.pdf, FileType.xlsx, FileType.docx]
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class DownloadedFile(NamedTuple):
+    raw_file: RawFile
+    instruments_key: str
+    etag: str | None
+    last_modified: str | None
+
+
+class CachedUrl(NamedTuple):
+    instruments_key: str
+    etag: str | None
+    last_modified: str | None
+    validated_time: float
+
+
+class ConditionalURLDownloader(URLDownloader):
+    """
+    The Harmony URL downloader, which sends conditional GETs and streams the download within a size and a time limit.
+    """
+
+    def download_if_modified(
+            self, url: str, etag: str | None = None, last_modified: str | None = None
+    ) -> DownloadedFile | None:
+        """
+        Download a file from a URL, the same way as the Harmony URL downloader does.
+
+        The instruments cache key of the file is hashed while the file is streamed. The download fails once the file
+        is larger than URL_FETCH_MAX_MB, or takes longer than URL_FETCH_TIMEOUT_SECONDS.
+
+        :param url: The URL.
+        :param etag: The ETag of the last download of the URL.
+        :param last_modified: The Last-Modified of the last download of the URL.
+        :return: The file, or None if the server answered that it's not modified since the last download.
+        """
+
+        max_size = settings.URL_FETCH_MAX_MB * 1024 * 1024
+        deadline = time.monotonic() + settings.URL_FETCH_TIMEOUT_SECONDS
+
+        headers = {
+            "User-Agent": "HarmonyBot/1.0 (+https://harmonydata.ac.uk)",
+            "Accept": ", ".join(MIME_TO_FILE_TYPE.keys()),
+        }
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        try:
+            self._validate_url(url)
+            domain = urllib.parse.urlparse(url).netloc
+            self._check_rate_limit(domain)
+
+            with self.session.get(
+                    url,
+                    timeout=min(DOWNLOAD_TIMEOUT, settings.URL_FETCH_TIMEOUT_SECONDS),
+                    stream=True,
+                    verify=True,
+                    allow_redirects=True,
+                    headers=headers,
+            ) as response:
+                response.raise_for_status()
+                self._check_legal_headers(response)
+
+                if response.status_code == 304:
+                    return None
+
+                self._validate_ssl(response)
+
+                content_length = response.headers.get("content-length")
+                if content_length and int(content_length) > max_size:
+                    raise ForbiddenError(f"File too large: {content_length} bytes (max {max_size})")
+
+                file_type = self._validate_content_type(url, response.headers.get("content-type", ""))
+
+                hasher = hashlib.sha256()
+                key_hash = get_key_hash(file_type)
+                chunks: List[bytes] = []
+                size = 0
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_size:
+                        raise ForbiddenError(f"File too large: more than {max_size} bytes")
+                    if time.monotonic() > deadline:
+                        raise SomethingWrongError("Download timeout")
+                    hasher.update(chunk)
+                    key_hash.update(chunk)
+                    chunks.append(chunk)
+                content = b"".join(chunks)
+
+                if file_type in BINARY_FILE_TYPES:
+                    content_type = response.headers.get("content-type", "application/octet-stream")
+                    content_str = f"data:{content_type};base64," + base64.b64encode(content).decode("ascii")
+                else:
+                    content_str = content.decode("utf-8")
+
+                raw_file = RawFile(
+                    file_id=str(uuid.uuid4()),
+                    file_name=Path(urllib.parse.urlparse(url).path).name or "downloaded_file",
+                    file_type=file_type,
+                    content=content_str,
+                    metadata={
+                        "content_hash": hasher.hexdigest(),
+                        "download_timestamp": datetime.now().isoformat(),
+                        "source_url": url,
+                    },
+                )
+
+                return DownloadedFile(
+                    raw_file=raw_file,
+                    instruments_key=key_hash.hexdigest(),
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                )
+        except (BadRequestError, ForbiddenError, ConflictError, SomethingWrongError):
+            raise
+        except requests.Timeout:
+            raise SomethingWrongError("Download timeout")
+        except requests.TooManyRedirects:
+            raise ForbiddenError("Too many redirects")
+        except requests.RequestException as e:
+            if e.response is not None:
+                if e.response.status_code == 401:
+                    raise ForbiddenError("Resource requires authentication")
+                elif e.response.status_code == 403:
+                    raise ForbiddenError("Access forbidden")
+                elif e.response.status_code == 429:
+                    raise ConflictError("Rate limit exceeded")
+            raise SomethingWrongError(f"Download error: {str(e)}")
+        except Exception as e:
+            raise SomethingWrongError(f"Unexpected error: {str(e)}")
+
+
+class UrlCache(metaclass=SingletonMeta):
+    """
+    This class is responsible for caching the instruments of URLs (Singleton class).
+
+    The instruments are stored by the hash of the downloaded file in the instruments cache, so a file is parsed once
+    whatever its URL, and a file downloaded and then uploaded isn't parsed again. This cache keeps the ETag and the
+    Last-Modified of the last download of every URL: for URL_CACHE_REVALIDATE_SECONDS the instruments are served
+    without contacting the server, then a conditional GET downloads the file again only if it changed.
+
+    The same URL fetched by concurrent requests is downloaded once.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__urls: OrderedDict[str, CachedUrl] = OrderedDict()
+        self.__single_flight = SingleFlight("url_fetch")
+
+    def __get(self, url: str) -> CachedUrl | None:
+        with self.__lock:
+            cached_url = self.__urls.get(url)
+            if cached_url is not None:
+                self.__urls.move_to_end(url)
+
+            return cached_url
+
+    def __set(self, url: str, cached_url: CachedUrl):
+        with self.__lock:
+            self.__urls[url] = cached_url
+            self.__urls.move_to_end(url)
+            while len(self.__urls) > max(1, settings.URL_CACHE_MAX_SIZE):
+                self.__urls.popitem(last=False)
+
+    def __fetch_instruments(self, url: str) -> List[Instrument]:
+        instruments_cache = InstrumentsCache()
+
+        cached_url = self.__get(url)
+        instruments = None
+        if cached_url is not None:
+            instruments = instruments_cache.get(cached_url.instruments_key)
+
+        # The instruments of the URL were evicted from the instruments cache, download the file again
+        if instruments is None:
+            cached_url = None
+        elif time.monotonic() - cached_url.validated_time < settings.URL_CACHE_REVALIDATE_SECONDS:
+            Metrics().increment("url_cache_hits")
+            return instruments
+
+        downloaded_file = ConditionalURLDownloader().download_if_modified(
+            url,
+            etag=cached_url.etag if cached_url is not None else None,
+            last_modified=cached_url.last_modified if cached_url is not None else None,
+        )
+        if downloaded_file is None:
+            Metrics().increment("url_cache_not_modified")
+            self.__set(url, cached_url._replace(validated_time=time.monotonic()))
+            return instruments
+
+        Metrics().increment("url_cache_downloads")
+        key = downloaded_file.instruments_key
+        instruments = instruments_cache.get(key)
+        if instruments is None:
+            instruments = parse_pool.parse_files([downloaded_file.raw_file], [key])[0]
+
+        self.__set(
+            url,
+            CachedUrl(
+                instruments_key=key,
+                etag=downloaded_file.etag,
+                last_modified=downloaded_file.last_modified,
+                validated_time=time.monotonic(),
+            ),
+        )
+
+        return instruments
+
+    def get_instruments(self, url: str) -> List[Instrument]:
+        """
+        Get the instruments of the file at a URL.
+
+        :param url: The URL.
+        """
+
+        future, is_leader = self.__single_flight.claim(url)
+        if not is_leader:
+            return future.result()
+
+        try:
+            instruments = self.__fetch_instruments(url)
+        except BaseException as e:
+            self.__single_flight.set_exception(url, future, e)
+            raise
+        self.__single_flight.set_result(url, future, instruments)
+
+        return instruments
@@ -26,6 +26,7 @@ SOFTWARE.
 
 import json
 import os
+import threading
 from hashlib import sha256
 
 from typing import List
@@ -34,18 +35,42 @@ from harmony_api.utils.singleton_meta import SingletonMeta
 
 data_path = os.getenv("HARMONY_DATA_PATH", os.getcwd())
 cache_file_path = os.path.join(data_path, constants.VECTORS_CACHE_JSON_FILENAME)
+versions_file_path = os.path.join(data_path, constants.VECTORS_CACHE_VERSIONS_JSON_FILENAME)
+
+
+def get_model_version(model_framework: str, model_name: str) -> str:
+    """
+    Get the current version of the vectors of a model, an empty string if the model is unknown.
+    """
+
+    # The model registry loads the models, it's only imported when needed
+    from harmony_api.services.model_registry import get_model_provider
+
+    model_provider = get_model_provider({"framework": model_framework, "model": model_name})
+
+    return model_provider.version if model_provider else ""
 
 
 class VectorsCache(metaclass=SingletonMeta):
     """
     This class is responsible for caching vectors (Singleton class).
+
+    The framework, model name and model version of every entry are kept next to the cache, the version is part of the
+    key so the vectors of another version are never used. The entries cached before the versions were added are still
+    loaded, they have no model version and aren't used by the versioned models.
     """
 
     def __init__(self):
         print("INFO:\t  Loading vectors cache...")
 
+        # Held while the entries are added, removed or iterated, the lookups don't need it
+        self.__lock = threading.Lock()
+
         self.__cache: dict[str, dict[str, List[float]]] = {}
 
+        # Key -> [framework, model name, model version]
+        self.__model_versions: dict[str, List[str]] = {}
+
         self.__load()
 
     def __load(self):
@@ -64,6 +89,17 @@ class VectorsCache(metaclass=SingletonMeta):
 
         self.__cache = cache
 
+        if os.path.isfile(versions_file_path):
+            with open(versions_file_path, "r", encoding="utf8") as file:
+                try:
+                    model_versions: dict[str, List[str]] = json.loads(file.read())
+                except json.decoder.JSONDecodeError:
+                    model_versions: dict[str, List[str]] = {}
+        else:
+            model_versions: dict[str, List[str]] = {}
+
+        self.__model_versions = {key: value for key, value in model_versions.items() if key in self.__cache}
+
     def add(self, new_text_vectors: dict[str, List[List]], model_name: str, framework: str) -> None:
         """
         Add new text vectors to cache.
@@ -73,11 +109,17 @@ class VectorsCache(metaclass=SingletonMeta):
         :param framework: The framework.
         """
 
-        for key, value in new_text_vectors.items():
-            vector_key = self.generate_key(
-                text=key, model_framework=framework, model_name=model_name
-            )
-            self.__set(vector_key, {key: value})
+        model_version = get_model_version(model_framework=framework, model_name=model_name)
+        entries = {
+            self.generate_key(
+                text=key, model_framework=framework, model_name=model_name, model_version=model_version
+            ): {key: value}
+            for key, value in new_text_vectors.items()
+        }
+        with self.__lock:
+            for vector_key, value in entries.items():
+                self.__set(vector_key, value)
+                self.__model_versions[vector_key] = [framework, model_name, model_version]
 
     def __set(self, key: str, value: dict[str, List[float]]):
         """
@@ -120,18 +162,99 @@ class VectorsCache(metaclass=SingletonMeta):
 
         This is saved as a list of dictionaries containing the key as the hash and the value as a dict with the text
         as key and the value as the vector.
+        The model versions of the entries are saved in another file.
         """
 
+        with self.__lock:
+            cache_json = json.dumps(self.__cache, ensure_ascii=False)
+            model_versions_json = json.dumps(self.__model_versions, ensure_ascii=False)
+
         with open(cache_file_path, "w", encoding="utf8") as file:
-            file.write(json.dumps(self.__cache, ensure_ascii=False))
+            file.write(cache_json)
+
+        with open(versions_file_path, "w", encoding="utf8") as file:
+            file.write(model_versions_json)
 
         print(f"INFO:\t  Cache {constants.VECTORS_CACHE_JSON_FILENAME} saved...")
 
-    def generate_key(self, text: str, model_framework: str, model_name: str) -> str:
+    def __get_unversioned_model_versions(
+            self, entries: List[tuple[str, dict[str, List[float]]]], models: List[tuple[str, str]]
+    ) -> dict[str, List[str]]:
+        """
+        Find the model of the entries cached before the versions were added, by their key without a model version.
+
+        :param entries: The entries without a model version.
+        :param models: The (framework, model name) of the models to look for.
+        :return: Key -> [framework, model name, ""], for the entries of these models.
+        """
+
+        model_versions: dict[str, List[str]] = {}
+        for key, value in entries:
+            for text in value:
+                for framework, model_name in models:
+                    if self.generate_key(text, framework, model_name, model_version="") == key:
+                        model_versions[key] = [framework, model_name, ""]
+                        break
+
+        return model_versions
+
+    def invalidate_other_versions(self) -> int:
+        """
+        Remove the entries of the model versions other than the current ones, including the entries cached without a
+        model version when their model now has one. The entries of unknown models are kept.
+
+        :return: The number of removed entries.
+        """
+
+        from harmony_api.services.model_registry import MODEL_PROVIDERS
+
+        # The entries are read from a snapshot, the keys are hashed without holding the lock
+        with self.__lock:
+            model_versions = dict(self.__model_versions)
+            unversioned_entries = [
+                (key, value) for key, value in self.__cache.items() if key not in self.__model_versions
+            ]
+
+        current_model_versions = {
+            (framework, model_name): get_model_version(framework, model_name)
+            for framework, model_name in MODEL_PROVIDERS
+        }
+
+        # Only the entries of the models which now have a version can be removed
+        versioned_models = [model for model, model_version in current_model_versions.items() if model_version]
+        model_versions.update(self.__get_unversioned_model_versions(unversioned_entries, versioned_models))
+
+        keys: List[str] = []
+        for key, (framework, model_name, model_version) in model_versions.items():
+            if (framework, model_name) not in current_model_versions:
+                current_model_versions[(framework, model_name)] = get_model_version(framework, model_name)
+            if model_version != current_model_versions[(framework, model_name)]:
+                keys.append(key)
+
+        with self.__lock:
+            for key in keys:
+                self.__cache.pop(key, None)
+                self.__model_versions.pop(key, None)
+
+        return len(keys)
+
+    def generate_key(self, text: str, model_framework: str, model_name: str, model_version: str | None = None) -> str:
         """
         Generate key.
+
+        :param text: The text.
+        :param model_framework: The framework.
+        :param model_name: The model name.
+        :param model_version: The model version, defaults to the current version of the model.
         """
 
-        text_full = f"{model_framework}.{model_name}.{text}"
+        if model_version is None:
+            model_version = get_model_version(model_framework=model_framework, model_name=model_name)
+
+        # The keys without a model version are the same as before the versions were added
+        if model_version:
+            text_full = f"{model_framework}.{model_name}@{model_version}.{text}"
+        else:
+            text_full = f"{model_framework}.{model_name}.{text}"
 
         return sha256(text_full.encode()).hexdigest()
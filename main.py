@@ -42,6 +42,8 @@ from harmony_api.routers.info_router import router as info_router
 from harmony_api.routers.text_router import router as text_router
 from harmony_api.services.instruments_cache import InstrumentsCache
 from harmony_api.scheduler import scheduler
+from harmony_api.services import process_pool
+from harmony_api.services.negations_cache import NegationsCache
 from harmony_api.services.vectors_cache import VectorsCache
 
 description = """
@@ -55,9 +57,12 @@ You can try Harmony at <a href="https://harmonydata.ac.uk/app">harmonydata.ac.uk
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     scheduler.start()
+    process_pool.start()
 
     yield
 
+    process_pool.shutdown()
+
 app_fastapi = FastAPI(
     title=settings.APP_TITLE,
     description=description,
@@ -95,6 +100,7 @@ async def main():
     # Load cache
     InstrumentsCache()
     VectorsCache()
+    NegationsCache()
 
     server = uvicorn.Server(
         config=uvicorn.Config(
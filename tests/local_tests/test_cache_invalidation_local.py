@@ -0,0 +1,77 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+
+import os
+import unittest
+
+import requests
+
+headers = {
+    'accept': 'application/json',
+}
+
+gad_7_txt = (
+    "1. Feeling nervous, anxious, or on edge\tNot at all/Several days/More than half the days/Nearly every day\n"
+    "2. Not being able to stop or control worrying\tNot at all/Several days/More than half the days/Nearly every day\n"
+)
+
+endpoint = 'http://localhost:8000/text/cache/old_versions'
+
+# The server must be started with the same ADMIN_API_KEY
+admin_headers = {**headers, 'X-Admin-Key': os.getenv('ADMIN_API_KEY', '')}
+
+
+class TestCacheInvalidation(unittest.TestCase):
+    def test_invalidate_old_versions(self):
+        response = requests.delete(endpoint, headers=admin_headers)
+        self.assertEqual(200, response.status_code)
+        self.assertIn('instruments_cache_entries_removed', response.json())
+        self.assertIn('vectors_cache_entries_removed', response.json())
+
+    def test_current_version_kept(self):
+        file = {'file_name': 'GAD-7.txt', 'file_type': 'txt', 'content': gad_7_txt}
+        instruments = requests.post('http://localhost:8000/text/parse', headers=headers, json=[file]).json()
+
+        requests.delete(endpoint, headers=admin_headers)
+
+        metrics_before = requests.get('http://localhost:8000/info/metrics', headers=headers).json()
+        response = requests.post('http://localhost:8000/text/parse', headers=headers, json=[file])
+        metrics_after = requests.get('http://localhost:8000/info/metrics', headers=headers).json()
+
+        self.assertEqual(instruments, response.json())
+        self.assertEqual(
+            metrics_before.get('instruments_cache_hits', 0) + 1, metrics_after.get('instruments_cache_hits', 0)
+        )
+
+    def test_admin_key_required(self):
+        response = requests.delete(endpoint, headers={**headers, 'X-Admin-Key': 'invalid'})
+        self.assertEqual(403, response.status_code)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import unittest
+
+import msgpack
+import numpy as np
+import requests
+
+options_en = ['Not at all', 'Several days', 'More than half the days', 'Nearly every day']
+
+json_data_to_match = {
+    'instruments': [
+        {
+            'instrument_id': '1',
+            'instrument_name': 'GAD-7 English',
+            'language': 'en',
+            'questions': [
+                {'question_no': '1', 'question_text': 'Feeling nervous, anxious, or on edge', 'options': options_en},
+                {'question_no': '2', 'question_text': 'Not being able to stop or control worrying',
+                 'options': options_en},
+                {'question_no': '3', 'question_text': 'Trouble relaxing', 'options': options_en},
+            ],
+        },
+    ],
+    'query': 'anxiety',
+    'parameters': {
+        'framework': 'huggingface',
+        'model': 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2',
+    },
+}
+
+endpoint = 'http://localhost:8000/text/match'
+
+response_json = requests.post(endpoint, headers={'accept': 'application/json'}, json=json_data_to_match)
+response_msgpack = requests.post(endpoint, headers={'accept': 'application/msgpack'}, json=json_data_to_match)
+response_msgpack_float16 = requests.post(
+    endpoint, headers={'accept': 'application/msgpack'}, json=json_data_to_match, params={'matrices_dtype': 'float16'}
+)
+response_msgpack_top_k = requests.post(
+    endpoint, headers={'accept': 'application/msgpack'}, json=json_data_to_match, params={'top_k': 1}
+)
+
+
+def get_matrix(encoded_matrix: dict) -> np.ndarray:
+    return np.frombuffer(encoded_matrix['data'], dtype=encoded_matrix['dtype']).reshape(encoded_matrix['shape'])
+
+
+class TestMatchBinary(unittest.TestCase):
+    def test_content_types(self):
+        self.assertEqual('application/json', response_json.headers['content-type'])
+        self.assertEqual('application/msgpack', response_msgpack.headers['content-type'])
+
+    def test_matches_equal_json_matches(self):
+        matches = get_matrix(msgpack.unpackb(response_msgpack.content)['matches'])
+        self.assertEqual((3, 3), matches.shape)
+        self.assertTrue(np.allclose(response_json.json()['matches'], matches, atol=1e-6))
+
+    def test_query_similarity_equals_json_query_similarity(self):
+        query_similarity = get_matrix(msgpack.unpackb(response_msgpack.content)['query_similarity'])
+        self.assertTrue(np.allclose(response_json.json()['query_similarity'], query_similarity, atol=1e-6))
+
+    def test_float16_matches(self):
+        encoded_matches = msgpack.unpackb(response_msgpack_float16.content)['matches']
+        self.assertEqual('<f2', encoded_matches['dtype'])
+        self.assertTrue(np.allclose(response_json.json()['matches'], get_matrix(encoded_matches), atol=1e-3))
+
+    def test_other_fields_equal_json_fields(self):
+        response = msgpack.unpackb(response_msgpack.content)
+        self.assertEqual(response_json.json()['questions'], response['questions'])
+        self.assertEqual(response_json.json()['clusters'], response['clusters'])
+
+    def test_sparse_matches(self):
+        sparse_matches = msgpack.unpackb(response_msgpack_top_k.content)['sparse_matches']
+        self.assertEqual([3, 3], sparse_matches['shape'])
+        self.assertEqual([0, 1, 2], np.frombuffer(sparse_matches['rows'], dtype='<i4').tolist())
+        self.assertEqual(3, len(np.frombuffer(sparse_matches['scores'], dtype=sparse_matches['dtype'])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import unittest
+
+import requests
+
+headers = {
+    'accept': 'application/json',
+    'Content-Type': 'application/json',
+}
+
+json_data_to_match = {
+    'instruments': [
+        {
+            'instrument_id': '1',
+            'instrument_name': 'GAD-7 English',
+            'language': 'en',
+            'questions': [
+                {'question_no': '1', 'question_text': 'Feeling nervous, anxious, or on edge'},
+                {'question_no': '2', 'question_text': 'Not being able to stop or control worrying'},
+                {'question_no': '3', 'question_text': 'Worrying too much about different things'},
+            ],
+        },
+        {
+            'instrument_id': '2',
+            'instrument_name': 'PHQ-9 English',
+            'language': 'en',
+            'questions': [
+                {'question_no': '1', 'question_text': 'Little interest or pleasure in doing things'},
+                {'question_no': '2', 'question_text': 'Feeling down, depressed, or hopeless'},
+                {'question_no': '3', 'question_text': 'Feeling nervous, anxious, or on edge'},
+            ],
+        },
+    ],
+    'parameters': {
+        'framework': 'huggingface',
+        'model': 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2',
+    },
+}
+
+endpoint = 'http://localhost:8000/text/match'
+
+responses = {
+    clustering_algorithm: requests.post(
+        endpoint,
+        headers=headers,
+        json=json_data_to_match,
+        params={'clustering_algorithm': clustering_algorithm, 'top_k': 2, 'clustering_time_budget': 5},
+    )
+    for clustering_algorithm in ['knn_graph', 'minibatch_kmeans']
+}
+
+# Two near-identical but distinct questions, which are not merged as duplicate texts before the clustering
+json_data_near_identical = {
+    'instruments': [
+        {
+            'instrument_id': '1',
+            'instrument_name': 'GAD-7 English',
+            'language': 'en',
+            'questions': [
+                {'question_no': '1', 'question_text': 'Feeling nervous, anxious, or on edge'},
+                {'question_no': '2', 'question_text': 'Feeling nervous, anxious or on edge.'},
+            ],
+        },
+    ],
+    'parameters': json_data_to_match['parameters'],
+}
+
+
+class TestMatchClustering(unittest.TestCase):
+    def test_status_codes(self):
+        for response in responses.values():
+            self.assertEqual(200, response.status_code)
+
+    def test_clusters_contain_all_questions(self):
+        for response in responses.values():
+            item_ids = sorted(item_id for cluster in response.json()['clusters'] for item_id in cluster['item_ids'])
+            self.assertEqual([0, 1, 2, 3, 4, 5], item_ids)
+
+    def test_identical_questions_in_same_cluster(self):
+        for response in responses.values():
+            for cluster in response.json()['clusters']:
+                self.assertEqual(0 in cluster['item_ids'], 5 in cluster['item_ids'])
+
+    def test_near_identical_questions_in_same_cluster(self):
+        response = requests.post(
+            endpoint,
+            headers=headers,
+            json=json_data_near_identical,
+            params={'clustering_algorithm': 'knn_graph', 'top_k': 2, 'clustering_time_budget': 5},
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([[0, 1]], [cluster['item_ids'] for cluster in response.json()['clusters']])
+
+    def test_invalid_clustering_algorithm(self):
+        response = requests.post(
+            endpoint, headers=headers, json=json_data_to_match, params={'clustering_algorithm': 'invalid'}
+        )
+        self.assertEqual(422, response.status_code)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import unittest
+
+import requests
+
+headers = {
+    'accept': 'application/json',
+    'Content-Type': 'application/json',
+}
+
+json_data_to_match = {
+    'instruments': [
+        {
+            'instrument_id': '1',
+            'instrument_name': 'GAD-7 English',
+            'language': 'en',
+            'questions': [
+                {'question_no': '1', 'question_text': 'Feeling nervous, anxious, or on edge'},
+                {'question_no': '2', 'question_text': 'Not being able to stop or control worrying'},
+            ],
+        },
+        {
+            'instrument_id': '2',
+            'instrument_name': 'PHQ-9 English',
+            'language': 'en',
+            'questions': [
+                {'question_no': '1', 'question_text': 'Little interest or pleasure in doing things'},
+                {'question_no': '2', 'question_text': 'Feeling down, depressed, or hopeless'},
+            ],
+        },
+    ],
+    'parameters': {
+        'framework': 'huggingface',
+        'model': 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2',
+    },
+}
+
+endpoint = 'http://localhost:8000/text/match'
+
+response_first = requests.post(endpoint, headers=headers, json=json_data_to_match)
+response_repeated = requests.post(endpoint, headers=headers, json=json_data_to_match)
+response_not_modified = requests.post(
+    endpoint, headers={**headers, 'If-None-Match': response_first.headers['ETag']}, json=json_data_to_match
+)
+response_other_parameters = requests.post(
+    endpoint, headers={**headers, 'If-None-Match': response_first.headers['ETag']}, json=json_data_to_match,
+    params={'is_negate': False}
+)
+
+
+class TestMatchEtag(unittest.TestCase):
+    def test_repeated_response_is_identical(self):
+        self.assertEqual(200, response_repeated.status_code)
+        self.assertEqual(response_first.headers['ETag'], response_repeated.headers['ETag'])
+        self.assertEqual(response_first.json(), response_repeated.json())
+
+    def test_not_modified(self):
+        self.assertEqual(304, response_not_modified.status_code)
+        self.assertEqual(response_first.headers['ETag'], response_not_modified.headers['ETag'])
+        self.assertEqual(b'', response_not_modified.content)
+
+    def test_other_parameters_are_not_cached(self):
+        self.assertEqual(200, response_other_parameters.status_code)
+        self.assertIn('matches', response_other_parameters.json())
+
+
+if __name__ == '__main__':
+    unittest.main()
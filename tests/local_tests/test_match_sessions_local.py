@@ -0,0 +1,114 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import unittest
+
+import requests
+
+headers = {
+    'accept': 'application/json',
+    'Content-Type': 'application/json',
+}
+
+gad_7 = {
+    'instrument_id': '1',
+    'instrument_name': 'GAD-7 English',
+    'language': 'en',
+    'questions': [
+        {'question_no': '1', 'question_text': 'Feeling nervous, anxious, or on edge'},
+        {'question_no': '2', 'question_text': 'Not being able to stop or control worrying'},
+        {'question_no': '3', 'question_text': 'Worrying too much about different things'},
+    ],
+}
+
+phq_9 = {
+    'instrument_id': '2',
+    'instrument_name': 'PHQ-9 English',
+    'language': 'en',
+    'questions': [
+        {'question_no': '1', 'question_text': 'Little interest or pleasure in doing things'},
+        {'question_no': '2', 'question_text': 'Feeling down, depressed, or hopeless'},
+    ],
+}
+
+parameters = {
+    'framework': 'huggingface',
+    'model': 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2',
+}
+
+endpoint = 'http://localhost:8000/text/match'
+
+response_full_match = requests.post(
+    endpoint, headers=headers, json={'instruments': [gad_7, phq_9], 'parameters': parameters}
+)
+response_create = requests.post(
+    f'{endpoint}/sessions', headers=headers, json={'instruments': [gad_7], 'parameters': parameters}
+)
+session_id = response_create.json()['session_id']
+response_add = requests.post(f'{endpoint}/sessions/{session_id}/instruments', headers=headers, json=[phq_9])
+response_delete = requests.delete(f'{endpoint}/sessions/{session_id}')
+response_add_after_delete = requests.post(
+    f'{endpoint}/sessions/{session_id}/instruments', headers=headers, json=[phq_9]
+)
+
+
+class TestMatchSessions(unittest.TestCase):
+    def test_create(self):
+        self.assertEqual(201, response_create.status_code)
+        self.assertEqual(0, response_create.json()['first_question_idx'])
+        self.assertEqual(3, len(response_create.json()['matches']))
+        self.assertEqual(3, len(response_create.json()['matches'][0]))
+
+    def test_add_matches_shape(self):
+        self.assertEqual(200, response_add.status_code)
+        self.assertEqual(3, response_add.json()['first_question_idx'])
+        self.assertEqual(2, len(response_add.json()['matches']))
+        self.assertEqual(5, len(response_add.json()['matches'][0]))
+
+    def test_add_matches_equal_full_matches(self):
+        full_matches = response_full_match.json()['matches']
+        for row_idx, row in enumerate(response_add.json()['matches']):
+            for col_idx, score in enumerate(row):
+                self.assertAlmostEqual(full_matches[3 + row_idx][col_idx], score, places=5)
+
+    def test_add_instrument_to_instrument_similarities(self):
+        self.assertEqual(
+            response_full_match.json()['instrument_to_instrument_similarities'],
+            response_add.json()['instrument_to_instrument_similarities']
+        )
+
+    def test_add_clusters_contain_all_questions(self):
+        item_ids = sorted(item_id for cluster in response_add.json()['clusters'] for item_id in cluster['item_ids'])
+        self.assertEqual([0, 1, 2, 3, 4], item_ids)
+
+    def test_delete(self):
+        self.assertEqual(204, response_delete.status_code)
+        self.assertEqual(404, response_add_after_delete.status_code)
+
+
+if __name__ == '__main__':
+    unittest.main()
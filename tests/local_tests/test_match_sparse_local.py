@@ -0,0 +1,134 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import unittest
+
+import requests
+
+headers = {
+    'accept': 'application/json',
+    'Content-Type': 'application/json',
+    'Accept-Encoding': 'gzip, deflate, br',
+}
+
+options_en = ['Not at all', 'Several days', 'More than half the days', 'Nearly every day']
+
+json_data_to_match = {
+    'instruments': [
+        {
+            'instrument_id': '1',
+            'instrument_name': 'GAD-7 English',
+            'language': 'en',
+            'questions': [
+                {'question_no': '1', 'question_text': 'Feeling nervous, anxious, or on edge', 'options': options_en},
+                {'question_no': '2', 'question_text': 'Not being able to stop or control worrying',
+                 'options': options_en},
+                {'question_no': '3', 'question_text': 'Worrying too much about different things',
+                 'options': options_en},
+            ],
+        },
+        {
+            'instrument_id': '2',
+            'instrument_name': 'GAD-7 English (copy)',
+            'language': 'en',
+            'questions': [
+                {'question_no': '1', 'question_text': 'Feeling nervous, anxious, or on edge', 'options': options_en},
+                {'question_no': '2', 'question_text': 'Not being able to stop or control worrying',
+                 'options': options_en},
+                {'question_no': '3', 'question_text': 'Trouble relaxing', 'options': options_en},
+            ],
+        },
+    ],
+    'parameters': {
+        'framework': 'huggingface',
+        'model': 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2',
+    },
+}
+
+endpoint = 'http://localhost:8000/text/match'
+
+response_dense = requests.post(endpoint, headers=headers, json=json_data_to_match)
+response_top_k = requests.post(endpoint, headers=headers, json=json_data_to_match, params={'top_k': 2})
+response_threshold = requests.post(endpoint, headers=headers, json=json_data_to_match, params={'threshold': 0.5})
+
+
+class TestMatchSparse(unittest.TestCase):
+
+    def test_dense_response_has_no_sparse_matrices(self):
+        self.assertIn('matches', response_dense.json())
+        self.assertNotIn('sparse_matches', response_dense.json())
+
+    def test_top_k_response_has_no_dense_matrices(self):
+        self.assertEqual(200, response_top_k.status_code)
+        self.assertNotIn('matches', response_top_k.json())
+        self.assertNotIn('response_options_similarity', response_top_k.json())
+
+    def test_top_k_shape(self):
+        self.assertEqual([6, 6], response_top_k.json()['sparse_matches']['shape'])
+
+    def test_top_k_matches_per_question(self):
+        sparse_matches = response_top_k.json()['sparse_matches']
+        self.assertEqual(12, len(sparse_matches['scores']))
+        for question_idx in range(6):
+            self.assertEqual(2, sparse_matches['rows'].count(question_idx))
+
+    def test_top_k_no_self_matches(self):
+        sparse_matches = response_top_k.json()['sparse_matches']
+        for row, col in zip(sparse_matches['rows'], sparse_matches['cols']):
+            self.assertNotEqual(row, col)
+
+    def test_top_k_identical_question_is_best_match(self):
+        sparse_matches = response_top_k.json()['sparse_matches']
+        self.assertEqual(0, sparse_matches['rows'][0])
+        self.assertEqual(3, sparse_matches['cols'][0])
+        self.assertLess(0.99, sparse_matches['scores'][0])
+
+    def test_top_k_scores_equal_dense_scores(self):
+        matches = response_dense.json()['matches']
+        sparse_matches = response_top_k.json()['sparse_matches']
+        for row, col, score in zip(sparse_matches['rows'], sparse_matches['cols'], sparse_matches['scores']):
+            self.assertAlmostEqual(matches[row][col], score, places=5)
+
+    def test_threshold_scores(self):
+        matches = response_dense.json()['matches']
+        sparse_matches = response_threshold.json()['sparse_matches']
+        expected_count = sum(
+            1 for row in range(6) for col in range(6) if row != col and matches[row][col] >= 0.5
+        )
+        self.assertEqual(expected_count, len(sparse_matches['scores']))
+        for score in sparse_matches['scores']:
+            self.assertLessEqual(0.5, score)
+
+    def test_instrument_to_instrument_similarities_conserved(self):
+        self.assertEqual(
+            response_dense.json()['instrument_to_instrument_similarities'],
+            response_top_k.json()['instrument_to_instrument_similarities']
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
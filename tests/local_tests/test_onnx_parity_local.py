@@ -0,0 +1,97 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", ".."))
+
+from harmony_api.constants import (
+    HUGGINGFACE_MINILM_L12_V2,
+    HUGGINGFACE_MPNET_BASE_V2,
+    HUGGINGFACE_MENTAL_HEALTH_HARMONISATION_1,
+)
+from harmony_api.services.hugging_face_embeddings import (
+    HUGGING_FACE_MODELS,
+    load_onnx_sentence_transformer,
+)
+
+texts = [
+    "Feeling nervous, anxious, or on edge",
+    "Not being able to stop or control worrying",
+    "I don't feel nervous",
+    "Sentir-se nervoso/a, ansioso/a ou muito tenso/a",
+    "Over the last two weeks, how often have you been bothered by trouble falling or staying asleep, or sleeping "
+    "too much, and how often have you felt tired or had little energy during the day?",
+]
+
+
+def cosine_similarities(vectors_1: np.ndarray, vectors_2: np.ndarray) -> np.ndarray:
+    return np.sum(vectors_1 * vectors_2, axis=1) / (
+            np.linalg.norm(vectors_1, axis=1) * np.linalg.norm(vectors_2, axis=1)
+    )
+
+
+class TestOnnxParity(unittest.TestCase):
+    """
+    The ONNX models must return the same vectors as the PyTorch models (HUGGING_FACE_BACKEND=torch).
+    """
+
+    def assert_parity(self, model_name: str, quantisation: str | None, min_similarity: float):
+        vectors_torch = HUGGING_FACE_MODELS[model_name].encode(sentences=texts, convert_to_numpy=True)
+        vectors_onnx = load_onnx_sentence_transformer(
+            model_name=model_name, quantisation=quantisation
+        ).encode(sentences=texts, convert_to_numpy=True)
+
+        self.assertEqual(vectors_torch.shape, vectors_onnx.shape)
+        self.assertLess(min_similarity, np.min(cosine_similarities(vectors_torch, vectors_onnx)))
+
+    def test_minilm_onnx(self):
+        self.assert_parity(HUGGINGFACE_MINILM_L12_V2["model"], None, 0.9999)
+
+    def test_mpnet_onnx(self):
+        self.assert_parity(HUGGINGFACE_MPNET_BASE_V2["model"], None, 0.9999)
+
+    def test_mental_health_harmonisation_onnx(self):
+        self.assert_parity(HUGGINGFACE_MENTAL_HEALTH_HARMONISATION_1["model"], None, 0.9999)
+
+    def test_minilm_onnx_quantised(self):
+        self.assert_parity(HUGGINGFACE_MINILM_L12_V2["model"], "avx2", 0.98)
+
+    def test_mpnet_onnx_quantised(self):
+        self.assert_parity(HUGGINGFACE_MPNET_BASE_V2["model"], "avx2", 0.98)
+
+    def test_mental_health_harmonisation_onnx_quantised(self):
+        self.assert_parity(HUGGINGFACE_MENTAL_HEALTH_HARMONISATION_1["model"], "avx2", 0.98)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import json
+import unittest
+
+import requests
+
+gad_7_txt = (
+    "1. Feeling nervous, anxious, or on edge\tNot at all/Several days/More than half the days/Nearly every day\n"
+    "2. Not being able to stop or control worrying\tNot at all/Several days/More than half the days/Nearly every day\n"
+)
+
+phq_9_txt = (
+    "1. Little interest or pleasure in doing things\tNot at all/Several days/More than half the days/Nearly every day\n"
+    "2. Feeling down, depressed, or hopeless\tNot at all/Several days/More than half the days/Nearly every day\n"
+)
+
+json_data_to_parse = [
+    {'file_name': 'GAD-7.txt', 'file_type': 'txt', 'content': gad_7_txt},
+    {'file_name': 'PHQ-9.txt', 'file_type': 'txt', 'content': phq_9_txt},
+    {'file_name': 'GAD-7 again.txt', 'file_type': 'txt', 'content': gad_7_txt},
+]
+
+endpoint = 'http://localhost:8000/text/parse'
+
+response_ndjson = requests.post(
+    endpoint, headers={'accept': 'application/x-ndjson'}, json=json_data_to_parse, stream=True
+)
+lines = [json.loads(line) for line in response_ndjson.iter_lines() if line]
+
+response_sse = requests.post(endpoint, headers={'accept': 'text/event-stream'}, json=json_data_to_parse)
+response_json = requests.post(endpoint, headers={'accept': 'application/json'}, json=json_data_to_parse)
+
+
+class TestParseStreaming(unittest.TestCase):
+    def test_ndjson(self):
+        self.assertEqual(200, response_ndjson.status_code)
+        self.assertTrue(response_ndjson.headers['Content-Type'].startswith('application/x-ndjson'))
+        self.assertEqual([0, 1, 2], sorted(line['file_idx'] for line in lines))
+        for line in lines:
+            self.assertIn(line['status'], ['cached', 'parsed'])
+            self.assertGreaterEqual(line['parse_time'], 0)
+
+    def test_same_instruments_as_json(self):
+        instruments = [line['instruments'] for line in sorted(lines, key=lambda line: line['file_idx'])]
+        questions = [
+            [question['question_text'] for instrument in file_instruments for question in instrument['questions']]
+            for file_instruments in instruments
+        ]
+        self.assertEqual(
+            [question['question_text'] for instrument in response_json.json() for question in instrument['questions']],
+            [question_text for file_questions in questions for question_text in file_questions],
+        )
+
+    def test_server_sent_events(self):
+        self.assertEqual(200, response_sse.status_code)
+        events = [event for event in response_sse.text.split('\n\n') if event]
+        self.assertEqual(3, len(events))
+        for event in events:
+            self.assertTrue(event.startswith('event: file\ndata: '))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import unittest
+
+import requests
+
+headers = {
+    'accept': 'application/json',
+}
+
+gad_7_txt = (
+    "1. Feeling nervous, anxious, or on edge\tNot at all/Several days/More than half the days/Nearly every day\n"
+    "2. Not being able to stop or control worrying\tNot at all/Several days/More than half the days/Nearly every day\n"
+)
+
+phq_9_csv = (
+    "Question number\tQuestion text\tOptions\n"
+    "1\tLittle interest or pleasure in doing things\tNot at all/Several days/More than half the days/Nearly every day\n"
+    "2\tFeeling down, depressed, or hopeless\tNot at all/Several days/More than half the days/Nearly every day\n"
+)
+
+endpoint = 'http://localhost:8000/text/parse/upload'
+
+response_upload = requests.post(endpoint, headers=headers, files=[
+    ('files', ('GAD-7.txt', gad_7_txt.encode('utf8'), 'text/plain')),
+    ('files', ('PHQ-9.csv', phq_9_csv.encode('utf8'), 'text/csv')),
+])
+response_json = requests.post('http://localhost:8000/text/parse', headers=headers, json=[
+    {'file_name': 'GAD-7.txt', 'file_type': 'txt', 'content': gad_7_txt},
+    {'file_name': 'PHQ-9.csv', 'file_type': 'csv', 'content': phq_9_csv},
+])
+
+
+class TestParseUpload(unittest.TestCase):
+    def test_upload(self):
+        self.assertEqual(200, response_upload.status_code)
+        self.assertEqual(2, len(response_upload.json()))
+
+    def test_same_questions_as_json_body(self):
+        questions_upload = [
+            [question['question_text'] for question in instrument['questions']]
+            for instrument in response_upload.json()
+        ]
+        questions_json = [
+            [question['question_text'] for question in instrument['questions']]
+            for instrument in response_json.json()
+        ]
+        self.assertEqual(questions_json, questions_upload)
+
+    def test_same_content_keeps_file_ids(self):
+        response = requests.post('http://localhost:8000/text/parse', headers=headers, json=[
+            {'file_id': 'gad7a', 'file_name': 'GAD-7.txt', 'file_type': 'txt', 'content': gad_7_txt},
+            {'file_id': 'gad7b', 'file_name': 'GAD-7 copy.txt', 'file_type': 'txt', 'content': gad_7_txt},
+        ])
+        self.assertEqual(200, response.status_code)
+        instruments = response.json()
+        self.assertEqual(['gad7a', 'gad7b'], [instrument['file_id'] for instrument in instruments])
+        self.assertNotEqual(instruments[0]['instrument_id'], instruments[1]['instrument_id'])
+
+    def test_unsupported_file_type(self):
+        response = requests.post(endpoint, headers=headers, files=[
+            ('files', ('GAD-7.bin', b'\x00\x01', 'application/octet-stream')),
+        ])
+        self.assertEqual(422, response.status_code)
+
+
+if __name__ == '__main__':
+    unittest.main()
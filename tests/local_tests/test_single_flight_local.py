@@ -0,0 +1,122 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+
+import unittest
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+headers = {
+    'accept': 'application/json',
+}
+
+parameters = {
+    'framework': 'huggingface',
+    'model': 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2',
+}
+
+
+def get_gad_7_txt() -> str:
+    # A unique file, so it isn't in the instruments cache yet
+    return (
+        f"GAD-7 {uuid.uuid4().hex}\n"
+        "1. Feeling nervous, anxious, or on edge\tNot at all/Several days/More than half the days/Nearly every day\n"
+        "2. Not being able to stop or control worrying\tNot at all/Several days/More than half the days/Nearly every day\n"
+    )
+
+
+def get_gad_7_instrument() -> dict:
+    # Unique question texts, so they aren't in the vectors cache yet
+    suffix = uuid.uuid4().hex
+
+    return {
+        'instrument_id': '1',
+        'instrument_name': 'GAD-7 English',
+        'language': 'en',
+        'questions': [
+            {'question_no': '1', 'question_text': f'Feeling nervous, anxious, or on edge {suffix}'},
+            {'question_no': '2', 'question_text': f'Not being able to stop or control worrying {suffix}'},
+        ],
+    }
+
+
+def get_metrics() -> dict:
+    return requests.get('http://localhost:8000/info/metrics', headers=headers).json()
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_parses_of_same_file(self):
+        file = {'file_name': 'GAD-7.txt', 'file_type': 'txt', 'content': get_gad_7_txt()}
+
+        def parse(_):
+            return requests.post('http://localhost:8000/text/parse', headers=headers, json=[file])
+
+        metrics_before = get_metrics()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            responses = list(executor.map(parse, range(8)))
+        metrics_after = get_metrics()
+
+        for response in responses:
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(responses[0].json(), response.json())
+
+        # The requests which didn't find the file in the cache waited for its parsing instead of parsing it again
+        self.assertGreater(
+            metrics_after.get('parse_single_flight_joins', 0), metrics_before.get('parse_single_flight_joins', 0)
+        )
+
+    def test_concurrent_matches_of_same_texts(self):
+        instrument = get_gad_7_instrument()
+
+        def match(_):
+            return requests.post(
+                'http://localhost:8000/text/match',
+                headers=headers,
+                json={'instruments': [instrument], 'parameters': parameters},
+            )
+
+        metrics_before = get_metrics()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            responses = list(executor.map(match, range(8)))
+        metrics_after = get_metrics()
+
+        for response in responses:
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(responses[0].json()['matches'], response.json()['matches'])
+
+        # The requests which didn't find the texts in the cache waited for their vectors instead of vectorising them
+        # again
+        self.assertGreater(
+            metrics_after.get('vectorisation_single_flight_joins', 0),
+            metrics_before.get('vectorisation_single_flight_joins', 0),
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()